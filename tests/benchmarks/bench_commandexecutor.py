@@ -0,0 +1,55 @@
+"""Benchmarks the per call overhead of :meth:`zoo.libs.command.base.ExecutorBase.execute`.
+
+Run from the tests folder::
+
+    python -m benchmarks.bench_commandexecutor
+
+"""
+import timeit
+
+from zoo.libs.command import base
+from testdata.commanddata import testcommands
+
+
+def _clearCommandCaches(commandClass):
+    if "_argumentDefaultsCache" in commandClass.__dict__:
+        del commandClass._argumentDefaultsCache
+    base.CommandStats._classInfo.clear()
+    base.CommandStats._machineInfo = None
+
+
+def executeOverhead(iterations=10000, repeat=3, cached=True):
+    """Returns the best time in seconds of a single ExecutorBase.execute() call for a no-op command.
+
+    :param iterations: The number of execute calls per timing run.
+    :type iterations: int
+    :param repeat: The number of timing runs, the fastest is returned.
+    :type repeat: int
+    :param cached: If False the argument spec and stats caches are cleared before every call which matches the \
+    behaviour before the caches existed.
+    :type cached: bool
+    :rtype: float
+    """
+    executor = base.ExecutorBase()
+    commandClass = testcommands.TestCommandReg
+    executor.registry.registerPlugin(commandClass)
+
+    def run():
+        if not cached:
+            _clearCommandCaches(commandClass)
+        executor.execute("test.testCommand", value="hello")
+
+    run()
+    return min(timeit.Timer(run).repeat(repeat=repeat, number=iterations)) / iterations
+
+
+def main():
+    cached = executeOverhead()
+    uncached = executeOverhead(iterations=1000, cached=False)
+    print("execute (cached): {:.2f}us per call".format(cached * 1e6))
+    print("execute (uncached): {:.2f}us per call".format(uncached * 1e6))
+    print("speedup: {:.1f}x".format(uncached / cached))
+
+
+if __name__ == "__main__":
+    main()
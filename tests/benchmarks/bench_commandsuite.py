@@ -0,0 +1,294 @@
+"""Repeatable command system benchmarks, covering registry discovery, execute throughput, undo/redo with large
+stacks and argument resolution.
+
+Synthetic command libraries of 100, 1000 and 10000 commands are generated into a temp folder for each run,
+execute throughput is also measured with the testdata.commanddata fixtures. Results are written as json so runs
+from different releases can be compared.
+
+Run from the tests folder::
+
+    python -m benchmarks.bench_commandsuite --output results.json
+    python -m benchmarks.bench_commandsuite --sizes 100 1000 --baseline previous.json
+
+"""
+import argparse
+import datetime
+import functools
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+
+from zoo.libs.command import base
+from zoo.libs.command import command
+from zoo.libs.command import telemetry
+from zoo.libs.plugin import pluginmanager
+from zoo.libs.utils import filesystem
+from testdata.commanddata import testcommands
+
+RESULTS_VERSION = 1
+DEFAULT_SIZES = (100, 1000, 10000)
+COMMANDS_PER_MODULE = 50
+
+MODULE_HEADER = """from zoo.libs.command import command
+
+"""
+
+COMMAND_TEMPLATE = """
+class BenchCommand{index}(command.ZooCommand):
+    \"\"\"Synthetic benchmark command {index}.
+    \"\"\"
+    id = "bench.command{index}"
+    creator = "zootools"
+    isUndoable = True
+    isEnabled = True
+    uiData = {{"label": "Bench Command {index}"}}
+
+    def doIt(self, value=None, count=1, name="", enabled=True):
+        self._value = value
+        return value
+
+    def undoIt(self):
+        self._value = None
+
+"""
+
+
+class CommandLibrary(object):
+    """Generates a synthetic command package on disk which can be imported and discovered.
+
+    :param root: The folder which is added to sys.path.
+    :type root: str
+    :param size: The number of commands to generate.
+    :type size: int
+    """
+
+    def __init__(self, root, size):
+        self.root = root
+        self.size = size
+        self.packageName = "zoobenchlib{}".format(size)
+        self.path = os.path.join(root, self.packageName, "commands")
+        os.makedirs(self.path)
+        for folder in (os.path.dirname(self.path), self.path):
+            with open(os.path.join(folder, "__init__.py"), "w") as f:
+                f.write("")
+        for moduleIndex, start in enumerate(xrange(0, size, COMMANDS_PER_MODULE)):
+            with open(os.path.join(self.path, "benchcommands{:04d}.py".format(moduleIndex)), "w") as f:
+                f.write(MODULE_HEADER)
+                for index in xrange(start, min(start + COMMANDS_PER_MODULE, size)):
+                    f.write(COMMAND_TEMPLATE.format(index=index))
+
+    def flushModules(self):
+        """Removes the generated modules from sys.modules so the next discovery imports them again.
+        """
+        for name in list(sys.modules.keys()):
+            if name == self.packageName or name.startswith(self.packageName + "."):
+                del sys.modules[name]
+
+
+def _result(name, size, iterations, seconds):
+    return {"benchmark": name,
+            "size": size,
+            "iterations": iterations,
+            "seconds": seconds,
+            "perCall": seconds / iterations if iterations else 0.0,
+            "opsPerSecond": iterations / seconds if seconds else 0.0}
+
+
+def _executor(library=None):
+    executor = base.ExecutorBase()
+    executor.registry.registerPlugin(testcommands.TestCommandReg)
+    executor.registry.registerPlugin(testcommands.TestCommandUndoable)
+    if library is not None:
+        executor.registry.registerByPackage(library.path)
+    return executor
+
+
+def benchDiscovery(library, repeat=3):
+    """Times registering the entire library with a new plugin manager using each discovery mode, the modules are
+    removed from sys.modules before every run so each run imports the library.
+
+    :rtype: list(dict)
+    """
+    modes = (("discovery.import", {"discoveryThreads": 1}),
+             ("discovery.importPrefetch", {"discoveryThreads": 4}),
+             ("discovery.static", {"discovery": pluginmanager.STATIC_DISCOVERY}))
+    results = []
+    for name, kwargs in modes:
+        timings = []
+        for _ in xrange(repeat):
+            library.flushModules()
+            manager = pluginmanager.PluginManager(command.ZooCommand, variableName="id", **kwargs)
+            start = time.time()
+            manager.registerByPackage(library.path)
+            timings.append(time.time() - start)
+            assert len(manager.plugins) == library.size, "Discovered {} of {} commands".format(len(manager.plugins),
+                                                                                               library.size)
+        results.append(_result(name, library.size, 1, min(timings)))
+    library.flushModules()
+    return results
+
+
+def benchExecute(library=None, iterations=5000, repeat=3):
+    """Times execute() of the no-op fixture command and a synthetic command, the registry holds the entire library
+    so lookup cost scales with the library size.
+
+    :rtype: list(dict)
+    """
+    executor = _executor(library)
+    size = library.size if library is not None else 0
+    results = []
+    targets = [("execute.fixture", "test.testCommand", {"value": "hello"})]
+    if library is not None:
+        targets.append(("execute.synthetic", "bench.command{}".format(size - 1), {"value": 1, "count": 2}))
+    for name, commandId, kwargs in targets:
+        run = functools.partial(executor.execute, commandId, **kwargs)
+        run()
+        seconds = min(timeit.Timer(run).repeat(repeat=repeat, number=iterations))
+        results.append(_result(name, size, iterations, seconds))
+        executor.flush()
+    return results
+
+
+def benchUndoRedo(library, repeat=3):
+    """Fills the undo stack with one entry per command in the library then times undoing and redoing the entire
+    stack.
+
+    :rtype: list(dict)
+    """
+    executor = _executor(library)
+    commandIds = ["bench.command{}".format(i) for i in xrange(library.size)]
+    executeTimes, undoTimes, redoTimes = [], [], []
+    for _ in xrange(repeat):
+        executor.flush()
+        start = time.time()
+        for commandId in commandIds:
+            executor.execute(commandId, value=commandId)
+        executeTimes.append(time.time() - start)
+        start = time.time()
+        while executor.undoLast():
+            pass
+        undoTimes.append(time.time() - start)
+        start = time.time()
+        for _ in commandIds:
+            executor.redoLast()
+        redoTimes.append(time.time() - start)
+        assert len(executor.undoStack) == library.size
+    executor.flush()
+    return [_result("undoRedo.execute", library.size, library.size, min(executeTimes)),
+            _result("undoRedo.undo", library.size, library.size, min(undoTimes)),
+            _result("undoRedo.redo", library.size, library.size, min(redoTimes))]
+
+
+def benchArgumentResolution(iterations=10000, repeat=3):
+    """Times _prepareCommand() and _resolveArguments() for a single command with and without the cached
+    argument spec.
+
+    :rtype: list(dict)
+    """
+    commandClass = testcommands.TestCommandUndoable
+    arguments = {"value": "hello"}
+
+    def resolve(cached):
+        if not cached and "_argumentDefaultsCache" in commandClass.__dict__:
+            del commandClass._argumentDefaultsCache
+        cmd = commandClass()
+        cmd._prepareCommand()
+        cmd._resolveArguments(arguments)
+
+    results = []
+    for name, cached in (("arguments.cached", True), ("arguments.uncached", False)):
+        run = functools.partial(resolve, cached)
+        run()
+        seconds = min(timeit.Timer(run).repeat(repeat=repeat, number=iterations))
+        results.append(_result(name, 1, iterations, seconds))
+    return results
+
+
+def runSuite(sizes=DEFAULT_SIZES, repeat=3):
+    """Runs every benchmark for each library size.
+
+    :param sizes: The synthetic command library sizes.
+    :type sizes: iterable(int)
+    :param repeat: The number of timing runs per benchmark, the fastest is kept.
+    :type repeat: int
+    :return: The json serializable results including the environment the suite was run in.
+    :rtype: dict
+    """
+    root = tempfile.mkdtemp()
+    sys.path.insert(0, root)
+    results = []
+    try:
+        results.extend(benchArgumentResolution(repeat=repeat))
+        results.extend(benchExecute(repeat=repeat))
+        for size in sizes:
+            library = CommandLibrary(root, size)
+            results.extend(benchDiscovery(library, repeat=repeat))
+            results.extend(benchExecute(library, repeat=repeat))
+            results.extend(benchUndoRedo(library, repeat=repeat))
+            library.flushModules()
+    finally:
+        sys.path.remove(root)
+        shutil.rmtree(root)
+        # the suite shouldn't leave the benchmark commands in the process telemetry
+        telemetry.TelemetryAggregator().reset()
+    return {"version": RESULTS_VERSION,
+            "created": datetime.datetime.now().isoformat(),
+            "python": sys.version,
+            "platform": platform.platform(),
+            "sizes": list(sizes),
+            "repeat": repeat,
+            "results": results}
+
+
+def compareResults(baseline, current, threshold=0.1):
+    """Compares two suite results and returns the benchmarks whose time per call increased by more than the
+    threshold.
+
+    :param baseline: The previous results from runSuite().
+    :type baseline: dict
+    :param current: The new results from runSuite().
+    :type current: dict
+    :param threshold: The allowed relative slowdown, 0.1 is 10%.
+    :type threshold: float
+    :return: A list of (benchmark, size, baselinePerCall, currentPerCall) for each regression.
+    :rtype: list(tuple)
+    """
+    previous = dict(((r["benchmark"], r["size"]), r["perCall"]) for r in baseline.get("results", []))
+    regressions = []
+    for result in current.get("results", []):
+        key = (result["benchmark"], result["size"])
+        before = previous.get(key)
+        if before and result["perCall"] > before * (1.0 + threshold):
+            regressions.append((key[0], key[1], before, result["perCall"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Zoo command system benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="Synthetic command library sizes")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs per benchmark, the fastest is kept")
+    parser.add_argument("--output", default="commandsuite_results.json", help="Json results file path")
+    parser.add_argument("--baseline", default=None, help="Previous json results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Allowed relative slowdown")
+    args = parser.parse_args(argv)
+
+    data = runSuite(args.sizes, args.repeat)
+    for result in data["results"]:
+        print("{benchmark:<26} size: {size:<6} {perCall:.3e}s per call, {opsPerSecond:.0f} ops/s".format(**result))
+    filesystem.saveJson(data, args.output, indent=2)
+    print("Results written to: {}".format(os.path.abspath(args.output)))
+    if args.baseline:
+        regressions = compareResults(filesystem.loadJson(args.baseline), data, args.threshold)
+        for name, size, before, after in regressions:
+            print("REGRESSION {} size: {} {:.3e}s -> {:.3e}s".format(name, size, before, after))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
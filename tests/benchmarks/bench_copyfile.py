@@ -0,0 +1,112 @@
+"""Compares the throughput of each :func:`zoo.libs.utils.filesystem.copyFileData` method with shutil.copyfile
+across file sizes.
+
+Methods which aren't supported by the platform or the filesystem of the target folder are reported as unsupported.
+The source file is read once before timing so every method copies from the page cache, use a folder on the drive
+you're interested in since reflink and copy_file_range depend on the filesystem.
+
+Run from the tests folder::
+
+    python -m benchmarks.bench_copyfile --folder /mnt/projects/tmp --output copy_results.json
+
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from zoo.libs.utils import filesystem
+
+# 1MB, 16MB, 256MB
+FILE_SIZES = (1 << 20, 16 << 20, 256 << 20)
+
+
+def _createFile(filePath, size):
+    block = os.urandom(1 << 20)
+    with open(filePath, "wb") as f:
+        written = 0
+        while written < size:
+            f.write(block[:size - written])
+            written += len(block)
+
+
+def _timeCopy(copy, source, destination, repeat):
+    best = None
+    for _ in xrange(repeat):
+        if os.path.exists(destination):
+            os.remove(destination)
+        start = time.time()
+        copy(source, destination)
+        seconds = time.time() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def benchSize(folder, size, repeat=3):
+    """Times shutil.copyfile and each copy method for a file of the size.
+
+    :rtype: list(dict)
+    """
+    source = os.path.join(folder, "source{}.bin".format(size))
+    destination = os.path.join(folder, "destination{}.bin".format(size))
+    _createFile(source, size)
+    results = []
+    try:
+        with open(source, "rb") as f:
+            while f.read(16 << 20):
+                pass
+        copies = [("shutil.copyfile", shutil.copyfile)]
+        for method in filesystem.COPY_METHODS:
+            copies.append((method, lambda src, dst, method=method: filesystem.copyFileData(src, dst, methods=[method])))
+        for name, copy in copies:
+            try:
+                seconds = _timeCopy(copy, source, destination, repeat)
+            except OSError:
+                results.append({"bytes": size, "method": name, "seconds": None, "megabytesPerSecond": None})
+                continue
+            results.append({"bytes": size, "method": name, "seconds": seconds,
+                            "megabytesPerSecond": size / float(1 << 20) / max(seconds, 1e-9)})
+    finally:
+        for filePath in (source, destination):
+            if os.path.exists(filePath):
+                os.remove(filePath)
+    return results
+
+
+def runSuite(folder, sizes=FILE_SIZES, repeat=3):
+    results = []
+    for size in sizes:
+        results.extend(benchSize(folder, size, repeat))
+    return {"python": sys.version,
+            "platform": sys.platform,
+            "folder": folder,
+            "results": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Zoo file copy benchmarks")
+    parser.add_argument("--folder", default=None, help="The folder to copy within, defaults to a temp folder")
+    parser.add_argument("--sizes", type=int, nargs="+", default=None, help="File sizes in MB")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=None, help="Json results file path")
+    args = parser.parse_args(argv)
+    sizes = [i << 20 for i in args.sizes] if args.sizes else FILE_SIZES
+    folder = tempfile.mkdtemp(dir=args.folder)
+    try:
+        data = runSuite(folder, sizes, args.repeat)
+    finally:
+        shutil.rmtree(folder)
+    for result in data["results"]:
+        if result["seconds"] is None:
+            print("{bytes:>12} bytes {method:<18} unsupported".format(**result))
+        else:
+            print("{bytes:>12} bytes {method:<18} {seconds:.4f}s {megabytesPerSecond:>9.1f} MB/s".format(**result))
+    if args.output:
+        filesystem.saveJson(data, args.output, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
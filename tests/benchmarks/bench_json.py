@@ -0,0 +1,111 @@
+"""Compares the json backends available to :mod:`zoo.libs.utils.filesystem` on the configs shipped with zoo and on
+synthetic tool presets of increasing size.
+
+Decoding is timed for every installed backend, encoding compares the previous json.dump() based saveJson with
+filesystem.encodeJson().
+
+Run from the tests folder::
+
+    python -m benchmarks.bench_json --output json_results.json
+
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+from zoo.libs.utils import filesystem
+
+ZOO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+CONFIG_FILES = (os.path.join(ZOO_ROOT, "zoo", "libs", "naming", "config.json"),
+                os.path.join(ZOO_ROOT, "zoo", "libs", "pyqt", "syntaxhighlighter", "highlightdata.json"))
+# synthetic tool preset sizes in number of presets, roughly 50KB, 0.5MB and 5MB
+PRESET_COUNTS = (250, 2500, 25000)
+
+
+def presetDocument(count):
+    """Returns a tool settings document with count presets, shaped like the shader and rig presets tools save.
+    """
+    return {"version": 2,
+            "presets": [{"name": u"preset{}".format(i),
+                         "tags": [u"shader", u"lookdev", u"asset{}".format(i % 50)],
+                         "color": [0.18 * (i % 5), 0.5, 1.0 / (i + 1)],
+                         "enabled": bool(i % 2),
+                         "attributes": {"roughness": 0.35, "metalness": 0.0, "ior": 1.45, "samples": i % 16}}
+                        for i in xrange(count)]}
+
+
+def _timeIt(func, repeat):
+    # scale the number of runs so every benchmark takes a similar amount of time
+    number = max(1, int(0.2 / max(min(timeit.Timer(func).repeat(repeat=1, number=1)), 1e-7)))
+    return min(timeit.Timer(func).repeat(repeat=repeat, number=number)) / number
+
+
+class _NullStream(object):
+    # json.dump() target so the old saveJson encoder is timed without disk writes
+    def write(self, data):
+        pass
+
+
+def benchDocument(name, text, repeat=3):
+    """Times each installed decoder and the old and new encoders for the document.
+
+    :rtype: list(dict)
+    """
+    results = []
+    data = json.loads(text)
+    for backend in ("json",) + filesystem.JSON_BACKENDS:
+        try:
+            filesystem.setJsonBackend(backend)
+        except ValueError:
+            continue
+        seconds = _timeIt(lambda: filesystem.decodeJson(text), repeat)
+        results.append({"document": name, "bytes": len(text), "operation": "decode", "backend": backend,
+                        "seconds": seconds})
+    filesystem.setJsonBackend()
+    stream = _NullStream()
+    for indent in (None, 2):
+        results.append({"document": name, "bytes": len(text), "operation": "encode", "backend": "json.dump",
+                        "indent": indent, "seconds": _timeIt(lambda: json.dump(data, stream, indent=indent),
+                                                             repeat)})
+        results.append({"document": name, "bytes": len(text), "operation": "encode", "backend": "encodeJson",
+                        "indent": indent, "seconds": _timeIt(lambda: filesystem.encodeJson(data, indent=indent),
+                                                             repeat)})
+    return results
+
+
+def runSuite(repeat=3):
+    documents = []
+    for filePath in CONFIG_FILES:
+        with open(filePath) as f:
+            documents.append((os.path.basename(filePath), f.read()))
+    for count in PRESET_COUNTS:
+        documents.append(("presets{}".format(count), json.dumps(presetDocument(count))))
+    results = []
+    for name, text in documents:
+        results.extend(benchDocument(name, text, repeat))
+    return {"python": sys.version,
+            "activeBackend": filesystem.jsonBackend(),
+            "results": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Zoo json backend benchmarks")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=None, help="Json results file path")
+    args = parser.parse_args(argv)
+    data = runSuite(args.repeat)
+    for result in data["results"]:
+        label = result["backend"]
+        if result["operation"] == "encode":
+            label = "{} indent={}".format(label, result["indent"])
+        print("{document:<22} {bytes:>10} bytes {operation:<7} {label:<24} {seconds:.3e}s".format(label=label,
+                                                                                                  **result))
+    if args.output:
+        filesystem.saveJson(data, args.output, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+"""Measures :class:`zoo.libs.utils.path.Path` construction and / join throughput with and without the parse cache,
+and the memory used per path.
+
+The uncached numbers patch :func:`zoo.libs.utils.path.parsePath` with a function calling resolveAndSplit() directly,
+which is how Path parsed every construction before the cache existed.
+
+Memory is compared against LegacyPath, which stores the same per instance attributes Path stored before it used
+__slots__. Bytes per path are measured by adding up the unique objects each path references and, on linux, from the
+resident memory growth while building the paths. The token based __hash__, __len__ and __getitem__ are timed for both
+layouts as well, Path looks its tokens up in the shared token cache where LegacyPath read them from its __dict__.
+
+resolveMany() is compared with calling resolveAndSplit() in a loop over a 1M path sequence scan, where every path
+shares a handful of folders, and over 1M samplePaths() style paths spread across many folders, windows style, UNC
+and environment variable paths, which resolveMany() can't batch as well.
+
+Run from the tests folder::
+
+    python -m benchmarks.bench_path --output path_results.json
+
+"""
+import argparse
+import gc
+import os
+import sys
+import timeit
+
+from zoo.libs.utils import filesystem
+from zoo.libs.utils import path
+
+PATH_COUNT = 2000
+# render frames of a sequence scan, 100000 paths
+MEMORY_PATH_COUNT = 100000
+RESOLVE_MANY_COUNT = 1000000
+
+
+def _uncachedParse(filePath, envDict=None, caseMatters=None):
+    resolvedPath, pathTokens, isUnc = path.resolveAndSplit(filePath, envDict)
+    return resolvedPath, tuple(pathTokens), isUnc
+
+
+def samplePaths(count=PATH_COUNT):
+    """Returns tooldata style setting paths, a mix of plain, windows style, UNC and environment variable paths.
+    """
+    os.environ.setdefault("ZOO_BENCH_ROOT", "/mnt/projects/zootools")
+    paths = []
+    for i in xrange(count):
+        kind = i % 4
+        if kind == 0:
+            paths.append("/home/artist/zoo_preferences/prefs/tools/tool{}/settings{}.json".format(i % 50, i))
+        elif kind == 1:
+            paths.append("C:\\Users\\artist\\zoo_preferences\\tool{}\\..\\presets{}.json".format(i % 50, i))
+        elif kind == 2:
+            paths.append("//fileserver/projects/assets/char{}/textures/diffuse_{}.tx".format(i % 50, i))
+        else:
+            paths.append("%ZOO_BENCH_ROOT%/packages/package{}/config/layout{}.json".format(i % 50, i))
+    return paths
+
+
+def _timeIt(func, repeat):
+    return min(timeit.Timer(func).repeat(repeat=repeat, number=1))
+
+
+def benchPaths(paths, repeat=5):
+    """Times construction of every path and joining each of them with a relative path.
+
+    :rtype: dict
+    """
+    roots = [path.Path(p) for p in paths]
+
+    def construct():
+        for p in paths:
+            path.Path(p)
+
+    def join():
+        for root in roots:
+            root / "subFolder" / "settings.json"
+
+    perItem = float(len(paths))
+    return {"constructMicroseconds": _timeIt(construct, repeat) / perItem * 1e6,
+            # each join constructs two paths
+            "joinMicroseconds": _timeIt(join, repeat) / perItem * 1e6}
+
+
+class LegacyPath(path.Path):
+    """The per instance layout of Path before it used __slots__.
+    """
+    # plain class attributes in place of the Path properties so the instance values are used
+    isUNC = None
+    hasTrailing = None
+    _splits = None
+
+    def __new__(cls, filePath):
+        resolvedPath, pathTokens, isUnc = path.resolveAndSplit(filePath)
+        new = str.__new__(cls, resolvedPath)
+        new.isUNC = isUnc
+        new.hasTrailing = resolvedPath.endswith("/")
+        new._splits = tuple(pathTokens)
+        new._passed = filePath
+        return new
+
+    # the token based methods Path used before it had __slots__
+    def __getitem__(self, item):
+        return self._splits[item]
+
+    def __len__(self):
+        if not self:
+            return 0
+        return len(self._splits)
+
+    def __hash__(self):
+        if not self.caseMatters:
+            return hash(tuple([s.lower() for s in self._splits]))
+        return hash(tuple(self._splits))
+
+
+def framePaths(count=MEMORY_PATH_COUNT):
+    return ["/mnt/projects/show/seq{:02d}/shot{:03d}/render/v{:03d}/beauty.{:04d}.exr".format(i // 20000, i // 1000,
+                                                                                              i // 250 % 10, i % 1000)
+            for i in xrange(count)]
+
+
+def _deepSize(objects):
+    """Returns the bytes used by the objects and everything they reference through __dict__ and their cached tokens,
+    counting shared objects once.
+    """
+    seen = set()
+    total = 0
+    stack = list(objects)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, path.Path):
+            if hasattr(obj, "__dict__"):
+                stack.append(obj.__dict__)
+            if not isinstance(obj, LegacyPath):
+                # the shared tokens are only kept while the path is in the token cache
+                cache = path._tokenCache
+                tokens = cache.current.get(str(obj)) or cache.previous.get(str(obj))
+                if tokens is not None:
+                    stack.append(tokens)
+        elif isinstance(obj, dict):
+            stack.extend(obj.values())
+        elif isinstance(obj, tuple):
+            stack.extend(obj)
+    return total
+
+
+def _residentBytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (IOError, OSError, ValueError, AttributeError):
+        return None
+
+
+def benchMemory(pathType, filePaths):
+    """Builds a path for every string and returns the bytes used per path.
+
+    :rtype: dict
+    """
+    gc.collect()
+    before = _residentBytes()
+    paths = [pathType(p) for p in filePaths]
+    after = _residentBytes()
+    count = float(len(paths))
+    return {"deepBytesPerPath": _deepSize(paths) / count,
+            "residentBytesPerPath": (after - before) / count if before is not None else None}
+
+
+def benchAccess(pathType, filePaths, repeat=5):
+    """Times hash(), len() and indexing the last token of every path.
+
+    :rtype: dict
+    """
+    paths = [pathType(p) for p in filePaths]
+
+    def hashPaths():
+        for p in paths:
+            hash(p)
+
+    def lenPaths():
+        for p in paths:
+            len(p)
+
+    def lastToken():
+        for p in paths:
+            p[-1]
+
+    perItem = float(len(paths))
+    return {"hashMicroseconds": _timeIt(hashPaths, repeat) / perItem * 1e6,
+            "lenMicroseconds": _timeIt(lenPaths, repeat) / perItem * 1e6,
+            "getitemMicroseconds": _timeIt(lastToken, repeat) / perItem * 1e6}
+
+
+def benchResolveMany(filePaths, repeat=3):
+    """Times resolveAndSplit() in a loop against a single resolveMany() call.
+
+    :rtype: dict
+    """
+    def loop():
+        resolveAndSplit = path.resolveAndSplit
+        return [resolveAndSplit(p) for p in filePaths]
+
+    loopSeconds = _timeIt(loop, repeat)
+    manySeconds = _timeIt(lambda: path.resolveMany(filePaths), repeat)
+    return {"pathCount": len(filePaths),
+            "loopSeconds": loopSeconds,
+            "resolveManySeconds": manySeconds,
+            "speedup": loopSeconds / manySeconds}
+
+
+def runSuite(repeat=5, resolveManyCount=RESOLVE_MANY_COUNT):
+    paths = samplePaths()
+    original = path.parsePath
+    try:
+        path.parsePath = _uncachedParse
+        uncached = benchPaths(paths, repeat)
+    finally:
+        path.parsePath = original
+    path.clearParseCache()
+    cached = benchPaths(paths, repeat)
+    # the frame strings are built up front so only the path objects are measured, the slots paths are built first
+    # since memory freed by the first run is reused by the second which makes its resident growth an underestimate
+    frames = framePaths()
+    path.clearParseCache()
+    memory = {"slots": benchMemory(path.Path, frames)}
+    memory["legacy"] = benchMemory(LegacyPath, frames)
+    path.clearParseCache()
+    access = {"slots": benchAccess(path.Path, frames, repeat),
+              "legacy": benchAccess(LegacyPath, frames, repeat)}
+    return {"python": sys.version,
+            "pathCount": len(paths),
+            "uncached": uncached,
+            "cached": cached,
+            "memoryPathCount": len(frames),
+            "memory": memory,
+            "access": access,
+            "resolveMany": benchResolveMany(framePaths(resolveManyCount), min(repeat, 3)),
+            "resolveManyMixed": benchResolveMany(samplePaths(resolveManyCount), min(repeat, 3))}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Zoo Path benchmarks")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--resolveManyCount", type=int, default=RESOLVE_MANY_COUNT)
+    parser.add_argument("--output", default=None, help="Json results file path")
+    args = parser.parse_args(argv)
+    data = runSuite(args.repeat, args.resolveManyCount)
+    for name in ("constructMicroseconds", "joinMicroseconds"):
+        uncached, cached = data["uncached"][name], data["cached"][name]
+        print("{:<22} uncached {:>7.2f}us cached {:>7.2f}us speedup {:.1f}x".format(name, uncached, cached,
+                                                                                    uncached / cached))
+    for name in ("deepBytesPerPath", "residentBytesPerPath"):
+        legacy, slots = data["memory"]["legacy"][name], data["memory"]["slots"][name]
+        if legacy is not None:
+            print("{:<22} legacy {:>9.1f} slots {:>9.1f}".format(name, legacy, slots))
+    for name in ("hashMicroseconds", "lenMicroseconds", "getitemMicroseconds"):
+        print("{:<22} legacy {:>7.3f}us slots {:>7.3f}us".format(name, data["access"]["legacy"][name],
+                                                                 data["access"]["slots"][name]))
+    for name in ("resolveMany", "resolveManyMixed"):
+        print("{name:<22} {pathCount} paths loop {loopSeconds:.2f}s resolveMany {resolveManySeconds:.2f}s "
+              "speedup {speedup:.1f}x".format(name=name, **data[name]))
+    if args.output:
+        filesystem.saveJson(data, args.output, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -51,3 +51,10 @@ class TestCommand(unittestBase.BaseUnitest):
                                                        "hopeful",
                                                    "value": "hello"}))
 
+    def testArgumentDefaultsCached(self):
+        defaults = TestZooPreparePassesCommand.argumentDefaults()
+        self.assertEquals(defaults, {"shouldFail": "yea baby", "value": "bob"})
+        self.assertIs(TestZooPreparePassesCommand.argumentDefaults(), defaults)
+        self.assertEquals(TestZooCommand.argumentDefaults(), {})
+        self.assertRaises(ValueError, TestZooPrepareFailsCommand.argumentDefaults)
+        self.assertRaises(ValueError, TestZooPrepareFailsCommand.argumentDefaults)
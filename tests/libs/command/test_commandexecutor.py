@@ -2,6 +2,7 @@ import os
 
 from zoo.libs.utils import unittestBase
 from zoo.libs.command import base
+from zoo.libs.command import errors
 from testdata.commanddata import testcommands
 
 
@@ -65,3 +66,81 @@ class TestCommandExecutor(unittestBase.BaseUnitest):
         self.assertEquals(len(self.executor.undoStack), 1)
         self.executor.flush()
         self.assertEquals(len(self.executor.undoStack), 0)
+
+    def testExecuteBatch(self):
+        self.executor.registry.registerByEnv(self.env)
+        results = self.executor.executeBatch("test.testCommandUndoable", [{"value": "one"}, {"value": "two"}])
+        self.assertEquals(results, ["one", "two"])
+        self.assertEquals(len(self.executor.undoStack), 1)
+        compound = self.executor.undoStack[-1]
+        self.assertEquals([c.value for c in compound.commands], ["one", "two"])
+        self.assertTrue(self.executor.undoLast())
+        self.assertEquals([c.value for c in compound.commands], ["", ""])
+        self.assertEquals(len(self.executor.redoStack), 1)
+        self.assertEquals(self.executor.redoLast(), ["one", "two"])
+        self.assertEquals(len(self.executor.undoStack), 1)
+
+    def testExecuteManyReportsFailingIndex(self):
+        self.executor.registry.registerByEnv(self.env)
+        with self.assertRaises(errors.CommandBatchError) as context:
+            self.executor.executeMany([("test.testCommandUndoable", {"value": "one"}),
+                                       ("test.testCommandNotUndoable", {}),
+                                       ("test.failCommandArguments", {"value": "two"})])
+        self.assertEquals(context.exception.index, 2)
+        self.assertEquals(context.exception.commandId, "test.failCommandArguments")
+        # the commands which executed are still undoable as one entry
+        self.assertEquals(len(self.executor.undoStack), 1)
+
+    def testUndoLimitEvictsOldest(self):
+        self.executor.registry.registerByEnv(self.env)
+        self.executor.setUndoLimits(undoLimit=2)
+        for value in ("one", "two", "three"):
+            self.executor.execute("test.testCommandUndoable", value=value)
+        self.assertEquals([c.value for c in self.executor.undoStack], ["two", "three"])
+
+    def testUndoMemoryLimit(self):
+        self.executor.registry.registerByEnv(self.env)
+        self.executor.execute("test.testCommandUndoable", value="small")
+        largeValue = "x" * 100000
+        self.executor.execute("test.testCommandUndoable", value=largeValue)
+        self.assertTrue(self.executor.undoStack.memory > 100000)
+        self.executor.setUndoLimits(undoMemoryLimit=1000)
+        # the newest entry is kept even when it's larger than the limit
+        self.assertEquals(len(self.executor.undoStack), 1)
+        self.assertEquals(self.executor.undoStack[-1].value, largeValue)
+        self.executor.undoLast()
+        self.assertEquals(self.executor.undoStack.memory, 0)
+
+    def testDropReturnResults(self):
+        self.executor.registry.registerByEnv(self.env)
+        self.executor.setUndoLimits(keepReturnResults=False)
+        result = self.executor.execute("test.testCommandUndoable", value="helloWorld")
+        self.assertEquals(result, "helloWorld")
+        self.assertIsNone(self.executor.undoStack[-1]._returnResult)
+
+    def testExecuteAsync(self):
+        self.executor.registry.registerByEnv(self.env)
+        futures = [self.executor.executeAsync("test.testCommandThreadSafe", value=str(i)) for i in range(4)]
+        self.assertEquals(sorted(f.result(timeout=5) for f in futures), ["0", "1", "2", "3"])
+        self.assertEquals(len(self.executor.undoStack), 4)
+        failed = self.executor.executeAsync("test.testCommandThreadSafe", fail=True)
+        self.assertIsInstance(failed.exception(timeout=5), ValueError)
+        self.assertEquals(len(self.executor.undoStack), 4)
+        self.executor.shutdownAsync()
+
+    def testExecuteAsyncUnpicklableArgumentFails(self):
+        executor = base.ExecutorBase(asyncWorkers=1, asyncProcesses=True)
+        executor.registry.registerByEnv(self.env)
+        try:
+            future = executor.executeAsync("test.testCommandThreadSafe", value=lambda: "hello")
+            self.assertIsNotNone(future.exception(timeout=5))
+            self.assertEquals(executor.executeAsync("test.testCommandThreadSafe", value="hello").result(timeout=5),
+                              "hello")
+        finally:
+            executor.shutdownAsync()
+
+    def testExecuteAsyncNotThreadSafeRunsImmediately(self):
+        self.executor.registry.registerByEnv(self.env)
+        future = self.executor.executeAsync("test.testCommandUndoable", value="helloWorld")
+        self.assertTrue(future.done())
+        self.assertEquals(future.result(), "helloWorld")
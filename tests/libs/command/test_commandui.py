@@ -0,0 +1,26 @@
+import unittest
+
+from zoo.libs.utils import unittestBase
+from zoo.libs.command import base
+
+try:
+    from qt import QtCore
+    from zoo.libs.command import commandui
+except ImportError:
+    QtCore = None
+
+
+@unittest.skipIf(QtCore is None, "Requires a Qt binding")
+class TestCommandFutureWatcher(unittestBase.BaseUnitest):
+    def setUp(self):
+        self.app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+
+    def testAlreadyFinishedFuture(self):
+        future = base.CommandFuture("test.testCommand")
+        future.setResult("hello")
+        watcher = commandui.CommandFutureWatcher(future)
+        finished = []
+        watcher.finished.connect(lambda commandId, result: finished.append((commandId, result)))
+        self.assertEquals(finished, [])
+        self.app.processEvents()
+        self.assertEquals(finished, [("test.testCommand", "hello")])
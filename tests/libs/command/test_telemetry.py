@@ -0,0 +1,85 @@
+import json
+import os
+import shutil
+import tempfile
+
+from zoo.libs.utils import unittestBase
+from zoo.libs.command import base
+from zoo.libs.command import telemetry
+
+
+class TestLatencyHistogram(unittestBase.BaseUnitest):
+    def testPercentiles(self):
+        histogram = telemetry.LatencyHistogram()
+        for i in xrange(1, 101):
+            histogram.add(i / 1000.0)
+        self.assertEquals(histogram.count, 100)
+        self.assertAlmostEquals(histogram.percentile(50), 0.05, delta=0.05 * 0.2)
+        self.assertAlmostEquals(histogram.percentile(99), 0.099, delta=0.099 * 0.2)
+        self.assertEquals(histogram.percentile(100), 0.1)
+        self.assertEquals(len(histogram.counts), len(telemetry.LatencyHistogram().counts))
+
+
+class TestTelemetryAggregator(unittestBase.BaseUnitest):
+    @classmethod
+    def setUpClass(cls):
+        super(TestTelemetryAggregator, cls).setUpClass()
+        os.environ["TESTDATA"] = "testdata.commanddata.testcommands"
+
+    @classmethod
+    def tearDownClass(cls):
+        del os.environ["TESTDATA"]
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.aggregator = telemetry.TelemetryAggregator()
+        self.aggregator.reset()
+        self.executor = base.ExecutorBase()
+        self.executor.registry.registerByEnv("TESTDATA")
+
+    def tearDown(self):
+        self.aggregator.setLogPath(None)
+        self.aggregator.prometheusPath = None
+        self.aggregator.reset()
+        shutil.rmtree(self.root)
+
+    def testExecutorRecordsCommands(self):
+        for _ in xrange(3):
+            self.executor.execute("test.testCommand", value="hello")
+        self.executor.execute("test.testCommandThreadSafe", fail=True)
+        stats = self.aggregator.stats("test.testCommand")
+        self.assertEquals(stats["calls"], 3)
+        self.assertEquals(stats["errors"], 0)
+        # startTime is set before execution so the time is the doIt duration not the epoch
+        self.assertLess(stats["max"], 60)
+        failed = self.aggregator.stats("test.testCommandThreadSafe")
+        self.assertEquals(failed["errorRate"], 1.0)
+        self.assertIn("ValueError", failed["lastTraceback"])
+
+    def testExecuteBatchRecordsEachCommand(self):
+        self.executor.executeBatch("test.testCommand", [{"value": "one"}, {"value": "two"}, {"value": "three"}])
+        self.assertEquals(self.aggregator.stats("test.testCommand")["calls"], 3)
+
+    def testFlushWritesJsonLines(self):
+        logPath = os.path.join(self.root, "telemetry.log")
+        self.aggregator.setLogPath(logPath)
+        self.executor.execute("test.testCommand", value="hello")
+        self.aggregator.flush()
+        # only commands executed since the previous flush are written
+        self.aggregator.flush()
+        with open(logPath) as f:
+            lines = [json.loads(line) for line in f if line.strip()]
+        self.assertEquals(len(lines), 1)
+        self.assertEquals(lines[0]["id"], "test.testCommand")
+        self.assertEquals(lines[0]["calls"], 1)
+        self.assertIn("p95", lines[0])
+
+    def testExportPrometheus(self):
+        self.executor.execute("test.testCommand", value="hello")
+        promPath = os.path.join(self.root, "zoo.prom")
+        self.aggregator.exportPrometheus(promPath)
+        with open(promPath) as f:
+            content = f.read()
+        self.assertIn('zoo_command_calls_total{command="test.testCommand"} 1', content)
+        self.assertIn('zoo_command_duration_seconds{command="test.testCommand",quantile="0.95"}', content)
+        self.assertEquals(os.listdir(self.root), ["zoo.prom"])
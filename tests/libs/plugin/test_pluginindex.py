@@ -0,0 +1,123 @@
+import os
+import shutil
+import sys
+import tempfile
+
+from zoo.libs.utils import unittestBase
+from zoo.libs.plugin import plugin
+from zoo.libs.plugin import pluginmanager
+
+PLUGIN_MODULE = """from zoo.libs.plugin import plugin
+
+
+class IndexedPlugin(plugin.Plugin):
+    id = "test.indexedPlugin"
+    uiData = {"label": "Indexed"}
+"""
+
+HELPER_MODULE = """def helper():
+    return True
+"""
+
+HELPER_PLUGIN_MODULE = """from zoo.libs.plugin import plugin
+
+
+class HelperPlugin(plugin.Plugin):
+    id = "test.helperPlugin"
+"""
+
+
+class TestPluginIndex(unittestBase.BaseUnitest):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.pkg = os.path.join(self.root, "zooindextest", "plugins")
+        os.makedirs(self.pkg)
+        for folder in (os.path.dirname(self.pkg), self.pkg):
+            with open(os.path.join(folder, "__init__.py"), "w") as f:
+                f.write("")
+        self._write("plugincommands.py", PLUGIN_MODULE)
+        self._write("helpers.py", HELPER_MODULE)
+        self.indexPath = os.path.join(self.root, "cache", "index.json")
+        sys.path.insert(0, self.root)
+
+    def tearDown(self):
+        sys.path.remove(self.root)
+        self._flushModules()
+        shutil.rmtree(self.root)
+
+    def _write(self, name, content):
+        with open(os.path.join(self.pkg, name), "w") as f:
+            f.write(content)
+
+    def _flushModules(self):
+        for name in list(sys.modules.keys()):
+            if name.startswith("zooindextest"):
+                del sys.modules[name]
+
+    def _manager(self, lazy=False):
+        return pluginmanager.PluginManager(plugin.Plugin, variableName="id", indexPath=self.indexPath, lazy=lazy,
+                                           metadataAttributes=("uiData",))
+
+    def testIndexBuilt(self):
+        manager = self._manager()
+        manager.registerByPackage(self.pkg)
+        self.assertIn("test.indexedPlugin", manager.plugins)
+        self.assertTrue(os.path.exists(self.indexPath))
+        entry = manager.index.files[os.path.join(self.pkg, "plugincommands.py")]
+        self.assertEquals(entry["module"], "zooindextest.plugins.plugincommands")
+        self.assertEquals(entry["plugins"], [{"id": "test.indexedPlugin",
+                                              "className": "IndexedPlugin",
+                                              "metadata": {"uiData": {"label": "Indexed"}}}])
+
+    def testUnchangedModulesWithoutPluginsSkipImport(self):
+        self._manager().registerByPackage(self.pkg)
+        self._flushModules()
+        manager = self._manager()
+        manager.registerByPackage(self.pkg)
+        self.assertIn("test.indexedPlugin", manager.plugins)
+        self.assertNotIn("zooindextest.plugins.helpers", sys.modules)
+        self.assertFalse(manager.index.isDirty)
+
+    def testChangedFileInvalidatesOwnEntry(self):
+        self._manager().registerByPackage(self.pkg)
+        self._flushModules()
+        self._write("helpers.py", HELPER_PLUGIN_MODULE)
+        manager = self._manager()
+        pluginEntry = dict(manager.index.files[os.path.join(self.pkg, "plugincommands.py")])
+        manager.registerByPackage(self.pkg)
+        self.assertIn("test.helperPlugin", manager.plugins)
+        self.assertIn("test.indexedPlugin", manager.plugins)
+        self.assertEquals(manager.index.files[os.path.join(self.pkg, "plugincommands.py")], pluginEntry)
+
+    def testRemovedFileDropsEntry(self):
+        self._manager().registerByPackage(self.pkg)
+        self._flushModules()
+        os.remove(os.path.join(self.pkg, "helpers.py"))
+        manager = self._manager()
+        # directory mtime resolution can be coarse so force the package to be walked again
+        manager.index.packages[self.pkg]["directories"][self.pkg] = 0
+        manager.registerByPackage(self.pkg)
+        self.assertNotIn(os.path.join(self.pkg, "helpers.py"), manager.index.files)
+        self.assertIn("test.indexedPlugin", manager.plugins)
+
+    def testLazyRegistrationImportsOnFirstUse(self):
+        self._manager().registerByPackage(self.pkg)
+        self._flushModules()
+        manager = self._manager(lazy=True)
+        manager.registerByPackage(self.pkg)
+        proxy = manager.plugins["test.indexedPlugin"]
+        self.assertIsInstance(proxy, plugin.LazyPlugin)
+        self.assertEquals(proxy.uiData, {"label": "Indexed"})
+        self.assertNotIn("zooindextest.plugins.plugincommands", sys.modules)
+        classObj = manager.getPlugin("test.indexedPlugin")
+        self.assertIn("zooindextest.plugins.plugincommands", sys.modules)
+        self.assertEquals(classObj.__name__, "IndexedPlugin")
+        self.assertIs(manager.plugins["test.indexedPlugin"], classObj)
+
+    def testPrefetchedRegistrationRecordsTimings(self):
+        manager = pluginmanager.PluginManager(plugin.Plugin, variableName="id", discoveryThreads=4)
+        manager.registerByPackage(self.pkg)
+        self.assertIn("test.indexedPlugin", manager.plugins)
+        self.assertEquals(sorted(os.path.basename(p) for p in manager.moduleTimings),
+                          ["helpers.py", "plugincommands.py"])
+        self.assertEquals(len(manager.slowestModules(1)), 1)
@@ -0,0 +1,42 @@
+from zoo.libs.utils import unittestBase
+from zoo.libs.plugin import plugin
+from zoo.libs.plugin import pluginmanager
+
+
+class MayaRename(plugin.Plugin):
+    id = "maya.rename"
+
+
+class MayaDelete(plugin.Plugin):
+    id = "maya.delete"
+
+
+class StandaloneOpen(plugin.Plugin):
+    id = "standalone.open"
+
+
+class TestPluginManager(unittestBase.BaseUnitest):
+    def setUp(self):
+        self.manager = pluginmanager.PluginManager(plugin.Plugin, variableName="id")
+
+    def testRegisterMany(self):
+        registered = self.manager.registerMany([MayaRename, MayaDelete, StandaloneOpen, MayaRename, object])
+        self.assertEquals(registered, ["maya.rename", "maya.delete", "standalone.open"])
+        self.assertEquals(self.manager.pluginName(MayaDelete), "maya.delete")
+        self.assertIsNone(self.manager.registerPlugin(MayaRename))
+
+    def testGroups(self):
+        self.manager.registerMany([MayaRename, MayaDelete, StandaloneOpen])
+        self.assertEquals(self.manager.groups(), {"maya": [MayaRename, MayaDelete],
+                                                  "standalone": [StandaloneOpen]})
+        self.assertEquals(self.manager.group("maya"), [MayaRename, MayaDelete])
+
+    def testUnregisterMany(self):
+        self.manager.registerMany([MayaRename, MayaDelete, StandaloneOpen])
+        self.assertEquals(self.manager.unregisterMany(["maya.rename", "standalone.open", "missing"]),
+                          ["maya.rename", "standalone.open"])
+        self.assertEquals(list(self.manager.plugins.keys()), ["maya.delete"])
+        self.assertEquals(self.manager.groups(), {"maya": [MayaDelete]})
+        self.assertIsNone(self.manager.pluginName(MayaRename))
+        # can be registered again once removed
+        self.assertEquals(self.manager.registerPlugin(MayaRename), "maya.rename")
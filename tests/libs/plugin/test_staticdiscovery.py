@@ -0,0 +1,81 @@
+import os
+import sys
+import tempfile
+
+from zoo.libs.utils import unittestBase
+from zoo.libs.command import command
+from zoo.libs.plugin import plugin
+from zoo.libs.plugin import pluginmanager
+from zoo.libs.plugin import staticdiscovery
+from testdata import commanddata
+
+
+class TestStaticDiscovery(unittestBase.BaseUnitest):
+    def setUp(self):
+        self.package = os.path.dirname(commanddata.__file__)
+        self.commandsPath = os.path.join(self.package, "testcommands.py")
+
+    def _writeModule(self, content):
+        handle, path = tempfile.mkstemp(suffix=".py")
+        os.close(handle)
+        self.addTempFile(path)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def testDiscoverPlugins(self):
+        found = staticdiscovery.discoverPlugins([self.commandsPath], ["ZooCommand"])
+        self.assertEquals([info.className for info in found],
+                          ["TestCommandReg", "FailCommandArguments", "TestCommandUndoable",
+                           "TestCommandNotUndoable", "TestCommandThreadSafe"])
+        undoable = found[2]
+        self.assertEquals(undoable.attributes["id"], "test.testCommandUndoable")
+        self.assertTrue(undoable.attributes["isUndoable"])
+        self.assertEquals(undoable.filePath, self.commandsPath)
+
+    def testInheritedAttributes(self):
+        path = self._writeModule("""
+class Base(ZooCommand):
+    '''base docs'''
+    creator = "bob"
+    uiData = {"label": "base"}
+
+class Child(Base):
+    id = "child.command"
+    uiData = {"label": "child"}
+
+class NotAPlugin(object):
+    id = "nope"
+""")
+        found = staticdiscovery.discoverPlugins([path], ["ZooCommand"])
+        self.assertEquals([info.className for info in found], ["Base", "Child"])
+        self.assertEquals(found[1].attributes, {"id": "child.command", "creator": "bob",
+                                                "uiData": {"label": "child"}})
+        found = staticdiscovery.discoverPlugins([path], ["ZooCommand"],
+                                                {"ZooCommand": {"isEnabled": True, "creator": ""}})
+        self.assertEquals(found[0].attributes["creator"], "bob")
+        self.assertTrue(found[1].attributes["isEnabled"])
+        self.assertEquals(staticdiscovery.classAttributes(command.ZooCommand)["uiData"],
+                          command.ZooCommand.uiData)
+
+    def testStaticRegistrationDoesntImport(self):
+        moduleName = "testdata.commanddata.testcommands"
+        module = sys.modules.pop(moduleName, None)
+        try:
+            manager = pluginmanager.PluginManager(command.ZooCommand, variableName="id",
+                                                  metadataAttributes=("creator", "uiData", "__doc__"),
+                                                  discovery=pluginmanager.STATIC_DISCOVERY)
+            manager.registerByPackage(self.package)
+            self.assertNotIn(moduleName, sys.modules)
+            proxy = manager.plugins["test.testCommand"]
+            self.assertIsInstance(proxy, plugin.LazyPlugin)
+            self.assertEquals(proxy.creator, "davidsp")
+            self.assertEquals(proxy.moduleName, moduleName)
+            # uiData is only defined on the interface, it's read statically as well so it doesn't resolve the plugin
+            self.assertEquals(proxy.uiData, command.ZooCommand.uiData)
+            self.assertFalse(proxy.isResolved)
+            self.assertNotIn(moduleName, sys.modules)
+            self.assertEquals(manager.getPlugin("test.testCommand").__name__, "TestCommandReg")
+        finally:
+            if module is not None:
+                sys.modules[moduleName] = module
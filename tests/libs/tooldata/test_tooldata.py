@@ -3,8 +3,11 @@ import logging
 import tempfile
 import unittest
 import shutil
+import threading
+import time
 from collections import OrderedDict
 
+from zoo.libs.tooldata import settingswriter
 from zoo.libs.tooldata import tooldata
 logger = logging.getLogger(__name__)
 
@@ -56,6 +59,117 @@ class TestToolData(unittest.TestCase):
         self.assertEquals(newSettings["root"], toolsSetting["root"])
         self.assertEquals(newSettings["testdata"], {"bob": "hello"})
 
+    def test_findSettingCache(self):
+        self.toolset.addRoot(self.roots["user"], "user")
+        setting = self.toolset.createSetting(self.shaderEditorSetting, root="user",
+                                             data={"width": 100, "panels": {"left": [1]}})
+        setting.save()
+        found = self.toolset.findSetting(self.shaderEditorSetting)
+        # save updates the cache, each lookup is a new instance so unsaved changes aren't shared between callers
+        self.assertIsNot(found, setting)
+        self.assertEquals(found, setting)
+        found["width"] = 50
+        found["panels"]["left"].append(2)
+        cached = self.toolset.findSetting(self.shaderEditorSetting)
+        self.assertEquals(cached["width"], 100)
+        self.assertEquals(cached["panels"], {"left": [1]})
+
+        with open(setting.path(), "w") as f:
+            f.write('{"width": 250, "height": 10}')
+        changed = self.toolset.findSetting(self.shaderEditorSetting)
+        self.assertIsNot(changed, setting)
+        self.assertEquals(changed["width"], 250)
+
+        refreshed = self.toolset.refresh(self.shaderEditorSetting, root="user")
+        self.assertIsNot(refreshed, changed)
+        self.assertEquals(refreshed["height"], 10)
+        self.toolset.invalidate()
+        self.assertIsNot(self.toolset.findSetting(self.shaderEditorSetting), refreshed)
+
+    def test_rootIndex(self):
+        self._bindRoots()
+        internal = self.toolset.createSetting("tools/indexed/one", root="internal", data={"value": 1})
+        internal.save()
+        user = self.toolset.createSetting("tools/indexed/one", root="user", data={"value": 2})
+        user.save()
+        self.toolset.createSetting("tools/indexed/two", root="internal", data={}).save()
+        self.assertEquals(self.toolset.listSettings("tools/indexed"),
+                          [("tools/indexed/one.json", "user"), ("tools/indexed/two.json", "internal")])
+        self.assertEquals(self.toolset.findSetting("tools/indexed/one")["value"], 2)
+
+        # a file written by another process is found once the index is refreshed
+        newFile = os.path.join(self.roots["network"], "tools", "indexed", "three.json")
+        os.makedirs(os.path.dirname(newFile))
+        with open(newFile, "w") as f:
+            f.write("{}")
+        self.toolset.refreshIndex()
+        self.assertIn(("tools/indexed/three.json", "network"), self.toolset.listSettings("tools"))
+        shutil.rmtree(os.path.join(self.roots["network"], "tools"))
+        self.toolset.refreshIndex("network")
+        self.assertNotIn(("tools/indexed/three.json", "network"), self.toolset.listSettings("tools"))
+
+    def test_overrideAfterLookup(self):
+        self._bindRoots()
+        self.toolset.createSetting("tools/override/colours", root="internal", data={"value": 1}).save()
+        self.assertEquals(self.toolset.findSetting("tools/override/colours")["value"], 1)
+        # written by another process into a higher priority root straight after the first lookup
+        override = os.path.join(self.roots["user"], "tools", "override", "colours.json")
+        os.makedirs(os.path.dirname(override))
+        with open(override, "w") as f:
+            f.write('{"value": 2}')
+        self.assertEquals(self.toolset.findSetting("tools/override/colours")["value"], 2)
+        os.remove(override)
+        self.assertEquals(self.toolset.findSetting("tools/override/colours")["value"], 1)
+
+    def test_saveAtomicSkipUnchanged(self):
+        self.toolset.addRoot(self.roots["user"], "user")
+        setting = self.toolset.createSetting("tools/autosave/state", root="user", data={"presets": [1, 2, 3]})
+        setting.save()
+        inode = os.stat(setting.path()).st_ino
+        setting.save(skipUnchanged=True)
+        self.assertEquals(os.stat(setting.path()).st_ino, inode)
+        setting["presets"].append(4)
+        setting.save(skipUnchanged=True)
+        # atomic saves replace the file so a write always produces a new inode
+        self.assertNotEquals(os.stat(setting.path()).st_ino, inode)
+        self.assertEquals(os.listdir(os.path.dirname(str(setting.path()))), ["state.json"])
+        loaded = self.toolset.refresh("tools/autosave/state", root="user")
+        self.assertEquals(loaded["presets"], [1, 2, 3, 4])
+        self.assertNotIn("root", tooldata.filesystem.loadJson(setting.path()))
+        # a freshly loaded setting knows its content so the first unchanged autosave is skipped as well
+        inode = os.stat(setting.path()).st_ino
+        self.toolset.findSetting("tools/autosave/state").save(skipUnchanged=True)
+        self.assertEquals(os.stat(setting.path()).st_ino, inode)
+        os.chmod(setting.path(), 0o600)
+        loaded["presets"] = []
+        loaded.save()
+        self.assertEquals(os.stat(setting.path()).st_mode & 0o777, 0o600)
+
+    def test_backgroundSave(self):
+        self.toolset.addRoot(self.roots["user"], "user")
+        setting = self.toolset.createSetting("tools/background/slider", root="user", data={"value": 0})
+        writer = settingswriter.enable(delay=60)
+        try:
+            for value in xrange(5):
+                setting["value"] = value
+                setting.save()
+            self.assertEquals(writer.pending(), 1)
+            self.assertFalse(os.path.exists(str(setting.path())))
+            writer.flush()
+            self.assertEquals(tooldata.filesystem.loadJson(str(setting.path())), {"value": 4})
+
+            writer.delay = 0.01
+            setting["value"] = 10
+            setting.save()
+            for _ in xrange(200):
+                if not writer.pending():
+                    break
+                time.sleep(0.01)
+        finally:
+            settingswriter.disable()
+        self.assertIsNone(settingswriter.activeWriter())
+        self.assertEquals(tooldata.filesystem.loadJson(str(setting.path())), {"value": 10})
+
     @classmethod
     def tearDownClass(cls):
         for i in (cls.rootOne,
@@ -63,3 +177,63 @@ class TestToolData(unittest.TestCase):
                   cls.rootThree):
             if os.path.exists(i):
                 shutil.rmtree(i)
+
+
+class _FakeSetting(object):
+    def __init__(self, error=None):
+        self.error = error
+        self.writes = 0
+
+    def path(self):
+        return "fake.json"
+
+    def _write(self, **kwargs):
+        self.writes += 1
+        if self.error is not None:
+            raise self.error
+
+
+class _PausedWriteLock(object):
+    """Holds the background thread after it has taken saves off the queue but before it starts writing them.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.paused = threading.Event()
+        self.resume = threading.Event()
+
+    def __enter__(self):
+        if threading.current_thread().name == "zooSettingsWriter":
+            self.paused.set()
+            self.resume.wait(5)
+        self.lock.acquire()
+
+    def __exit__(self, *args):
+        self.lock.release()
+
+
+class TestSettingsWriter(unittest.TestCase):
+    def testFlushWaitsForBackgroundWrite(self):
+        writer = settingswriter.SettingsWriter(delay=0)
+        writeLock = writer._writeLock = _PausedWriteLock()
+        setting = _FakeSetting()
+        writer.schedule(setting)
+        self.assertTrue(writeLock.paused.wait(5))
+        flushing = threading.Thread(target=writer.flush)
+        flushing.start()
+        flushing.join(0.1)
+        self.assertTrue(flushing.is_alive())
+        writeLock.resume.set()
+        flushing.join(5)
+        self.assertFalse(flushing.is_alive())
+        self.assertEquals(setting.writes, 1)
+        writer.stop()
+
+    def testRetriesAreLimited(self):
+        writer = settingswriter.SettingsWriter(delay=60)
+        setting = _FakeSetting(RuntimeError("dictionary changed size during iteration"))
+        writer.schedule(setting)
+        writer.flush()
+        self.assertEquals(setting.writes, writer.maxRetries + 1)
+        self.assertEquals(writer.pending(), 0)
+        writer.stop()
@@ -0,0 +1,90 @@
+import errno
+import json
+import os
+import shutil
+import tempfile
+
+from zoo.libs.utils import unittestBase
+from zoo.libs.utils import copyengine
+from zoo.libs.utils import filesystem
+
+
+class TestCopyEngine(unittestBase.BaseUnitest):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.source = os.path.join(self.root, "source")
+        self.destination = os.path.join(self.root, "publish")
+        os.makedirs(self.source)
+        self.paths = []
+        for i in xrange(12):
+            sourcePath = os.path.join(self.source, "texture{}.tx".format(i))
+            with open(sourcePath, "wb") as f:
+                f.write(os.urandom(1000 + i * 4096))
+            self.paths.append((sourcePath, os.path.join(self.destination, "sub{}".format(i % 3),
+                                                        "texture{}.tx".format(i))))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _assertCopied(self, paths):
+        for source, destination in paths:
+            with open(source, "rb") as s, open(destination, "rb") as d:
+                self.assertEquals(s.read(), d.read())
+
+    def testParallelCopyWithProgress(self):
+        progress = []
+        engine = copyengine.CopyEngine(workers=4, verify=True, chunkSize=4096,
+                                       totalProgress=lambda copied, total: progress.append((copied, total)))
+        result = engine.copy(self.paths)
+        self.assertEquals(len(result.copied), len(self.paths))
+        self.assertEquals(result.failed, [])
+        self.assertEquals(progress[-1], (result.totalBytes, result.totalBytes))
+        self._assertCopied(self.paths)
+        leftovers = [f for _, _, files in os.walk(self.destination) for f in files if f.endswith(".part")]
+        self.assertEquals(leftovers, [])
+
+    def testRetriesTransientErrors(self):
+        engine = copyengine.CopyEngine(workers=2, retryDelay=0)
+        copyData = engine._copyData
+        failures = set()
+
+        def flakyCopy(source, *args):
+            if source not in failures:
+                failures.add(source)
+                raise IOError(errno.EIO, "Transient network error", source)
+            return copyData(source, *args)
+
+        engine._copyData = flakyCopy
+        result = engine.copy(self.paths)
+        self.assertEquals(result.failed, [])
+        self.assertEquals(result.bytesCopied, result.totalBytes)
+        self._assertCopied(self.paths)
+
+    def testPermanentErrorsFailWithoutRetrying(self):
+        engine = copyengine.CopyEngine(workers=2, retryDelay=0)
+        attempts = []
+
+        def deniedCopy(source, *args):
+            attempts.append(source)
+            raise IOError(errno.EACCES, "Permission denied", source)
+
+        engine._copyData = deniedCopy
+        result = engine.copy(self.paths[:2])
+        self.assertEquals(len(result.failed), 2)
+        self.assertEquals(len(attempts), 2)
+
+    def testJournalResume(self):
+        journalPath = os.path.join(self.root, "journal", "copy.journal")
+        missing = (os.path.join(self.source, "missing.tx"), os.path.join(self.destination, "missing.tx"))
+        failed = filesystem.batchCopyFiles(self.paths + [missing], journalPath=journalPath)
+        self.assertEquals(failed, [missing])
+        with open(journalPath) as f:
+            self.assertEquals(len([json.loads(line) for line in f]), len(self.paths))
+
+        with open(missing[0], "wb") as f:
+            f.write("late file")
+        result = copyengine.CopyEngine(journalPath=journalPath).copy(self.paths + [missing])
+        self.assertEquals(result.copied, [missing])
+        self.assertEquals(len(result.skipped), len(self.paths))
+        # a completed batch removes its journal
+        self.assertFalse(os.path.exists(journalPath))
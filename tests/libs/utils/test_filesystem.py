@@ -0,0 +1,260 @@
+import json
+import os
+import shutil
+import tempfile
+
+from zoo.libs.utils import unittestBase
+from zoo.libs.utils import filesystem
+
+
+class TestJson(unittestBase.BaseUnitest):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.data = {"name": u"config", "values": [1, 2.5, None, True], "nested": {"a": {"b": [u"\xe9"]}}}
+
+    def tearDown(self):
+        filesystem.setJsonBackend()
+        shutil.rmtree(self.root)
+
+    def testSaveJsonMatchesStdlib(self):
+        for kwargs in ({}, {"indent": 2}, {"sort_keys": True, "indent": 4}):
+            filePath = os.path.join(self.root, "data.json")
+            filesystem.saveJson(self.data, filePath, **kwargs)
+            expected = os.path.join(self.root, "expected.json")
+            with open(expected, "w") as f:
+                json.dump(self.data, f, **kwargs)
+            with open(filePath, "rb") as f, open(expected, "rb") as e:
+                self.assertEquals(f.read(), e.read())
+
+    def testJsonBackend(self):
+        filesystem.registerJsonBackend("testBackend", lambda text: {"decodedBy": "testBackend"})
+        self.assertEquals(filesystem.setJsonBackend("testBackend"), "testBackend")
+        filePath = os.path.join(self.root, "data.json")
+        filesystem.saveJson(self.data, filePath)
+        self.assertEquals(filesystem.loadJson(filePath), {"decodedBy": "testBackend"})
+        with self.assertRaises(ValueError):
+            filesystem.setJsonBackend("missingBackend")
+        self.assertEquals(filesystem.setJsonBackend("json"), "json")
+        self.assertEquals(filesystem.loadJson(filePath), self.data)
+
+    def testDefaultJsonBackend(self):
+        environ = os.environ.pop("ZOO_JSON_BACKEND", None)
+        try:
+            self.assertEquals(filesystem.setJsonBackend(), "json")
+            os.environ["ZOO_JSON_BACKEND"] = "missingBackend"
+            self.assertEquals(filesystem.setJsonBackend(), "json")
+        finally:
+            os.environ.pop("ZOO_JSON_BACKEND", None)
+            if environ is not None:
+                os.environ["ZOO_JSON_BACKEND"] = environ
+
+    def testJsonBackendsMatchStdlib(self):
+        document = json.dumps({"text": u"caf\xe9 \u2603 \"quoted\"\n", "floats": [0.1, 1e-7, 123456.789, -2.5e300],
+                               "ints": [0, -1, 2 ** 62], "nested": [{"a": None, "b": [True, False, {}]}],
+                               "empty": ""})
+        expected = json.loads(document)
+        for backend in ("json",) + filesystem.JSON_BACKENDS:
+            try:
+                filesystem.setJsonBackend(backend)
+            except ValueError:
+                continue
+            self.assertEquals(filesystem.decodeJson(document), expected, msg=backend)
+
+    def testLoadJsonMany(self):
+        paths = []
+        for i in xrange(10):
+            filePath = os.path.join(self.root, "data{}.json".format(i))
+            filesystem.saveJson({"index": i}, filePath)
+            paths.append(filePath)
+        self.assertEquals(filesystem.loadJsonMany(paths), [{"index": i} for i in xrange(10)])
+        self.assertEquals(filesystem.loadJsonMany(paths, threads=1), [{"index": i} for i in xrange(10)])
+        with self.assertRaises(IOError):
+            filesystem.loadJsonMany(paths + [os.path.join(self.root, "missing.json")])
+
+
+class TestStreamingJson(unittestBase.BaseUnitest):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.data = {"meta": {"version": 2, "path/with~chars": "escaped"},
+                     "items": [{"name": "item{}".format(i), "note": "has \"quotes\" \\ and [brackets] {}",
+                                "values": [i, i * 0.5, None, True, {"deep": [[], {}]}]} for i in xrange(20)],
+                     "empty": []}
+        self.filePath = os.path.join(self.root, "manifest.json")
+        filesystem.saveJson(self.data, self.filePath, indent=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def testIterJson(self):
+        self.assertEquals(list(filesystem.iterJson(self.filePath, "/items")), self.data["items"])
+        self.assertEquals(dict(filesystem.iterJson(self.filePath)), self.data)
+        self.assertEquals(list(filesystem.iterJson(self.filePath, "/empty")), [])
+        with self.assertRaises(ValueError):
+            list(filesystem.iterJson(self.filePath, "/meta/version"))
+
+    def testLoadJsonPointer(self):
+        self.assertEquals(filesystem.loadJsonPointer(self.filePath, "/items/7/name"), "item7")
+        self.assertEquals(filesystem.loadJsonPointer(self.filePath, "/items/3/values/4"), {"deep": [[], {}]})
+        self.assertEquals(filesystem.loadJsonPointer(self.filePath, "/meta/path~1with~0chars"), "escaped")
+        self.assertEquals(filesystem.loadJsonPointer(self.filePath, ""), self.data)
+        with self.assertRaises(KeyError):
+            filesystem.loadJsonPointer(self.filePath, "/items/20")
+
+
+class TestCopyFile(unittestBase.BaseUnitest):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.source = os.path.join(self.root, "source.bin")
+        self.data = os.urandom(300000)
+        with open(self.source, "wb") as f:
+            f.write(self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def testCopyFileData(self):
+        destination = os.path.join(self.root, "destination.bin")
+        for method in filesystem.COPY_METHODS:
+            copied = []
+            try:
+                usedMethod = filesystem.copyFileData(self.source, destination, methods=[method], chunkSize=65536,
+                                                     progress=copied.append)
+            except OSError:
+                # reflink and the kernel copies depend on the platform and filesystem
+                self.assertNotEquals(method, "python")
+                continue
+            self.assertEquals(usedMethod, method)
+            self.assertEquals(sum(copied), len(self.data))
+            with open(destination, "rb") as f:
+                self.assertEquals(f.read(), self.data)
+
+    def testCopyFileKeepsPermissions(self):
+        os.chmod(self.source, 0751)
+        filesystem.copyFile(self.source, os.path.join(self.root, "sub", "folder") + os.sep)
+        destination = os.path.join(self.root, "sub", "folder", "source.bin")
+        with open(destination, "rb") as f:
+            self.assertEquals(f.read(), self.data)
+        if os.name == "posix":
+            self.assertEquals(os.stat(destination).st_mode & 0777, 0751)
+
+    def testCopyFileToItself(self):
+        with self.assertRaises(shutil.Error):
+            filesystem.copyFile(self.source, self.source)
+        if hasattr(os, "link"):
+            link = os.path.join(self.root, "link.bin")
+            os.link(self.source, link)
+            with self.assertRaises(shutil.Error):
+                filesystem.copyFileData(self.source, link)
+        with open(self.source, "rb") as f:
+            self.assertEquals(f.read(), self.data)
+
+    def testKernelCopyWhichCopiesNothing(self):
+        # the first empty chunk falls back to the next method, a later one means the copy came up short
+        with self.assertRaises(OSError) as context:
+            filesystem._kernelCopyLoop(lambda count: 0, 100, 10, None)
+        self.assertIn(context.exception.errno, filesystem._UNSUPPORTED_ERRNOS)
+        chunks = iter([10, 0])
+        with self.assertRaises(IOError):
+            filesystem._kernelCopyLoop(lambda count: next(chunks), 100, 10, None)
+
+
+class TestFolderSize(unittestBase.BaseUnitest):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.expected = 0
+        for index in range(12):
+            folder = os.path.join(self.root, "asset{}".format(index % 4), "sub{}".format(index % 3))
+            filesystem.ensureFolderExists(folder)
+            with open(os.path.join(folder, "file{}.bin".format(index)), "wb") as f:
+                f.write(b"x" * (index * 100 + 1))
+            self.expected += index * 100 + 1
+
+    def tearDown(self):
+        filesystem.clearFolderSizeCache()
+        shutil.rmtree(self.root)
+
+    def testFolderSize(self):
+        self.assertEquals(filesystem.folderSize(self.root), self.expected)
+        self.assertEquals(filesystem.folderSize(self.root, threads=4), self.expected)
+
+    def testFolderSizeCache(self):
+        folder = os.path.join(self.root, "asset1", "sub2")
+        # make sure the folder mtime changes on filesystems with a coarse mtime resolution
+        os.utime(folder, (0, 0))
+        self.assertEquals(filesystem.folderSize(self.root, useCache=True), self.expected)
+        with open(os.path.join(folder, "new.bin"), "wb") as f:
+            f.write(b"x" * 50)
+        self.assertEquals(filesystem.folderSize(self.root, threads=2, useCache=True), self.expected + 50)
+        filesystem.clearFolderSizeCache(self.root)
+        self.assertEquals(filesystem.folderSize(self.root, useCache=True), self.expected + 50)
+
+    def testDirectoryTreeToDict(self):
+        for threads in (1, 4):
+            tree = filesystem.directoryTreeToDict(self.root, threads=threads)
+            self.assertEquals(tree["type"], "directory")
+            self.assertEquals(sorted(child["name"] for child in tree["children"]),
+                              ["asset0", "asset1", "asset2", "asset3"])
+            asset = [child for child in tree["children"] if child["name"] == "asset0"][0]
+            files = [leaf for sub in asset["children"] for leaf in sub["children"]]
+            self.assertTrue(all(leaf["type"] == "file" for leaf in files))
+            self.assertEquals(len(files), 3)
+
+
+class TestSyncDirectory(unittestBase.BaseUnitest):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.source = os.path.join(self.root, "package")
+        self.destination = os.path.join(self.root, "publish")
+        for index in range(6):
+            folder = os.path.join(self.source, "textures" if index % 2 else "scripts")
+            filesystem.ensureFolderExists(folder)
+            with open(os.path.join(folder, "file{}.bin".format(index)), "wb") as f:
+                f.write(os.urandom(1000 + index))
+        with open(os.path.join(self.source, "scripts", "cache.pyc"), "wb") as f:
+            f.write(b"compiled")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+        cachePath = filesystem.syncCachePath(self.destination)
+        if os.path.exists(cachePath):
+            os.remove(cachePath)
+
+    def testSync(self):
+        result = filesystem.copyDirectoy(self.source, self.destination, ignorePattern=["*.pyc"], sync=True)
+        self.assertEquals((len(result.copied), len(result.skipped), len(result.deleted)), (6, 0, 0))
+        self.assertFalse(os.path.exists(os.path.join(self.destination, "scripts", "cache.pyc")))
+        self.assertFalse(os.path.exists(filesystem.syncCachePath(self.destination)))
+
+        changed = os.path.join(self.source, "textures", "file1.bin")
+        with open(changed, "ab") as f:
+            f.write(b"changed")
+        os.remove(os.path.join(self.source, "scripts", "file2.bin"))
+        # ignored files in the destination are never deleted
+        ignored = os.path.join(self.destination, "scripts", "local.pyc")
+        with open(ignored, "wb") as f:
+            f.write(b"compiled")
+        result = filesystem.syncDirectory(self.source, self.destination, ignorePattern=["*.pyc"], delete=True)
+        self.assertEquals(result.copied, ["textures/file1.bin"])
+        self.assertEquals(len(result.skipped), 4)
+        self.assertEquals(result.deleted, ["scripts/file2.bin"])
+        self.assertTrue(os.path.exists(ignored))
+        with open(changed, "rb") as s, open(os.path.join(self.destination, "textures", "file1.bin"), "rb") as d:
+            self.assertEquals(s.read(), d.read())
+
+    def testSyncHashCheck(self):
+        filesystem.syncDirectory(self.source, self.destination, hashCheck=True)
+        # the cache is kept outside of the destination so it's never published
+        self.assertEquals(sorted(os.listdir(self.destination)), ["scripts", "textures"])
+        cachePath = filesystem.syncCachePath(self.destination)
+        self.assertEquals(len(filesystem.loadJson(cachePath)["destination"]), 7)
+        # touching a file without changing it is skipped by the hash, a same size edit is copied
+        touched = os.path.join(self.source, "scripts", "file0.bin")
+        os.utime(touched, (1000, 1000))
+        edited = os.path.join(self.source, "scripts", "cache.pyc")
+        with open(edited, "wb") as f:
+            f.write(b"COMPILED")
+        os.utime(edited, (2000, 2000))
+        result = filesystem.syncDirectory(self.source, self.destination, hashCheck=True)
+        self.assertEquals(result.copied, ["scripts/cache.pyc"])
+        self.assertEquals(len(result.skipped), 6)
+        self.assertEquals(os.path.getmtime(os.path.join(self.destination, "scripts", "file0.bin")), 1000)
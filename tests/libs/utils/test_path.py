@@ -0,0 +1,57 @@
+import copy
+import pickle
+
+from zoo.libs.utils import unittestBase
+from zoo.libs.utils import path
+
+
+class TestPathParseCache(unittestBase.BaseUnitest):
+    def tearDown(self):
+        path.clearParseCache()
+
+    def testMatchesResolveAndSplit(self):
+        for filePath in ("/projects/zoo/prefs/../tools/settings.json", "C:\\Users\\artist\\\\zoo\\",
+                         "//server/share/asset.ma", ""):
+            resolvedPath, tokens, isUnc = path.resolveAndSplit(filePath)
+            for _ in range(2):
+                p = path.Path(filePath)
+                self.assertEquals(str(p), resolvedPath)
+                self.assertEquals(p.split(), tokens)
+                self.assertEquals(p.isUNC, isUnc)
+        self.assertIs(path.Path("/projects/zoo")._splits, path.Path("/projects/zoo")._splits)
+
+    def testEnvironmentChangesInvalidate(self):
+        env = {"ZOO_ROOT": "/projects/%ZOO_SHOW%", "ZOO_SHOW": "showA"}
+        self.assertEquals(str(path.Path("%ZOO_ROOT%/tools", envDict=env)), "/projects/showA/tools")
+        env["ZOO_SHOW"] = "showB"
+        self.assertEquals(str(path.Path("%ZOO_ROOT%/tools", envDict=env)), "/projects/showB/tools")
+        self.assertEquals(str(path.Path("%ZOO_ROOT%/tools", envDict={})), "%ZOO_ROOT%/tools")
+
+    def testCompactLayout(self):
+        plain = path.Path("C:/Users/artist/zoo/")
+        self.assertFalse(hasattr(plain, "__dict__"))
+        self.assertIs(plain.split()[1], path.Path("/var/Users").split()[2])
+        # paths which aren't already resolved keep the string they were created with
+        windows = path.Path("C:\\Users\\artist\\zoo\\")
+        self.assertEquals(windows, plain)
+        self.assertEquals(windows.unresolved(), "C:\\Users\\artist\\zoo\\")
+        self.assertEquals(path.Path("a\\b").unresolved(), "a\\b")
+        env = path.Path("%ZOO_ROOT%/tools", envDict={"ZOO_ROOT": "/projects"})
+        self.assertEquals(env.unresolved(), "%ZOO_ROOT%/tools")
+        for p in (plain, windows, env, path.Path("//server/share/", caseMatters=True)):
+            for other in (copy.deepcopy(p), pickle.loads(pickle.dumps(p, 2))):
+                self.assertEquals(str(other), str(p))
+                self.assertEquals(other.unresolved(), p.unresolved())
+                self.assertEquals((other.isUNC, other.hasTrailing, other.caseMatters),
+                                  (p.isUNC, p.hasTrailing, p.caseMatters))
+
+    def testResolveMany(self):
+        env = {"ZOO_ROOT": "/projects/%ZOO_SHOW%", "ZOO_SHOW": "showA"}
+        paths = ["/projects/zoo/prefs/../tools/settings.json", "C:\\Users\\artist\\\\zoo\\", "//server/share/a.ma",
+                 "//server/share/b.ma", "%ZOO_ROOT%/shot/%ZOO_SHOW%.ma", "%ZOO_ROOT%/shot/", "relative", "/root.txt",
+                 "../../up/file.txt"]
+        results = path.resolveMany(paths, env)
+        for filePath, (resolvedPath, tokens, isUnc) in zip(paths, results):
+            expected = path.resolveAndSplit(filePath, env)
+            self.assertEquals((resolvedPath, list(tokens), isUnc), expected)
+        self.assertIs(results[2][1][0], results[3][1][0])
@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import zipfile
+
+from zoo.libs.utils import unittestBase
+from zoo.libs.utils import filesystem
+from zoo.libs.utils import ziparchive
+
+
+class TestZipArchive(unittestBase.BaseUnitest):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.source = os.path.join(self.root, "package")
+        os.makedirs(os.path.join(self.source, "icons"))
+        self.files = []
+        for i in xrange(10):
+            sourcePath = os.path.join(self.source, "icons" if i % 2 else "", "file{}.bin".format(i))
+            with open(sourcePath, "wb") as f:
+                # half random half repeated so the members compress by different amounts
+                f.write(os.urandom(2000 * i) + b"zoo" * 3000 * i)
+            self.files.append((sourcePath, os.path.relpath(sourcePath, self.source)))
+        self.files.append((os.path.join(self.source, "icons"), "icons"))
+        self.totalBytes = sum(os.path.getsize(p) for p, _ in self.files if not os.path.isdir(p))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def testRoundTrip(self):
+        zipPath = os.path.join(self.root, "dist", "package.zip")
+        for compression in (zipfile.ZIP_DEFLATED, zipfile.ZIP_STORED):
+            for workers in (1, 4):
+                progress = []
+                infos = ziparchive.writeZip(zipPath, self.files, workers=workers, compression=compression,
+                                            chunkSize=4096, spoolSize=8192,
+                                            progress=lambda done, total: progress.append((done, total)))
+                self.assertEquals([i.filename for i in infos],
+                                  [name.replace(os.sep, "/") for _, name in self.files[:-1]] + ["icons/"])
+                self.assertEquals(progress[-1], (self.totalBytes, self.totalBytes))
+                # reported per chunk written rather than per member
+                self.assertGreater(len(progress), len(self.files))
+                with zipfile.ZipFile(zipPath) as archive:
+                    self.assertIsNone(archive.testzip())
+
+                destination = os.path.join(self.root, "extracted")
+                extractProgress = []
+                ziparchive.extractZip(zipPath, destination, workers=workers, chunkSize=4096,
+                                      progress=lambda done, total: extractProgress.append((done, total)))
+                self.assertEquals(extractProgress[-1], (self.totalBytes, self.totalBytes))
+                for sourcePath, name in self.files[:-1]:
+                    with open(sourcePath, "rb") as s, open(os.path.join(destination, name), "rb") as d:
+                        self.assertEquals(s.read(), d.read())
+                shutil.rmtree(destination)
+
+    def testCompressionLevel(self):
+        sizes = []
+        for level in (0, 9):
+            zipPath = os.path.join(self.root, "level{}.zip".format(level))
+            infos = ziparchive.writeZip(zipPath, self.files[:-1], workers=4, level=level)
+            sizes.append(sum(info.compress_size for info in infos))
+            with zipfile.ZipFile(zipPath) as archive:
+                self.assertIsNone(archive.testzip())
+        self.assertGreater(sizes[0], sizes[1])
+
+    def testExtractStaysInDestination(self):
+        zipPath = os.path.join(self.root, "unsafe.zip")
+        with zipfile.ZipFile(zipPath, "w") as archive:
+            archive.writestr("../../outside.txt", "data")
+        destination = os.path.join(self.root, "extracted")
+        paths = ziparchive.extractZip(zipPath, destination)
+        self.assertEquals(paths, [os.path.join(destination, "outside.txt")])
+        self.assertTrue(os.path.exists(paths[0]))
+
+    def testCreateZipAndZipwalk(self):
+        zipPath = os.path.join(self.root, "package.zip")
+        filesystem.createZip(zipPath, self.files[:-1])
+        walked = {}
+        for info, data in filesystem.zipwalk(zipPath):
+            data.seek(0)
+            walked[info.filename] = data.read()
+        streamed = dict((info.filename, data.read()) for info, data in filesystem.zipwalk(zipPath, stream=True))
+        self.assertEquals(streamed, walked)
+        for sourcePath, name in self.files[:-1]:
+            with open(sourcePath, "rb") as f:
+                self.assertEquals(walked[name.replace(os.sep, "/")], f.read())
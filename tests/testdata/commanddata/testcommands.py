@@ -49,3 +49,21 @@ class TestCommandNotUndoable(command.ZooCommand):
 
     def undoIt(self):
         self.value = ""
+
+
+class TestCommandThreadSafe(command.ZooCommand):
+    id = "test.testCommandThreadSafe"
+    creator = "davidsp"
+    isUndoable = True
+    isEnabled = True
+    isThreadSafe = True
+    value = ""
+
+    def doIt(self, value="hello", fail=False):
+        if fail:
+            raise ValueError("failed: {}".format(value))
+        self.value = value
+        return value
+
+    def undoIt(self):
+        self.value = ""
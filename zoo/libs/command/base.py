@@ -1,25 +1,66 @@
 import inspect
+import multiprocessing
 import os
+import pickle
 import sys
+import threading
 import time
 import traceback
 from collections import deque
+from functools import partial
+from multiprocessing.pool import ThreadPool
 
 from zoo.libs.command import command
 from zoo.libs.command import errors
+from zoo.libs.command import telemetry
 from zoo.libs.plugin import pluginmanager
 from zoo.libs.utils import env
+from zoo.libs.utils import zlogging
+
+logger = zlogging.getLogger(__name__)
+
+# static command class attributes which are available on lazy commands without importing the command module
+COMMAND_METADATA = ("creator", "isUndoable", "isEnabled", "uiData", "__doc__")
 
 
 class ExecutorBase(object):
-    def __init__(self):
-        self.undoStack = deque()
-        self.redoStack = deque()
-        self.registry = pluginmanager.PluginManager(command.ZooCommand, variableName="id")
+    """
+    :param undoLimit: The maximum number of entries on the undo and redo stacks, 0 is unlimited.
+    :type undoLimit: int
+    :param undoMemoryLimit: The maximum estimated memory in bytes for each stack, 0 is unlimited, see \
+    :meth:`zoo.libs.command.command.CommandInterface.undoPayloadSize`.
+    :type undoMemoryLimit: int
+    :param keepReturnResults: If False the doIt return value is released once a command is on the undo stack.
+    :type keepReturnResults: bool
+    :param asyncWorkers: The number of workers used by executeAsync().
+    :type asyncWorkers: int
+    :param asyncProcesses: If True executeAsync() runs commands on a process pool instead of a thread pool.
+    :type asyncProcesses: bool
+    """
+
+    def __init__(self, undoLimit=0, undoMemoryLimit=0, keepReturnResults=True, asyncWorkers=4,
+                 asyncProcesses=False):
+        self.undoStack = CommandStack(undoLimit, undoMemoryLimit, keepReturnResults=keepReturnResults)
+        self.redoStack = CommandStack(undoLimit, undoMemoryLimit)
+        self.asyncWorkers = asyncWorkers
+        self.asyncProcesses = asyncProcesses
+        self._asyncPool = None
+        # optional on disk discovery cache, avoids importing the entire command library on every startup, when
+        # enabled the commands are registered lazily and only imported on first execution
+        indexPath = os.environ.get("ZOO_COMMAND_INDEX")
+        self.registry = pluginmanager.PluginManager(command.ZooCommand, variableName="id",
+                                                    indexPath=indexPath,
+                                                    lazy=bool(indexPath),
+                                                    metadataAttributes=COMMAND_METADATA)
         self.registry.registerByEnv("ZOO_COMMAND_LIB")
 
     @property
     def commands(self):
+        """Returns all registered commands, lazy commands are returned as
+        :class:`zoo.libs.plugin.plugin.LazyPlugin` proxies which provide the id and static metadata without importing.
+
+        :rtype: dict
+        """
         return self.registry.plugins
 
     def execute(self, name, *args, **kwargs):
@@ -40,6 +81,7 @@ class ExecutorBase(object):
         exc_type = None
         exc_value = None
         result = None
+        command.stats.start()
         try:
             result = self._callDoIt(command)
         except errors.UserCancel:
@@ -60,6 +102,199 @@ class ExecutorBase(object):
             command.stats.finish(tb)
             return result
 
+    def executeBatch(self, commandId, argumentsList):
+        """Executes the same command once for each set of keyword arguments, see executeMany().
+
+        .. code-block:: python
+
+            executor.executeBatch("maya.rename", [{"node": n, "name": "{}_geo".format(n)} for n in nodes])
+
+        :param commandId: The command id to execute.
+        :type commandId: str
+        :param argumentsList: A sequence of keyword argument dicts, one per execution.
+        :type argumentsList: iterable(dict)
+        :return: The result of each execution, None for disabled or cancelled executions.
+        :rtype: list
+        :raise: :class:`errors.CommandBatchError`
+        """
+        return self.executeMany((commandId, arguments) for arguments in argumentsList)
+
+    def executeMany(self, commands):
+        """Executes a sequence of commands as a single operation.
+
+        Each command class is resolved once for the whole batch, every execution has its own CommandStats so the
+        telemetry records one sample per executed command. All undoable commands which executed are added to the
+        undo stack as one :class:`CompoundCommand` so undoLast() reverts the entire batch.
+
+        If a command fails then the batch stops and a :class:`errors.CommandBatchError` is raised with the index of
+        the failing item, the commands which already executed remain on the undo stack as one entry.
+
+        :param commands: A sequence of (commandId, kwargs) pairs.
+        :type commands: iterable(tuple(str, dict))
+        :return: The result of each execution, None for disabled or cancelled executions.
+        :rtype: list
+        :raise: :class:`errors.CommandBatchError`
+        """
+        classes = {}
+        executed = []
+        results = []
+        try:
+            for index, (commandId, arguments) in enumerate(commands):
+                commandClass = classes.get(commandId)
+                if commandClass is None:
+                    commandClass = self.registry.getPlugin(commandId)
+                    if commandClass is None:
+                        raise errors.CommandBatchError("No command by the name -> {} exists within the "
+                                                       "registry!".format(commandId), index, commandId)
+                    classes[commandId] = commandClass
+                if not commandClass.isEnabled:
+                    results.append(None)
+                    continue
+                cmd = commandClass(CommandStats(commandClass))
+                try:
+                    cmd._prepareCommand()
+                    cmd._resolveArguments(arguments or {})
+                    cmd.stats.start()
+                    result = self._callDoIt(cmd)
+                except errors.UserCancel:
+                    cmd.stats.finish(None)
+                    results.append(None)
+                    continue
+                except Exception as er:
+                    exc_type, exc_value, exc_tb = sys.exc_info()
+                    traceback.print_exception(exc_type, exc_value, exc_tb)
+                    cmd.stats.finish(traceback.format_exception(exc_type, exc_value, exc_tb))
+                    raise errors.CommandBatchError("Command: {} failed at batch index: {}, {}".format(commandId,
+                                                                                                      index, er),
+                                                   index, commandId, errors=er)
+                cmd.stats.finish(None)
+                if cmd.isUndoable:
+                    executed.append(cmd)
+                results.append(result)
+        finally:
+            if executed:
+                self.undoStack.append(CompoundCommand(executed))
+        return results
+
+    def executeAsync(self, name, **kwargs):
+        """Executes the command on the async worker pool and returns immediately.
+
+        Only commands with isThreadSafe set to True are run on the pool, any other command is executed immediately
+        on the calling thread via execute(). The command arguments are resolved on the calling thread, once doIt
+        finishes the command stats are completed and undoable commands are added to the undo stack in completion
+        order.
+
+        When the executor uses a process pool the command instance is pickled to the worker process and back, so
+        the command class, arguments and any state set by doIt must be picklable, otherwise the future fails with the
+        pickling error.
+
+        .. code-block:: python
+
+            future = executor.executeAsync("publish.copyFiles", paths=paths)
+            future.addDoneCallback(lambda f: logger.info(f.result()))
+
+        :param name: The command id to execute.
+        :type name: str
+        :return: The future which will hold the doIt result.
+        :rtype: :class:`CommandFuture`
+        """
+        commandClass = self.registry.getPlugin(name)
+        if commandClass is None:
+            raise ValueError("No command by the name -> {} exists within the registry!".format(name))
+        future = CommandFuture(name)
+        if not getattr(commandClass, "isThreadSafe", False):
+            try:
+                future.setResult(self.execute(name, **kwargs))
+            except Exception as er:
+                future.setException(er, traceback.format_exc())
+            return future
+        command = commandClass(CommandStats(commandClass))
+        if not command.isEnabled:
+            future.setResult(None)
+            return future
+        command._prepareCommand()
+        try:
+            command._resolveArguments(kwargs)
+        except errors.UserCancel:
+            future.setResult(None)
+            return future
+        stats = command.stats
+        if self.asyncProcesses:
+            # the stats hold the environment so keep them in this process
+            command.stats = None
+        stats.start()
+        options = {"callback": partial(self._asyncFinished, future, stats)}
+        if sys.version_info[0] >= 3:
+            options["error_callback"] = partial(self._asyncFailed, future, stats)
+        try:
+            if self.asyncProcesses:
+                # the pool drops pickling errors without calling back so the command is pickled here instead
+                self._pool().apply_async(_asyncProcessDoIt, (pickle.dumps(command, pickle.HIGHEST_PROTOCOL),),
+                                         **options)
+            else:
+                self._pool().apply_async(_asyncDoIt, (command,), **options)
+        except Exception as er:
+            self._asyncFailed(future, stats, er)
+        return future
+
+    def _pool(self):
+        if self._asyncPool is None:
+            if self.asyncProcesses:
+                self._asyncPool = multiprocessing.Pool(self.asyncWorkers)
+            else:
+                self._asyncPool = ThreadPool(self.asyncWorkers)
+        return self._asyncPool
+
+    def _asyncFinished(self, future, stats, outcome):
+        """Called on the pool result thread once the command finishes executing.
+        """
+        try:
+            if not isinstance(outcome, tuple):
+                # process pools send back the pickled outcome, see _asyncProcessDoIt()
+                outcome = pickle.loads(outcome)
+            status, value, tb, command = outcome
+            if command is not None:
+                command.stats = stats
+            if status == "error":
+                stats.finish(tb)
+                future.setException(value, "".join(tb))
+                return
+            if status == "ok":
+                command._returnResult = value
+                if command.isUndoable:
+                    self.undoStack.append(command)
+            stats.finish(None)
+        except Exception as er:
+            # never let an exception escape onto the pool result thread
+            logger.error("Failed to finish async command: {}".format(future.commandId), exc_info=True)
+            future.setException(er, traceback.format_exc())
+            return
+        future.setResult(value)
+
+    def _asyncFailed(self, future, stats, exception):
+        """Called when the pool fails to run the command at all eg. the command couldn't be submitted or the worker
+        process died.
+        """
+        tb = traceback.format_exception_only(type(exception), exception)
+        stats.finish(tb)
+        future.setException(exception, "".join(tb))
+
+    def shutdownAsync(self, wait=True):
+        """Stops the async worker pool, a new pool is created on the next executeAsync().
+
+        :param wait: If True wait for the running commands to finish otherwise the pool is terminated.
+        :type wait: bool
+        """
+        pool = self._asyncPool
+        if pool is None:
+            return
+        self._asyncPool = None
+        if wait:
+            pool.close()
+        else:
+            pool.terminate()
+        pool.join()
+
     def undoLast(self):
         if self.undoStack:
             command = self.undoStack[-1]
@@ -100,6 +335,26 @@ class ExecutorBase(object):
 
         return result
 
+    def setUndoLimits(self, undoLimit=None, undoMemoryLimit=None, keepReturnResults=None):
+        """Changes the undo and redo stack limits, the oldest entries are evicted immediately if the stacks exceed
+        the new limits. Any argument which is None is left unchanged.
+
+        :param undoLimit: The maximum number of entries on each stack, 0 is unlimited.
+        :type undoLimit: int or None
+        :param undoMemoryLimit: The maximum estimated memory in bytes for each stack, 0 is unlimited.
+        :type undoMemoryLimit: int or None
+        :param keepReturnResults: If False the doIt return value is released once a command is on the undo stack.
+        :type keepReturnResults: bool or None
+        """
+        for stack in (self.undoStack, self.redoStack):
+            if undoLimit is not None:
+                stack.maxCount = undoLimit
+            if undoMemoryLimit is not None:
+                stack.maxMemory = undoMemoryLimit
+            stack.trim()
+        if keepReturnResults is not None:
+            self.undoStack.keepReturnResults = keepReturnResults
+
     def findCommand(self, id):
         return self.registry.getPlugin(id)
 
@@ -127,45 +382,295 @@ class ExecutorBase(object):
         """.format(command.__name__, clsHelp, doItHelp)
 
     def groups(self):
-        groups = {}
-        for c in self.commands:
-            start = c.id.split(".")[0]
-            if start in groups and c not in groups[start]:
-                groups[start].append(c)
-            elif start not in groups:
-                groups[start] = [c]
-        return groups
+        """Returns the registered commands grouped by the first token of the command id eg. "maya.rename" -> "maya",
+        the groups are maintained by the registry so this doesn't iterate the commands.
+
+        :rtype: dict(str, list)
+        """
+        return self.registry.groups()
+
+
+def _asyncDoIt(command):
+    """Runs the command doIt on a pool worker, module level so it can be pickled for process pools.
+
+    :return: (status, result or exception, formatted traceback, command) where status is "ok", "cancel" or "error".
+    :rtype: tuple
+    """
+    try:
+        return "ok", command.doIt(**command.arguments), None, command
+    except errors.UserCancel:
+        return "cancel", None, None, command
+    except Exception as er:
+        return "error", er, traceback.format_exception(*sys.exc_info()), command
+
+
+def _asyncProcessDoIt(payload):
+    """Process pool version of _asyncDoIt(), the command and the outcome are pickled here so any pickling error is
+    returned as a command error rather than being lost by the pool.
+
+    :param payload: The pickled command.
+    :type payload: str
+    :return: The pickled outcome, see _asyncDoIt().
+    :rtype: str
+    """
+    try:
+        outcome = _asyncDoIt(pickle.loads(payload))
+    except Exception as er:
+        outcome = "error", er, traceback.format_exception(*sys.exc_info()), None
+    try:
+        return pickle.dumps(outcome, pickle.HIGHEST_PROTOCOL)
+    except Exception as er:
+        tb = traceback.format_exception(*sys.exc_info())
+        return pickle.dumps(("error", RuntimeError("Failed to pickle the command outcome: {}".format(er)), tb, None),
+                            pickle.HIGHEST_PROTOCOL)
+
+
+class CommandFuture(object):
+    """Holds the result of a command executed by :meth:`ExecutorBase.executeAsync`.
+    """
+
+    def __init__(self, commandId):
+        self.commandId = commandId
+        self.traceback = None
+        self._result = None
+        self._exception = None
+        self._finished = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    def done(self):
+        """
+        :return: True if the command has finished executing.
+        :rtype: bool
+        """
+        return self._finished.is_set()
+
+    def result(self, timeout=None):
+        """Returns the doIt result blocking until the command finishes, if the command failed then the command
+        exception is raised.
+
+        :param timeout: The maximum seconds to wait, None waits forever.
+        :type timeout: float or None
+        :raise RuntimeError: When the timeout expires.
+        """
+        exception = self.exception(timeout)
+        if exception is not None:
+            raise exception
+        return self._result
+
+    def exception(self, timeout=None):
+        """Returns the exception raised by the command or None if it succeeded, blocking until the command finishes.
+
+        :param timeout: The maximum seconds to wait, None waits forever.
+        :type timeout: float or None
+        :raise RuntimeError: When the timeout expires.
+        """
+        if not self._finished.wait(timeout) and not self._finished.is_set():
+            raise RuntimeError("Command: {} didn't finish within {} seconds".format(self.commandId, timeout))
+        return self._exception
+
+    def addDoneCallback(self, callback):
+        """Adds a function which is called with this future once the command finishes, if the command has already
+        finished the callback is called immediately. Callbacks run on the thread which finished the command.
+
+        :type callback: callable
+        """
+        with self._lock:
+            if not self._finished.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def setResult(self, result):
+        self._result = result
+        self._finish()
+
+    def setException(self, exception, tb=None):
+        self._exception = exception
+        self.traceback = tb
+        self._finish()
+
+    def _finish(self):
+        with self._lock:
+            self._finished.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception:
+                logger.error("Command future callback failed: {}".format(self.commandId), exc_info=True)
+
+
+class CompoundCommand(object):
+    """Undo stack entry which groups many executed commands so they're undone and redone as a single operation, see
+    :meth:`ExecutorBase.executeMany`.
+    """
+    id = "zoo.compoundCommand"
+    creator = "zootools"
+    isUndoable = True
+    isEnabled = True
+
+    def __init__(self, commands):
+        self.commands = commands
+        self.arguments = {}
+        self.stats = None
+        self._returnResult = None
+
+    def doIt(self):
+        results = []
+        for cmd in self.commands:
+            result = cmd.doIt(**cmd.arguments)
+            cmd._returnResult = result
+            results.append(result)
+        return results
+
+    def undoIt(self):
+        for cmd in reversed(self.commands):
+            cmd.undoIt()
+
+    def undoPayloadSize(self):
+        return sum(cmd.undoPayloadSize() for cmd in self.commands)
+
+    def clearReturnResult(self):
+        self._returnResult = None
+        for cmd in self.commands:
+            cmd.clearReturnResult()
+
+
+class CommandStack(deque):
+    """Undo/redo stack which evicts the oldest commands once the stack exceeds the maximum number of entries or the
+    estimated memory of the entries, the newest entry is never evicted.
+
+    Only append(), pop(), popleft(), remove() and clear() keep the memory estimate in sync, these are guarded by a
+    lock as async commands are appended from worker threads.
+
+    :param maxCount: The maximum number of entries, 0 is unlimited.
+    :type maxCount: int
+    :param maxMemory: The maximum estimated memory in bytes, 0 is unlimited.
+    :type maxMemory: int
+    :param keepReturnResults: If False each command's return result is released when appended.
+    :type keepReturnResults: bool
+    """
+
+    def __init__(self, maxCount=0, maxMemory=0, keepReturnResults=True):
+        deque.__init__(self)
+        self.maxCount = maxCount
+        self.maxMemory = maxMemory
+        self.keepReturnResults = keepReturnResults
+        self.memory = 0
+        self._sizes = {}  # {id(command): size}
+        self._lock = threading.RLock()
+
+    def append(self, command):
+        if not self.keepReturnResults:
+            command.clearReturnResult()
+        size = command.undoPayloadSize()
+        with self._lock:
+            self._sizes[id(command)] = size
+            self.memory += size
+            deque.append(self, command)
+            self.trim()
+
+    def _released(self, command):
+        self.memory -= self._sizes.pop(id(command), 0)
+        return command
+
+    def pop(self):
+        with self._lock:
+            return self._released(deque.pop(self))
+
+    def popleft(self):
+        with self._lock:
+            return self._released(deque.popleft(self))
+
+    def remove(self, command):
+        with self._lock:
+            deque.remove(self, command)
+            self._released(command)
+
+    def clear(self):
+        with self._lock:
+            deque.clear(self)
+            self._sizes.clear()
+            self.memory = 0
+
+    def _overLimit(self):
+        if self.maxCount and len(self) > self.maxCount:
+            return True
+        return bool(self.maxMemory and self.memory > self.maxMemory)
+
+    def trim(self):
+        """Evicts the oldest entries until the stack is within its limits.
+
+        :return: The evicted commands, oldest first.
+        :rtype: list
+        """
+        evicted = []
+        with self._lock:
+            while len(self) > 1 and self._overLimit():
+                evicted.append(self.popleft())
+        if evicted:
+            logger.debug("Evicted {} commands from the stack, memory: {}".format(len(evicted), self.memory))
+        return evicted
 
 
 class CommandStats(object):
+    # static info per command class and the machine info for this process, both are computed once
+    _classInfo = {}
+    _machineInfo = None
+
     def __init__(self, tool):
         self.command = tool
-        self.startTime = 0.0
+        self.startTime = time.time()
         self.endTime = 0.0
         self.executionTime = 0.0
 
         self.info = {}
         self._init()
 
-    def _init(self):
-        """Initializes some basic info about the plugin and the use environment
-        Internal use only:
+    @classmethod
+    def commandInfo(cls, commandClass):
+        """Returns the static stats info for the command class which includes the machine info, the result is
+        cached per command class.
+
+        :param commandClass: The command class.
+        :type commandClass: class
+        :rtype: dict
         """
+        info = cls._classInfo.get(commandClass)
+        if info is not None:
+            return info
+        if cls._machineInfo is None:
+            CommandStats._machineInfo = env.machineInfo()
         try:
-            path = inspect.getfile(self.command.__class__)
+            path = inspect.getfile(commandClass)
         except:
             path = ""
+        info = {"id": commandClass.id,
+                "creator": commandClass.creator,
+                "module": commandClass.__module__,
+                "filepath": path,
+                "application": env.application()
+                }
+        info.update(cls._machineInfo)
+        cls._classInfo[commandClass] = info
+        return info
 
-        self.info.update({"id": self.command.id,
-                          "creator": self.command.creator,
-                          "module": self.command.__class__.__module__,
-                          "filepath": path,
-                          "application": env.application()
-                          })
-        self.info.update(env.machineInfo())
+    def _init(self):
+        """Initializes some basic info about the plugin and the use environment
+        Internal use only:
+        """
+        commandClass = self.command if inspect.isclass(self.command) else self.command.__class__
+        self.info.update(self.commandInfo(commandClass))
+
+    def start(self):
+        """Called just before the command executes, defaults to the time the stats were created.
+        """
+        self.startTime = time.time()
 
     def finish(self, tb=None):
-        """Called when the plugin has finish executing
+        """Called when the plugin has finish executing, the execution is recorded with the process wide
+        :class:`zoo.libs.command.telemetry.TelemetryAggregator`.
         """
         self.endTime = time.time()
         self.executionTime = self.endTime - self.startTime
@@ -173,3 +678,4 @@ class CommandStats(object):
         self.info["lastUsed"] = self.endTime
         if tb:
             self.info["traceback"] = tb
+        telemetry.TelemetryAggregator().record(self.info["id"], self.executionTime, tb)
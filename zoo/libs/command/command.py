@@ -1,5 +1,6 @@
 import inspect
 import os
+import sys
 from abc import ABCMeta, abstractmethod, abstractproperty
 from zoo.libs.command import errors
 
@@ -111,9 +112,31 @@ class CommandInterface(object):
         """
         pass
 
+    def undoPayloadSize(self):
+        """Returns the estimated memory in bytes this command keeps alive while it's on the undo or redo stack, this
+        is used by the executor to limit the stack memory.
+
+        The default is a shallow estimate of the arguments and return result, commands which store large undo data
+        eg. cached node states should override this.
+
+        :rtype: int
+        """
+        size = sys.getsizeof(self._returnResult)
+        for value in self.arguments.values():
+            size += sys.getsizeof(value)
+        return size
+
+    def clearReturnResult(self):
+        """Releases the doIt return value, called by the executor when the command is added to the undo stack and
+        return results aren't kept.
+        """
+        self._returnResult = None
+
 
 class ZooCommand(CommandInterface):
     isEnabled = True
+    # if True the executor may run doIt on a worker thread or process, see ExecutorBase.executeAsync()
+    isThreadSafe = False
 
     def description(self):
         return self.__doc__
@@ -133,17 +156,40 @@ class ZooCommand(CommandInterface):
         return True
 
     def _prepareCommand(self):
-        funcArgs = inspect.getargspec(self.doIt)
-        args = funcArgs.args[1:]
-        defaults = funcArgs.defaults or tuple()
-        if len(args) != len(defaults):
-            raise ValueError("The command doIt function({}) must use keyword argwords".format(self.id))
-        elif args and defaults:
-            arguments = ArgumentParser(zip(args, defaults))
+        defaults = self.argumentDefaults()
+        if defaults:
+            arguments = ArgumentParser(defaults)
             self.arguments = arguments
             return arguments
         return ArgumentParser()
 
+    @classmethod
+    def argumentDefaults(cls):
+        """Returns the doIt keyword arguments and their default values.
+
+        The doIt signature is only inspected once per command class, the result is cached on the class so
+        executing the same command repeatedly doesn't pay for the introspection.
+
+        :return: The default doIt arguments, callers must copy the dict before modifying it.
+        :rtype: dict
+        :raise ValueError: When the doIt method has arguments without defaults.
+        """
+        # look in the class __dict__ so subclasses never pick up the cache of their parent class
+        cached = cls.__dict__.get("_argumentDefaultsCache")
+        if cached is None:
+            funcArgs = inspect.getargspec(cls.doIt)
+            args = funcArgs.args[1:]
+            defaults = funcArgs.defaults or tuple()
+            if len(args) != len(defaults):
+                # cache the error message, the signature is just as invalid the next time
+                cached = "The command doIt function({}) must use keyword argwords".format(cls.id)
+            else:
+                cached = dict(zip(args, defaults))
+            cls._argumentDefaultsCache = cached
+        if isinstance(cached, basestring):
+            raise ValueError(cached)
+        return cached
+
     @classmethod
     def commandAction(cls, uiType, parent=None, optionBox=False):
         # import locally due to avoid qt dependencies by default
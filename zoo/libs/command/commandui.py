@@ -78,3 +78,37 @@ class CommandAction(CommandActionBase):
     def show(self):
         if self.item is not None:
             self.item.show()
+
+
+class CommandFutureWatcher(QtCore.QObject):
+    """Emits Qt signals once a :class:`zoo.libs.command.base.CommandFuture` finishes, the signals are queued to the
+    thread this object lives in so slots can safely update widgets.
+
+    .. code-block:: python
+
+        future = executor.executeAsync("publish.copyFiles", paths=paths)
+        watcher = CommandFutureWatcher(future, parent=self)
+        watcher.finished.connect(self.onPublished)
+        watcher.failed.connect(self.onPublishFailed)
+
+    """
+    # commandId, result
+    finished = QtCore.Signal(str, object)
+    # commandId, formatted traceback
+    failed = QtCore.Signal(str, str)
+    # emitted from the thread which finished the future, always queued so a future which has already finished
+    # doesn't emit before the caller has connected to the signals
+    _done = QtCore.Signal(object)
+
+    def __init__(self, future, parent=None):
+        super(CommandFutureWatcher, self).__init__(parent)
+        self.future = future
+        self._done.connect(self._onDone, QtCore.Qt.QueuedConnection)
+        future.addDoneCallback(self._done.emit)
+
+    def _onDone(self, future):
+        exception = future.exception()
+        if exception is not None:
+            self.failed.emit(future.commandId, future.traceback or str(exception))
+            return
+        self.finished.emit(future.commandId, future.result())
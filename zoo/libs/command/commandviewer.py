@@ -36,7 +36,8 @@ background: {backgroundColor}"""
             item = QtWidgets.QListWidgetItem()
             item.setText(uiData.get("label", ""))
             icon = iconlib.icon(uiData.get("icon", ""))
-            data = {"name": command.id, "path": inspect.getfile(command)}
+            # lazy commands know their source file so we avoid importing the command
+            data = {"name": command.id, "path": getattr(command, "filePath", "") or inspect.getfile(command)}
             data.update(uiData)
             info = toolTip.format(**data)
             item.setToolTip(info)
@@ -3,3 +3,20 @@ class UserCancel(Exception):
         # Call the base class constructor with the parameters it needs
         super(UserCancel, self).__init__(message)
         self.errors = errors
+
+
+class CommandBatchError(Exception):
+    def __init__(self, message, index, commandId, errors=None):
+        """Raised when a command within a batch fails.
+
+        :param index: The index of the failing item within the batch.
+        :type index: int
+        :param commandId: The id of the failing command.
+        :type commandId: str
+        :param errors: The original exception raised by the command.
+        :type errors: Exception
+        """
+        super(CommandBatchError, self).__init__(message)
+        self.index = index
+        self.commandId = commandId
+        self.errors = errors
@@ -0,0 +1,310 @@
+"""Process wide command execution telemetry.
+
+Every command executed through an executor is recorded by :class:`TelemetryAggregator` once its
+:class:`zoo.libs.command.base.CommandStats` finishes. Per command the aggregator keeps the call count, error count,
+the last traceback and a fixed size latency histogram from which the p50/p95/p99 are estimated, so memory doesn't
+grow with the number of executions.
+
+Output is disabled until a path is set either through the environment or in code.
+
+- ZOO_TELEMETRY_LOG, a rotating JSON-lines file written through :class:`zoo.libs.utils.zlogging.ZooJsonFormatter`,
+  one line per command which executed since the previous flush.
+- ZOO_TELEMETRY_PROMETHEUS, a Prometheus text file suitable for the node_exporter textfile collector.
+- ZOO_TELEMETRY_INTERVAL, the minimum number of seconds between flushes, defaults to 300.
+
+.. code-block:: python
+
+    aggregator = TelemetryAggregator()
+    aggregator.setLogPath(os.path.expanduser("~/zoo_logs/commandTelemetry.log"))
+    aggregator.prometheusPath = os.path.expanduser("~/zoo_logs/zoo_commands.prom")
+    for stats in aggregator.summary():
+        print stats["id"], stats["calls"], stats["p95"]
+
+"""
+import atexit
+import bisect
+import logging
+import logging.handlers
+import math
+import os
+import threading
+import time
+
+from zoo.libs.utils import classtypes
+from zoo.libs.utils import env
+from zoo.libs.utils import filesystem
+from zoo.libs.utils import zlogging
+
+logger = zlogging.getLogger(__name__)
+
+TELEMETRY_LOGGER_NAME = "zoocore.telemetry"
+
+
+class LatencyHistogram(object):
+    """Fixed size histogram with logarithmic buckets, each bucket is `growth` times wider than the previous so
+    the percentile estimates have roughly the same relative error for fast and slow commands.
+
+    :param minimum: The upper bound of the first bucket in seconds.
+    :type minimum: float
+    :param maximum: The upper bound of the last finite bucket in seconds, slower samples go to the overflow bucket.
+    :type maximum: float
+    :param growth: The ratio between consecutive bucket bounds.
+    :type growth: float
+    """
+    # bucket bounds are shared between histograms with the same settings
+    _boundsCache = {}
+
+    def __init__(self, minimum=1e-5, maximum=600.0, growth=1.2):
+        key = (minimum, maximum, growth)
+        bounds = self._boundsCache.get(key)
+        if bounds is None:
+            count = int(math.ceil(math.log(maximum / minimum) / math.log(growth))) + 1
+            bounds = tuple(minimum * growth ** i for i in xrange(count))
+            LatencyHistogram._boundsCache[key] = bounds
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = 0.0
+        self.maximum = 0.0
+
+    def add(self, value):
+        """Adds a sample to the histogram.
+
+        :param value: The sample in seconds.
+        :type value: float
+        """
+        value = max(value, 0.0)
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        if not self.count or value < self.minimum:
+            self.minimum = value
+        if value > self.maximum:
+            self.maximum = value
+        self.count += 1
+        self.total += value
+
+    def percentile(self, percent):
+        """Returns the estimated value at the percentile, interpolated within the matching bucket and clamped to
+        the recorded minimum and maximum.
+
+        :param percent: The percentile between 0 and 100.
+        :type percent: float
+        :rtype: float
+        """
+        if not self.count:
+            return 0.0
+        rank = self.count * percent / 100.0
+        cumulative = 0
+        for index, bucketCount in enumerate(self.counts):
+            if not bucketCount or cumulative + bucketCount < rank:
+                cumulative += bucketCount
+                continue
+            lower = self.bounds[index - 1] if index else 0.0
+            upper = self.bounds[index] if index < len(self.bounds) else self.maximum
+            value = lower + (upper - lower) * ((rank - cumulative) / float(bucketCount))
+            return min(max(value, self.minimum), self.maximum)
+        return self.maximum
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+
+class CommandTelemetry(object):
+    """Aggregated execution data for a single command id.
+    """
+
+    def __init__(self, commandId):
+        self.id = commandId
+        self.calls = 0
+        self.errors = 0
+        self.lastTraceback = ""
+        self.lastUsed = 0.0
+        self.histogram = LatencyHistogram()
+
+    def record(self, executionTime, tb=None):
+        self.calls += 1
+        self.lastUsed = time.time()
+        self.histogram.add(executionTime)
+        if tb:
+            self.errors += 1
+            self.lastTraceback = "".join(tb) if isinstance(tb, (list, tuple)) else str(tb)
+
+    def errorRate(self):
+        return self.errors / float(self.calls) if self.calls else 0.0
+
+    def toDict(self):
+        """Returns the json serializable summary of this command, latencies are in seconds.
+
+        :rtype: dict
+        """
+        histogram = self.histogram
+        return {"id": self.id,
+                "calls": self.calls,
+                "errors": self.errors,
+                "errorRate": self.errorRate(),
+                "p50": histogram.percentile(50),
+                "p95": histogram.percentile(95),
+                "p99": histogram.percentile(99),
+                "mean": histogram.mean(),
+                "max": histogram.maximum,
+                "totalTime": histogram.total,
+                "lastUsed": self.lastUsed,
+                "lastTraceback": self.lastTraceback}
+
+
+class TelemetryAggregator(object):
+    """Singleton which aggregates the execution time of every command run in this process.
+
+    Recording is cheap and always on, flushing only writes once the flush interval has elapsed since the previous
+    flush, this is checked each time a command is recorded so no background thread is required. Any pending data is
+    flushed when the process exits.
+    """
+    __metaclass__ = classtypes.Singleton
+
+    def __init__(self):
+        self.commands = {}
+        self.flushInterval = float(os.environ.get("ZOO_TELEMETRY_INTERVAL", 300))
+        self.prometheusPath = os.environ.get("ZOO_TELEMETRY_PROMETHEUS")
+        self.logPath = None
+        self._handler = None
+        self._pending = set()
+        self._lastFlush = time.time()
+        self._lock = threading.RLock()
+        self._jsonLogger = logging.getLogger(TELEMETRY_LOGGER_NAME)
+        # telemetry lines only belong in the telemetry file never in the shell or the central log
+        self._jsonLogger.propagate = False
+        self._jsonLogger.setLevel(logging.INFO)
+        logPath = os.environ.get("ZOO_TELEMETRY_LOG")
+        if logPath:
+            self.setLogPath(logPath)
+        atexit.register(self.flush)
+
+    def setLogPath(self, filePath, maxBytes=1.5e6, backupCount=5):
+        """Sets the rotating JSON-lines file which telemetry is flushed to, replacing any previous file.
+
+        :param filePath: The absolute log file path, None to disable the JSON-lines output.
+        :type filePath: str or None
+        :param maxBytes: The file size at which the log is rotated.
+        :type maxBytes: int
+        :param backupCount: The number of rotated files to keep.
+        :type backupCount: int
+        """
+        with self._lock:
+            if self._handler is not None:
+                self._jsonLogger.removeHandler(self._handler)
+                self._handler.close()
+                self._handler = None
+            self.logPath = filePath
+            if not filePath:
+                return
+            directory = os.path.dirname(filePath)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            handler = logging.handlers.RotatingFileHandler(filePath, maxBytes=maxBytes, backupCount=backupCount)
+            handler.setFormatter(zlogging.ZooJsonFormatter(fmt="%(asctime) %(name) %(message)",
+                                                           extra={"node": env.machineInfo()["node"],
+                                                                  "application": env.application()}))
+            self._jsonLogger.addHandler(handler)
+            self._handler = handler
+
+    def record(self, commandId, executionTime, tb=None):
+        """Records a single command execution, thread safe.
+
+        :param commandId: The command id.
+        :type commandId: str
+        :param executionTime: The execution time in seconds.
+        :type executionTime: float
+        :param tb: The formatted traceback if the command failed.
+        :type tb: list(str) or str or None
+        """
+        with self._lock:
+            telemetry = self.commands.get(commandId)
+            if telemetry is None:
+                telemetry = CommandTelemetry(commandId)
+                self.commands[commandId] = telemetry
+            telemetry.record(executionTime, tb)
+            self._pending.add(commandId)
+            shouldFlush = self.flushInterval > 0 and time.time() - self._lastFlush >= self.flushInterval
+        if shouldFlush:
+            self.flush()
+
+    def stats(self, commandId):
+        """Returns the summary for the command id, see :meth:`CommandTelemetry.toDict`.
+
+        :rtype: dict or None
+        """
+        with self._lock:
+            telemetry = self.commands.get(commandId)
+            return telemetry.toDict() if telemetry is not None else None
+
+    def summary(self):
+        """Returns the summary of every recorded command, slowest p95 first.
+
+        :rtype: list(dict)
+        """
+        with self._lock:
+            results = [telemetry.toDict() for telemetry in self.commands.values()]
+        return sorted(results, key=lambda i: i["p95"], reverse=True)
+
+    def flush(self):
+        """Writes the commands executed since the last flush to the JSON-lines log and rewrites the Prometheus file
+        if either is set. Each log line contains the accumulated totals for the process.
+        """
+        with self._lock:
+            self._lastFlush = time.time()
+            pending = [self.commands[commandId].toDict() for commandId in sorted(self._pending)]
+            self._pending.clear()
+            try:
+                if self._handler is not None:
+                    for data in pending:
+                        self._jsonLogger.info("commandTelemetry", extra=data)
+                if self.prometheusPath and (pending or not os.path.exists(self.prometheusPath)):
+                    self.exportPrometheus(self.prometheusPath)
+            except Exception:
+                logger.error("Failed to flush command telemetry", exc_info=True)
+
+    def exportPrometheus(self, filePath):
+        """Writes every recorded command to the file in the Prometheus text exposition format, the file is
+        written to a temp file first and then renamed so scrapers never read a partial file.
+
+        :param filePath: The absolute file path, usually ending in .prom.
+        :type filePath: str
+        """
+        with self._lock:
+            commands = [self.commands[commandId] for commandId in sorted(self.commands)]
+        lines = ["# HELP zoo_command_calls_total Number of command executions.",
+                 "# TYPE zoo_command_calls_total counter"]
+        lines.extend('zoo_command_calls_total{{command="{}"}} {}'.format(_escapeLabel(i.id), i.calls)
+                     for i in commands)
+        lines.extend(["# HELP zoo_command_errors_total Number of command executions which raised an error.",
+                      "# TYPE zoo_command_errors_total counter"])
+        lines.extend('zoo_command_errors_total{{command="{}"}} {}'.format(_escapeLabel(i.id), i.errors)
+                     for i in commands)
+        lines.extend(["# HELP zoo_command_duration_seconds Command execution time.",
+                      "# TYPE zoo_command_duration_seconds summary"])
+        for telemetry in commands:
+            label = _escapeLabel(telemetry.id)
+            for quantile in (0.5, 0.95, 0.99):
+                lines.append('zoo_command_duration_seconds{{command="{}",quantile="{}"}} {!r}'.format(
+                    label, quantile, telemetry.histogram.percentile(quantile * 100)))
+            lines.append('zoo_command_duration_seconds_sum{{command="{}"}} {!r}'.format(label,
+                                                                                        telemetry.histogram.total))
+            lines.append('zoo_command_duration_seconds_count{{command="{}"}} {}'.format(label, telemetry.calls))
+
+        directory = os.path.dirname(filePath)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with filesystem.atomicFile(filePath) as f:
+            f.write("\n".join(lines) + "\n")
+
+    def reset(self):
+        """Removes all recorded data.
+        """
+        with self._lock:
+            self.commands = {}
+            self._pending.clear()
+            self._lastFlush = time.time()
+
+
+def _escapeLabel(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
@@ -1,6 +1,7 @@
 import inspect
 import time
 from zoo.libs.utils import env
+from zoo.libs.utils import modules
 
 
 class Plugin(object):
@@ -61,3 +62,68 @@ class PluginStats(object):
         self.info["lastUsed"] = self.endTime
         if tb:
             self.info["traceback"] = tb
+
+
+class LazyPlugin(object):
+    """Lightweight stand-in for a plugin class whose module hasn't been imported yet.
+
+    Only the plugin id, the module/class location and static metadata(eg. uiData) are stored, any metadata key can be
+    accessed as an attribute, accessing anything else will import the module and forward the attribute to the
+    plugin class.
+
+    .. code-block:: python
+
+        proxy = LazyPlugin("CustomPlugin.example", "zoo.libs.plugins.custom", "CustomPlugin",
+                           metadata={"uiData": {"label": "Custom"}})
+        proxy.uiData  # doesn't import
+        classObj = proxy.resolve()  # imports zoo.libs.plugins.custom
+
+    """
+
+    def __init__(self, id, moduleName, className, metadata=None, filePath=""):
+        self.id = id
+        self.moduleName = moduleName
+        self.className = className
+        self.metadata = metadata or {}
+        self.filePath = filePath
+        self._classObj = None
+        # expose the plugin docstring so inspect.getdoc() works without importing
+        self.__doc__ = self.metadata.get("__doc__")
+
+    def __repr__(self):
+        return "<{}> id: {}, class: {}.{}".format(self.__class__.__name__, self.id, self.moduleName, self.className)
+
+    def __getattr__(self, item):
+        # use __dict__ directly to avoid recursion before __init__ has run, eg. copy/pickle
+        metadata = self.__dict__.get("metadata")
+        if metadata is None or item.startswith("__"):
+            raise AttributeError(item)
+        if item in metadata:
+            return metadata[item]
+        return getattr(self.resolve(), item)
+
+    @property
+    def isResolved(self):
+        """
+        :return: True if the plugin class has been imported.
+        :rtype: bool
+        """
+        return self._classObj is not None
+
+    def resolve(self):
+        """Imports the plugin module and returns the plugin class, the class is cached for subsequent calls.
+
+        :rtype: class
+        :raise ImportError: When the module can't be imported or the class no longer exists within the module.
+        """
+        if self._classObj is not None:
+            return self._classObj
+        moduleObj = modules.importModule(self.moduleName)
+        if moduleObj is None:
+            raise ImportError("Failed to import plugin module: {}".format(self.moduleName))
+        classObj = getattr(moduleObj, self.className, None)
+        if not inspect.isclass(classObj):
+            raise ImportError("Plugin class: {} doesn't exist in module: {}".format(self.className,
+                                                                                    self.moduleName))
+        self._classObj = classObj
+        return classObj
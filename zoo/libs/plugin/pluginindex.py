@@ -0,0 +1,219 @@
+"""This module houses the persistent plugin discovery index used by the plugin manager to avoid walking and importing
+plugin packages on every startup.
+
+Index layout::
+
+    {"version": 2,
+     "interface": "zoo.libs.command.command.ZooCommand",
+     "packages": {packagePath: {"directories": {directoryPath: mtime},
+                                "files": [filePath]}},
+     "files": {filePath: {"mtime": float,
+                          "size": int,
+                          "module": "dotted.module.path",
+                          "plugins": [{"id": pluginId,
+                                       "className": className,
+                                       "metadata": {attributeName: value}}]}}
+     }
+
+"""
+import os
+
+from zoo.libs.utils import filesystem
+from zoo.libs.utils import zlogging
+
+logger = zlogging.zooLogger
+
+INDEX_VERSION = 2
+
+
+class PluginIndex(object):
+    """Persistent index which maps plugin source files to the plugins discovered within them.
+
+    Each source file entry stores the file mtime and size at the time of discovery, a file is only considered valid
+    while both values still match what's on disk, therefore any change to a file only invalidates its own entries.
+    Packages store the mtime of each directory within the package so added or removed files are detected without
+    re-walking the package.
+
+    .. code-block:: python
+
+        index = PluginIndex(os.path.expanduser("~/zoo_cache/commands.json"), interfaceName="ZooCommand")
+        for filePath in index.packageModules("/tools/commands"):
+            entry = index.validEntry(filePath)
+            if entry is None:
+                # import the module and rediscover
+                index.updateFile(filePath, "tools.commands.mycommands",
+                                 [{"id": "my.command", "className": "MyCommand", "metadata": {}}])
+        index.save()
+
+    """
+
+    def __init__(self, filePath, interfaceName=""):
+        self.filePath = filePath
+        self.interfaceName = interfaceName
+        self.packages = {}
+        self.files = {}
+        self.isDirty = False
+        self.load()
+
+    def load(self):
+        """Loads the index from disk, if the file is missing, corrupt or was built for a different interface then
+        the index will be reset.
+        """
+        self.packages = {}
+        self.files = {}
+        self.isDirty = False
+        if not self.filePath or not os.path.exists(self.filePath):
+            return
+        try:
+            data = filesystem.loadJson(self.filePath)
+        except Exception:
+            logger.warning("Failed to load plugin index: {}, index will be rebuilt".format(self.filePath),
+                           exc_info=True)
+            self.isDirty = True
+            return
+        if data.get("version") != INDEX_VERSION or data.get("interface") != self.interfaceName:
+            logger.debug("Plugin index is out of date: {}, index will be rebuilt".format(self.filePath))
+            self.isDirty = True
+            return
+        self.packages = data.get("packages", {})
+        self.files = data.get("files", {})
+
+    def save(self):
+        """Writes the index to disk.
+
+        :return: True if the index was written.
+        :rtype: bool
+        """
+        if not self.filePath:
+            return False
+        filesystem.ensureFolderExists(os.path.dirname(self.filePath))
+        result = filesystem.saveJson({"version": INDEX_VERSION,
+                                      "interface": self.interfaceName,
+                                      "packages": self.packages,
+                                      "files": self.files}, self.filePath)
+        if result:
+            self.isDirty = False
+        return result
+
+    def clear(self):
+        """Removes all entries from the index, the file on disk will be replaced on the next save().
+        """
+        self.packages = {}
+        self.files = {}
+        self.isDirty = True
+
+    @staticmethod
+    def fileSignature(filePath):
+        """Returns the (mtime, size) of the file or None if the file doesn't exist.
+
+        :param filePath: The absolute file path.
+        :type filePath: str
+        :rtype: tuple(float, int) or None
+        """
+        try:
+            st = os.stat(filePath)
+        except OSError:
+            return None
+        return st.st_mtime, st.st_size
+
+    def validEntry(self, filePath):
+        """Returns the index entry for the file if the file hasn't changed since it was indexed.
+
+        :param filePath: The absolute file path.
+        :type filePath: str
+        :return: The file entry dict or None if the file isn't indexed or has changed.
+        :rtype: dict or None
+        """
+        entry = self.files.get(filePath)
+        if entry is None:
+            return
+        signature = self.fileSignature(filePath)
+        if signature is None or signature != (entry["mtime"], entry["size"]):
+            return
+        return entry
+
+    def updateFile(self, filePath, moduleName, plugins):
+        """Adds or replaces the entry for the file.
+
+        :param filePath: The absolute file path which was imported.
+        :type filePath: str
+        :param moduleName: The dotted module path for the file.
+        :type moduleName: str
+        :param plugins: A list of plugin dicts found within the module, each containing the "id", "className" and \
+        json serializable "metadata" of the plugin class.
+        :type plugins: list(dict)
+        """
+        signature = self.fileSignature(filePath)
+        if signature is None:
+            self.removeFile(filePath)
+            return
+        self.files[filePath] = {"mtime": signature[0],
+                                "size": signature[1],
+                                "module": moduleName,
+                                "plugins": list(plugins)}
+        self.isDirty = True
+
+    def removeFile(self, filePath):
+        """Removes the entry for the file.
+
+        :param filePath: The absolute file path.
+        :type filePath: str
+        :return: True if the file was indexed.
+        :rtype: bool
+        """
+        if self.files.pop(filePath, None) is not None:
+            self.isDirty = True
+            return True
+        return False
+
+    def packageModules(self, packagePath):
+        """Returns all the plugin module files under the package.
+
+        If no directory within the package has changed then the cached file list is returned, otherwise the
+        package is walked again and the entries for any removed files are dropped.
+
+        :param packagePath: The absolute package directory.
+        :type packagePath: str
+        :rtype: list(str)
+        """
+        package = self.packages.get(packagePath)
+        if package is not None:
+            for directory, mtime in package["directories"].items():
+                try:
+                    if os.path.getmtime(directory) != mtime:
+                        break
+                except OSError:
+                    break
+            else:
+                return package["files"]
+
+        directories, files = _walkPackage(packagePath)
+        if package is not None:
+            for removed in set(package["files"]).difference(files):
+                self.removeFile(removed)
+        self.packages[packagePath] = {"directories": directories,
+                                      "files": files}
+        self.isDirty = True
+        return files
+
+
+def _walkPackage(packagePath):
+    """Walks the package returning the mtime of every directory and all module files that may contain plugins,
+    this matches the files visited by :func:`zoo.libs.utils.modules.iterModules`.
+
+    :rtype: tuple(dict, list(str))
+    """
+    directories = {}
+    files = []
+    for root, dirs, fileNames in os.walk(packagePath):
+        try:
+            directories[root] = os.path.getmtime(root)
+        except OSError:
+            continue
+        if "__init__.py" not in fileNames:
+            continue
+        for f in sorted(fileNames):
+            if f.startswith("__") or not f.endswith(".py"):
+                continue
+            files.append(os.path.join(root, f))
+    return directories, files
@@ -1,14 +1,25 @@
 """This module house's the base class of a plugin manager"""
 
 import inspect
+import json
 import os
+import time
+from collections import OrderedDict
 
 from zoo.libs.plugin import plugin
+from zoo.libs.plugin import pluginindex
+from zoo.libs.plugin import staticdiscovery
 from zoo.libs.utils import modules
 from zoo.libs.utils import zlogging
 
 logger = zlogging.zooLogger
 
+# discovery backends used by registerByPackage
+IMPORT_DISCOVERY = "import"
+STATIC_DISCOVERY = "static"
+# plugin names are grouped by the first token eg. "maya.rename" -> "maya"
+GROUP_SEPARATOR = "."
+
 
 class PluginManager(object):
     """This class manages a group of plugin instance's.
@@ -16,17 +27,56 @@ class PluginManager(object):
     registerByPackage(pkg.path).
 
     To register a list of paths use instance.registerTools()
+    To register or unregister a batch of plugins use registerMany() and unregisterMany().
     To find out what current plugins are loaded in memory use the instance.loadedPlugins variable to return a dictionary.
     To return all plugins currently registry use the instance.plugins variable.
+
+    Passing an indexPath will store the package discovery results on disk, see
+    :class:`zoo.libs.plugin.pluginindex.PluginIndex`, subsequent registerByPackage() calls will then only import
+    the modules which contain plugins and re-scan the files which have changed.
+
+    In lazy mode unchanged index entries are registered as :class:`zoo.libs.plugin.plugin.LazyPlugin` proxies so no
+    plugin module is imported until getPlugin() or loadPlugin() first resolves that plugin. The metadataAttributes
+    are the plugin class attributes stored in the index which the proxies can return without importing.
+
+    discoveryThreads is the number of threads used by registerByPackage() to prefetch plugin modules.
+
+    Setting discovery to STATIC_DISCOVERY makes registerByPackage() parse the module source instead of importing it,
+    see :mod:`zoo.libs.plugin.staticdiscovery`, all plugins are then registered as lazy proxies. Metadata attributes
+    which a plugin doesn't define are read from the interface class source, eg. ZooCommand.uiData.
     """
 
-    def __init__(self, interface=plugin.Plugin, variableName=None):
+    def __init__(self, interface=plugin.Plugin, variableName=None, indexPath=None, lazy=False,
+                 metadataAttributes=None, discoveryThreads=4, discovery=IMPORT_DISCOVERY):
         self.plugins = {}
+        # reverse lookup and group index, kept in sync with self.plugins by _addPlugin and _removePlugin
+        self._pluginNames = {}  # {classObj: name}
+        self._groups = {}  # {groupName: OrderedDict(name: None)}
         # register the plugin names by the variable, if its missing fallback to the class name
         self.variableName = variableName or ""
         self.interface = interface
         self.loadedPlugins = {}  # {className: instance}
         self.basePaths = []
+        self.lazy = lazy
+        self.metadataAttributes = tuple(metadataAttributes or ())
+        self.discoveryThreads = discoveryThreads
+        self.discovery = discovery
+        self.moduleTimings = {}  # {modulePath: {"prefetch": seconds, "load": seconds}}
+        self.index = None
+        if indexPath:
+            self.setIndexPath(indexPath)
+
+    def setIndexPath(self, indexPath):
+        """Sets the on disk discovery index file used by registerByPackage(), the index will be loaded immediately.
+
+        :param indexPath: The absolute json file path for the index, if None then the index will be disabled.
+        :type indexPath: str or None
+        """
+        if not indexPath:
+            self.index = None
+            return
+        interfaceName = ".".join((self.interface.__module__, self.interface.__name__))
+        self.index = pluginindex.PluginIndex(indexPath, interfaceName=interfaceName)
 
     def registerByEnv(self, env):
         """Register's the environment variable value, each path must be separated by os.pathsep
@@ -83,31 +133,294 @@ class PluginManager(object):
         """This function is similar to registerByModule() but works on packages, this is an expensive operation as it
         requires a recursive search by importing all sub modules and and searching them.
 
+        If this manager has a discovery index then only modules which contain plugins are imported for files which
+        haven't changed since the last discovery.
+
+        When discoveryThreads is greater than 1 the module source and compiled files are read on a thread pool
+        ahead of the import, see :func:`zoo.libs.utils.modules.prefetchModules`, the modules are still imported and
+        registered on the calling thread in a fixed order. The time taken per module is stored in moduleTimings.
+
         :param pkg: The package path to register eg. zoo.libs.apps
         :type pkg: str
         """
+        if self.discovery == STATIC_DISCOVERY:
+            self._registerByStaticPackage(pkg)
+            return
+        if self.index is not None:
+            self._registerByIndexedPackage(os.path.normpath(os.path.abspath(pkg)))
+            return
+        subModules = []
         for subModule in modules.iterModules(pkg):
             filename = os.path.splitext(os.path.basename(subModule))[0]
             if filename.startswith("__") or subModule.endswith(".pyc"):
                 continue
+            subModules.append(subModule)
+        for subModule, prefetchTime in modules.prefetchModules(subModules, self.discoveryThreads):
+            start = time.time()
+            subModuleObj = self._importPluginModule(os.path.normpath(subModule))
+            if subModuleObj is not None:
+                for member in modules.iterMembers(subModuleObj, predicate=inspect.isclass):
+                    self.registerPlugin(member[1])
+            self._recordModuleTiming(subModule, prefetchTime, time.time() - start)
+
+    def _registerByStaticPackage(self, pkg):
+        subModules = [os.path.normpath(subModule) for subModule in modules.iterModules(pkg)
+                      if subModule.endswith(".py") and not os.path.basename(subModule).startswith("__")]
+        moduleNames = {}
+        # plugins inherit metadata such as uiData from the interface, which is read the same way
+        interfaceAttributes = {self.interface.__name__: staticdiscovery.classAttributes(self.interface)}
+        for info in staticdiscovery.discoverPlugins(subModules, [self.interface.__name__], interfaceAttributes):
+            moduleName = moduleNames.get(info.filePath)
+            if moduleName is None:
+                moduleName = moduleNames[info.filePath] = modules.asDottedPath(info.filePath)
+            pluginId = info.attributes.get(self.variableName, info.className) if self.variableName else info.className
+            metadata = dict((attr, info.attributes[attr]) for attr in self.metadataAttributes
+                            if attr in info.attributes)
+            if "__doc__" in self.metadataAttributes:
+                metadata["__doc__"] = info.doc
+            self.registerLazyPlugin(pluginId, moduleName, info.className, metadata=metadata,
+                                    filePath=info.filePath)
+
+    def _registerByIndexedPackage(self, pkg):
+        index = self.index
+        subModules = index.packageModules(pkg)
+        entries = [index.validEntry(subModule) for subModule in subModules]
+        # only the modules which will actually be imported are prefetched
+        toImport = [subModule for subModule, entry in zip(subModules, entries)
+                    if entry is None or (entry["plugins"] and not self.lazy)]
+        prefetched = modules.prefetchModules(toImport, self.discoveryThreads)
+        toImport = set(toImport)
+        for subModule, entry in zip(subModules, entries):
+            prefetchTime = next(prefetched)[1] if subModule in toImport else 0.0
+            start = time.time()
+            if entry is not None and self._registerIndexEntry(entry, subModule):
+                if subModule in toImport:
+                    self._recordModuleTiming(subModule, prefetchTime, time.time() - start)
+                continue
+            subModuleObj = self._importPluginModule(subModule)
+            if subModuleObj is None:
+                index.removeFile(subModule)
+                continue
+            found = []
+            for className, member in modules.iterMembers(subModuleObj, predicate=inspect.isclass):
+                if not issubclass(member, self.interface):
+                    continue
+                self.registerPlugin(member)
+                found.append({"id": self._pluginName(member),
+                              "className": className,
+                              "metadata": self._pluginMetadata(member)})
+            index.updateFile(subModule, subModuleObj.__name__, found)
+            self._recordModuleTiming(subModule, prefetchTime, time.time() - start)
+        if index.isDirty:
+            index.save()
+
+    def _importPluginModule(self, subModule):
+        try:
+            return modules.importModule(modules.asDottedPath(subModule))
+        except ImportError:
+            logger.error("Failed to Import Plugin module: {}".format(subModule),
+                         exc_info=True)
+
+    def _recordModuleTiming(self, subModule, prefetchTime, loadTime):
+        self.moduleTimings[subModule] = {"prefetch": prefetchTime,
+                                         "load": loadTime}
+        logger.debug("Loaded plugin module: {} in {:.4f}s, prefetch: {:.4f}s".format(subModule, loadTime,
+                                                                                     prefetchTime))
+
+    def slowestModules(self, count=10):
+        """Returns the plugin modules which took the longest to import and register.
+
+        :param count: The maximum number of modules to return.
+        :type count: int
+        :return: A list of (modulePath, {"prefetch": seconds, "load": seconds}) sorted from slowest to fastest, \
+        where load is the time taken on the calling thread to import and register the module.
+        :rtype: list(tuple(str, dict))
+        """
+        timings = sorted(self.moduleTimings.items(), key=lambda item: item[1]["load"] + item[1]["prefetch"],
+                         reverse=True)
+        return timings[:count]
+
+    def _registerIndexEntry(self, entry, filePath):
+        """Registers the plugins from an unchanged index entry, modules without plugins are never imported and in
+        lazy mode the plugins are registered as proxies.
+
+        :return: False if the entry no longer matches the module and requires a rescan.
+        :rtype: bool
+        """
+        plugins = entry["plugins"]
+        if not plugins:
+            return True
+        if self.lazy:
+            for info in plugins:
+                self.registerLazyPlugin(info["id"], entry["module"], info["className"],
+                                        metadata=info.get("metadata"), filePath=filePath)
+            return True
+        try:
+            moduleObj = modules.importModule(entry["module"])
+        except ImportError:
+            return False
+        if moduleObj is None:
+            return False
+        classes = []
+        for info in plugins:
+            classObj = getattr(moduleObj, info["className"], None)
+            if classObj is None or not inspect.isclass(classObj):
+                return False
+            classes.append(classObj)
+        for classObj in classes:
+            self.registerPlugin(classObj)
+        return True
+
+    def _pluginMetadata(self, classObj):
+        metadata = {}
+        for attr in self.metadataAttributes:
+            value = getattr(classObj, attr, None)
             try:
-                subModuleObj = modules.importModule(modules.asDottedPath(os.path.normpath(subModule)))
-            except ImportError:
-                logger.error("Failed to Import Plugin module: {}".format(subModule),
-                             exc_info=True)
-            for member in modules.iterMembers(subModuleObj, predicate=inspect.isclass):
-                self.registerPlugin(member[1])
+                json.dumps(value)
+            except (TypeError, ValueError):
+                # only plain data can be stored in the index eg. a QIcon within uiData can't
+                continue
+            metadata[attr] = value
+        return metadata
+
+    def _pluginName(self, classObj):
+        return str(getattr(classObj, self.variableName) if hasattr(classObj, self.variableName) else classObj.__name__)
+
+    def _addPlugin(self, name, classObj):
+        existing = self.plugins.get(name)
+        if existing is not None:
+            self._pluginNames.pop(existing, None)
+        self.plugins[name] = classObj
+        self._pluginNames[classObj] = name
+        self._groups.setdefault(name.split(GROUP_SEPARATOR)[0], OrderedDict())[name] = None
+
+    def _removePlugin(self, name):
+        classObj = self.plugins.pop(name, None)
+        if classObj is None:
+            return
+        self._pluginNames.pop(classObj, None)
+        groupName = name.split(GROUP_SEPARATOR)[0]
+        group = self._groups.get(groupName)
+        if group is not None:
+            group.pop(name, None)
+            if not group:
+                del self._groups[groupName]
+        return classObj
 
     def registerPlugin(self, classObj):
         """Registers a plugin instance to the manager
 
         :param classObj: the plugin instance to registry
         :type classObj: Plugin
+        :return: The registered plugin name or None if the class was already registered or isn't a plugin.
+        :rtype: str or None
         """
-        if classObj not in self.plugins.values() and issubclass(classObj, self.interface):
-            name = getattr(classObj, self.variableName) if hasattr(classObj, self.variableName) else classObj.__name__
+        if classObj not in self._pluginNames and issubclass(classObj, self.interface):
+            name = self._pluginName(classObj)
             logger.debug("registering plugin -> {}".format(name))
-            self.plugins[str(name)] = classObj
+            self._addPlugin(name, classObj)
+            return name
+
+    def registerMany(self, classes):
+        """Registers a sequence of plugin classes, see registerPlugin().
+
+        :param classes: The plugin classes to register.
+        :type classes: iterable(class)
+        :return: The names of the newly registered plugins.
+        :rtype: list(str)
+        """
+        registered = []
+        for classObj in classes:
+            name = self.registerPlugin(classObj)
+            if name is not None:
+                registered.append(name)
+        return registered
+
+    def unregisterPlugin(self, name):
+        """Removes the plugin from the manager, any loaded instance of the plugin will be unloaded.
+
+        :param name: The registered plugin name.
+        :type name: str
+        :return: The unregistered plugin class or None if no plugin exists by that name.
+        :rtype: class or None
+        """
+        self.loadedPlugins.pop(name, None)
+        return self._removePlugin(name)
+
+    def unregisterMany(self, names):
+        """Removes a sequence of plugins by name, see unregisterPlugin().
+
+        :param names: The registered plugin names.
+        :type names: iterable(str)
+        :return: The names which were unregistered.
+        :rtype: list(str)
+        """
+        return [name for name in names if self.unregisterPlugin(name) is not None]
+
+    def pluginName(self, classObj):
+        """Returns the name the plugin class was registered with.
+
+        :param classObj: The plugin class or lazy plugin.
+        :type classObj: class or :class:`zoo.libs.plugin.plugin.LazyPlugin`
+        :rtype: str or None
+        """
+        return self._pluginNames.get(classObj)
+
+    def groups(self):
+        """Returns the registered plugins grouped by the first token of the plugin name, eg. "maya.rename" is part
+        of the "maya" group.
+
+        :rtype: dict(str, list)
+        """
+        return dict((groupName, [self.plugins[name] for name in names]) for groupName, names in self._groups.items())
+
+    def group(self, groupName):
+        """Returns the registered plugins within the group, see groups().
+
+        :param groupName: The group name eg. "maya".
+        :type groupName: str
+        :rtype: list
+        """
+        return [self.plugins[name] for name in self._groups.get(groupName, ())]
+
+    def registerLazyPlugin(self, pluginId, moduleName, className, metadata=None, filePath=""):
+        """Registers a plugin without importing its module, see :class:`zoo.libs.plugin.plugin.LazyPlugin`.
+
+        :param pluginId: The plugin name to register the plugin under.
+        :type pluginId: str
+        :param moduleName: The dotted module path which contains the plugin class.
+        :type moduleName: str
+        :param className: The plugin class name within the module.
+        :type className: str
+        :param metadata: Static plugin class attributes which can be accessed without importing eg. uiData.
+        :type metadata: dict
+        :param filePath: The module source file path.
+        :type filePath: str
+        :rtype: :class:`zoo.libs.plugin.plugin.LazyPlugin`
+        """
+        pluginId = str(pluginId)
+        existing = self.plugins.get(pluginId)
+        # never replace an already imported plugin class with a proxy
+        if existing is not None and not isinstance(existing, plugin.LazyPlugin):
+            return existing
+        proxy = plugin.LazyPlugin(pluginId, moduleName, className, metadata=metadata, filePath=filePath)
+        logger.debug("registering lazy plugin -> {}".format(pluginId))
+        self._addPlugin(pluginId, proxy)
+        return proxy
+
+    def _resolvePlugin(self, name):
+        """Returns the registered plugin class by name, importing the plugin module if the plugin is lazy.
+        """
+        classObj = self.plugins.get(name)
+        if not isinstance(classObj, plugin.LazyPlugin):
+            return classObj
+        try:
+            resolved = classObj.resolve()
+        except ImportError:
+            logger.error("Failed to import lazy plugin: {}".format(name), exc_info=True)
+            return
+        self._addPlugin(name, resolved)
+        return resolved
 
     def loadPlugin(self, pluginName, **kwargs):
         """Loads a given plugin by name. eg plugin(manager=self)
@@ -115,11 +428,11 @@ class PluginManager(object):
         :param name: the plugin to load by name
         :type name: str
         """
-        tool = self.plugins.get(pluginName)
+        tool = self._resolvePlugin(pluginName)
         if tool:
             logger.debug("Loading Plugin -> {}".format(pluginName))
             # pass the manager into the plugin, this is so we have access to any global info
-            spec= inspect.getargspec(tool.__init__)
+            spec = inspect.getargspec(tool.__init__)
             keywords = spec.keywords
             args = spec.args
 
@@ -139,8 +452,8 @@ class PluginManager(object):
     def loadAllPlugins(self):
         """Loops over all registered plugins and calls them eg. plugin(manager=self)
         """
-        for plugin in self.plugins:
-            self.loadPlugin(plugin)
+        for pluginName in self.plugins:
+            self.loadPlugin(pluginName)
 
     def getPlugin(self, name):
         """Returns the plugin instance by name
@@ -152,7 +465,7 @@ class PluginManager(object):
         """
         if name in self.loadedPlugins:
             return self.loadedPlugins.get(name)
-        return self.plugins.get(name)
+        return self._resolvePlugin(name)
 
     def unload(self, name):
         """Unload's a plugin by name from the manager
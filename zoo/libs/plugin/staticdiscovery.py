@@ -0,0 +1,181 @@
+"""This module finds plugin classes by parsing the module source with :mod:`ast` instead of importing it.
+
+No plugin code is executed, so plugins can be listed(eg. building menus) cheaply and before any heavy or DCC
+dependent modules can be imported. Only class attributes which are literals(strings, numbers, dicts, lists etc.)
+can be read statically, anything else is skipped.
+
+.. code-block:: python
+
+    for info in discoverPlugins(["/tools/commands/mycommands.py"], ["ZooCommand"]):
+        print info.className, info.attributes.get("id"), info.doc
+
+"""
+import ast
+import inspect
+
+from zoo.libs.utils import zlogging
+
+logger = zlogging.zooLogger
+
+
+class StaticClassInfo(object):
+    """Statically parsed class definition.
+    """
+
+    def __init__(self, className, bases, attributes, doc, filePath):
+        self.className = className
+        # the unqualified base class names eg. command.ZooCommand -> ZooCommand
+        self.bases = bases
+        # literal class level assignments, {name: value}
+        self.attributes = attributes
+        self.doc = doc
+        self.filePath = filePath
+
+    def __repr__(self):
+        return "<{}> class: {}, path: {}".format(self.__class__.__name__, self.className, self.filePath)
+
+
+def _baseName(node):
+    if isinstance(node, ast.Name):
+        return node.id
+    elif isinstance(node, ast.Attribute):
+        return node.attr
+    return ""
+
+
+def _literalAssignments(classNode):
+    attributes = {}
+    for node in classNode.body:
+        if isinstance(node, ast.Assign):
+            targets = [t.id for t in node.targets if isinstance(t, ast.Name)]
+        elif getattr(ast, "AnnAssign", None) is not None and isinstance(node, ast.AnnAssign) and node.value:
+            targets = [node.target.id] if isinstance(node.target, ast.Name) else []
+        else:
+            continue
+        if not targets:
+            continue
+        try:
+            value = ast.literal_eval(node.value)
+        except (ValueError, TypeError, SyntaxError):
+            continue
+        for target in targets:
+            attributes[target] = value
+    return attributes
+
+
+def parseModule(sourcePath):
+    """Parses the module source file and returns every top level class definition.
+
+    :param sourcePath: The absolute .py file path.
+    :type sourcePath: str
+    :return: The class definitions in the order they're defined, an empty list if the file can't be parsed.
+    :rtype: list(:class:`StaticClassInfo`)
+    """
+    try:
+        with open(sourcePath, "rb") as f:
+            tree = ast.parse(f.read(), filename=sourcePath)
+    except (IOError, OSError, SyntaxError, ValueError, TypeError):
+        logger.warning("Failed to parse plugin module: {}".format(sourcePath), exc_info=True)
+        return []
+    classes = []
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+        classes.append(StaticClassInfo(node.name,
+                                       [_baseName(b) for b in node.bases],
+                                       _literalAssignments(node),
+                                       ast.get_docstring(node),
+                                       sourcePath))
+    return classes
+
+
+def classAttributes(classObj):
+    """Returns the literal class attributes of an already imported class and its base classes, read from their
+    source files with the same rules as parseModule() so they match the attributes of statically parsed plugins.
+
+    :param classObj: The class eg. an interface class like ZooCommand.
+    :type classObj: class
+    :return: {name: value}, base class values are overridden by subclass values.
+    :rtype: dict
+    """
+    attributes = {}
+    parsed = {}
+    for cls in reversed(inspect.getmro(classObj)):
+        if cls is object:
+            continue
+        try:
+            sourcePath = inspect.getsourcefile(cls)
+        except TypeError:
+            continue
+        if not sourcePath:
+            continue
+        classes = parsed.get(sourcePath)
+        if classes is None:
+            classes = parsed[sourcePath] = dict((info.className, info) for info in parseModule(sourcePath))
+        info = classes.get(cls.__name__)
+        if info is not None:
+            attributes.update(info.attributes)
+    return attributes
+
+
+def discoverPlugins(sourcePaths, interfaceNames, interfaceAttributes=None):
+    """Statically finds all classes which subclass one of the interface names, directly or through another class
+    defined within sourcePaths.
+
+    Base classes are matched by their unqualified name, so both ``class A(ZooCommand)`` and
+    ``class A(command.ZooCommand)`` are found. Attributes which aren't defined on the class itself are inherited from
+    its statically parsed base classes and then from the interface attributes, see classAttributes().
+
+    :param sourcePaths: The absolute .py file paths to parse.
+    :type sourcePaths: list(str)
+    :param interfaceNames: The plugin interface class names eg. ["ZooCommand"].
+    :type interfaceNames: list(str)
+    :param interfaceAttributes: The class attributes of each interface, {interfaceName: {name: value}}.
+    :type interfaceAttributes: dict or None
+    :return: The plugin class definitions in file and definition order, attributes include inherited values.
+    :rtype: list(:class:`StaticClassInfo`)
+    """
+    classes = []
+    for sourcePath in sourcePaths:
+        classes.extend(parseModule(sourcePath))
+
+    known = set(interfaceNames)
+    plugins = set()
+    # subclasses may be defined before their base class so loop until nothing new is found
+    changed = True
+    while changed:
+        changed = False
+        for info in classes:
+            if id(info) in plugins or not known.intersection(info.bases):
+                continue
+            plugins.add(id(info))
+            known.add(info.className)
+            changed = True
+
+    byName = {}
+    for info in classes:
+        byName.setdefault(info.className, info)
+    results = []
+    for info in classes:
+        if id(info) not in plugins:
+            continue
+        attributes = _inheritedAttributes(info, byName, set(), interfaceAttributes or {})
+        attributes.update(info.attributes)
+        results.append(StaticClassInfo(info.className, info.bases, attributes, info.doc, info.filePath))
+    return results
+
+
+def _inheritedAttributes(info, byName, visited, interfaceAttributes):
+    attributes = {}
+    visited.add(info.className)
+    # reverse so the first base takes priority, matching python's lookup order closely enough for static data
+    for baseName in reversed(info.bases):
+        base = byName.get(baseName)
+        if base is None:
+            attributes.update(interfaceAttributes.get(baseName, {}))
+            continue
+        if baseName in visited:
+            continue
+        attributes.update(_inheritedAttributes(base, byName, visited, interfaceAttributes))
+        attributes.update(base.attributes)
+    return attributes
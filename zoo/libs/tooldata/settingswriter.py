@@ -0,0 +1,203 @@
+"""Background writer which debounces :meth:`zoo.libs.tooldata.tooldata.SettingObject.save` calls.
+
+While a writer is enabled SettingObject.save() returns immediately and the write happens on a background thread
+once the setting hasn't been saved again for `delay` seconds, so repeated saves of the same file eg. from a slider
+are coalesced into a single write. Pending saves are written when the process exits.
+
+Background saves are disabled by default, enable them in code or by setting ZOO_TOOLDATA_SAVE_DELAY to the delay in
+seconds.
+
+.. code-block:: python
+
+    from zoo.libs.tooldata import settingswriter
+    settingswriter.enable(delay=0.5)
+    setting.save()  # returns immediately
+    settingswriter.activeWriter().flush()  # blocks until every pending save is written
+
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_activeWriter = None
+
+
+class SettingsWriter(object):
+    """Coalesces setting saves per file and writes them on a daemon thread.
+
+    :param delay: The seconds to wait after the last save of a file before writing it.
+    :type delay: float
+    :param maxDelay: The maximum seconds a save can be postponed by repeated saves of the same file.
+    :type maxDelay: float
+    """
+    # the number of times a save is retried when the setting keeps changing while it's serialized
+    maxRetries = 5
+
+    def __init__(self, delay=0.5, maxDelay=5.0):
+        self.delay = delay
+        self.maxDelay = maxDelay
+        # {filePath: [setting, saveKwargs, dueTime, firstScheduledTime, retries]}
+        self._pending = {}
+        # the number of batches taken off the queue by the background thread which haven't been written yet
+        self._inFlight = 0
+        self._condition = threading.Condition()
+        # only one write at a time so a flush never races the thread writing an older version of the same file
+        self._writeLock = threading.Lock()
+        self._thread = None
+        self._stopped = False
+
+    def schedule(self, setting, **kwargs):
+        """Queues the setting to be saved, replacing any pending save of the same file.
+
+        :param setting: The setting to save.
+        :type setting: :class:`zoo.libs.tooldata.tooldata.SettingObject`
+        :param kwargs: The SettingObject.save() keyword arguments.
+        :type kwargs: dict
+        """
+        now = time.time()
+        key = str(setting.path())
+        with self._condition:
+            entry = self._pending.get(key)
+            first = entry[3] if entry is not None else now
+            self._pending[key] = [setting, kwargs, min(now + self.delay, first + self.maxDelay), first, 0]
+            self._stopped = False
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="zooSettingsWriter")
+                self._thread.daemon = True
+                self._thread.start()
+            self._condition.notify_all()
+
+    def pending(self):
+        """Returns the number of files waiting to be written.
+
+        :rtype: int
+        """
+        with self._condition:
+            return len(self._pending)
+
+    def flush(self):
+        """Writes every pending save on the calling thread, blocking until they're on disk including any save the
+        background thread is writing.
+        """
+        while True:
+            with self._condition:
+                while self._inFlight:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                entries = self._pending.values()
+                self._pending = {}
+            self._write(entries)
+
+    def stop(self, flush=True):
+        """Stops the background thread.
+
+        :param flush: If True the pending saves are written first, otherwise they're discarded.
+        :type flush: bool
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if flush:
+            self.flush()
+        else:
+            with self._condition:
+                self._pending = {}
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    now = time.time()
+                    due = [key for key, entry in self._pending.items() if entry[2] <= now]
+                    if due:
+                        break
+                    timeout = min(entry[2] for entry in self._pending.values()) - now if self._pending else None
+                    self._condition.wait(timeout)
+                if self._stopped:
+                    self._thread = None
+                    return
+                entries = [self._pending.pop(key) for key in due]
+                # flush() waits for these so a save is never lost between leaving the queue and reaching the disk
+                self._inFlight += 1
+            try:
+                self._write(entries)
+            finally:
+                with self._condition:
+                    self._inFlight -= 1
+                    self._condition.notify_all()
+
+    def _write(self, entries):
+        with self._writeLock:
+            for setting, kwargs, _, first, retries in entries:
+                try:
+                    setting._write(**kwargs)
+                except RuntimeError:
+                    # the setting was modified while it was being serialized, try again once it settles
+                    if retries >= self.maxRetries:
+                        logger.error("Setting kept changing during background save, "
+                                     "giving up after {} retries: {}".format(retries, setting.path()), exc_info=True)
+                        continue
+                    logger.debug("Setting changed during background save, retrying: {}".format(setting.path()))
+                    with self._condition:
+                        key = str(setting.path())
+                        if key not in self._pending:
+                            self._pending[key] = [setting, kwargs, time.time() + self.delay, first, retries + 1]
+                            self._condition.notify_all()
+                except Exception:
+                    logger.error("Failed to save setting: {}".format(setting.path()), exc_info=True)
+
+
+def activeWriter():
+    """Returns the enabled writer or None if saves are synchronous.
+
+    :rtype: :class:`SettingsWriter` or None
+    """
+    return _activeWriter
+
+
+def enable(delay=0.5, maxDelay=5.0):
+    """Enables background saves for every SettingObject, if already enabled the delays are updated.
+
+    :param delay: The seconds to wait after the last save of a file before writing it.
+    :type delay: float
+    :param maxDelay: The maximum seconds a save can be postponed by repeated saves of the same file.
+    :type maxDelay: float
+    :rtype: :class:`SettingsWriter`
+    """
+    global _activeWriter
+    if _activeWriter is None:
+        _activeWriter = SettingsWriter(delay, maxDelay)
+    else:
+        _activeWriter.delay = delay
+        _activeWriter.maxDelay = maxDelay
+    return _activeWriter
+
+
+def disable(flush=True):
+    """Disables background saves, SettingObject.save() writes synchronously again.
+
+    :param flush: If True the pending saves are written before returning.
+    :type flush: bool
+    """
+    global _activeWriter
+    writer = _activeWriter
+    _activeWriter = None
+    if writer is not None:
+        writer.stop(flush=flush)
+
+
+def _flushOnExit():
+    writer = _activeWriter
+    if writer is not None:
+        writer.flush()
+
+
+atexit.register(_flushOnExit)
+
+if os.environ.get("ZOO_TOOLDATA_SAVE_DELAY"):
+    enable(float(os.environ["ZOO_TOOLDATA_SAVE_DELAY"]))
@@ -10,15 +10,32 @@ Folder Hierarchy::
                                 |-setting.json
 
 """
+import hashlib
 import os
 import logging
-import copy
+import threading
+import time
 from collections import OrderedDict
+from zoo.libs.tooldata import settingswriter
 from zoo.libs.utils import filesystem
 from zoo.libs.utils import path
 
 logger = logging.getLogger(__name__)
 
+_JSON_CONTAINERS = (dict, list)
+
+
+def _copyJsonData(value):
+    """Copies the dicts and lists of decoded json data, the remaining json values are immutable so they're shared.
+
+    :param value: The decoded json dict or list.
+    :type value: dict or list
+    :rtype: dict or list
+    """
+    if type(value) is dict:
+        return {k: (v if type(v) not in _JSON_CONTAINERS else _copyJsonData(v)) for k, v in value.iteritems()}
+    return [(v if type(v) not in _JSON_CONTAINERS else _copyJsonData(v)) for v in value]
+
 
 class RootAlreadyExistsError(Exception):
     pass
@@ -36,6 +53,142 @@ class InvalidRootError(Exception):
     pass
 
 
+class RootIndex(object):
+    """In memory index of every file under a settings root, built with a single directory walk.
+
+    The mtime of each directory is stored so refresh() only lists the directories which had files added or
+    removed since the last walk, file contents aren't tracked by the index.
+
+    :param rootPath: The absolute root directory.
+    :type rootPath: str
+    """
+
+    def __init__(self, rootPath):
+        self.rootPath = str(rootPath)
+        # {relativeDirectory: (mtime, set(fileNames), set(directoryNames))}, "" is the root itself
+        self.directories = {}
+        # relative file paths using "/" separators
+        self.files = set()
+        self.lastRefresh = 0.0
+
+    def build(self):
+        """Walks the entire root, replacing the current index.
+        """
+        self.directories = {}
+        self.files = set()
+        self.lastRefresh = time.time()
+        try:
+            mtime = os.stat(self.rootPath).st_mtime
+        except OSError:
+            return
+        self._scan("", mtime)
+
+    def refresh(self):
+        """Lists again only the directories whose mtime changed since they were indexed.
+        """
+        if not self.directories:
+            self.build()
+            return
+        self.lastRefresh = time.time()
+        for relativeDirectory, (mtime, _, _) in sorted(self.directories.items()):
+            # the directory may have been dropped by a parent directory scan within this loop
+            if relativeDirectory not in self.directories:
+                continue
+            try:
+                current = os.stat(self._fullPath(relativeDirectory)).st_mtime
+            except OSError:
+                self._drop(relativeDirectory)
+                continue
+            if current != mtime:
+                self._scan(relativeDirectory, current)
+
+    def refreshFolder(self, relativePath):
+        """Lists the folder containing the file again if its mtime changed since it was indexed. If the folder
+        wasn't indexed its closest indexed parent folder is checked instead, which picks up new folders.
+
+        :param relativePath: The file path relative to the root.
+        :type relativePath: str
+        """
+        if not self.directories:
+            self.build()
+            return
+        relativeDirectory = str(relativePath).rpartition("/")[0]
+        while relativeDirectory and relativeDirectory not in self.directories:
+            relativeDirectory = relativeDirectory.rpartition("/")[0]
+        entry = self.directories.get(relativeDirectory)
+        if entry is None:
+            return
+        try:
+            current = os.stat(self._fullPath(relativeDirectory)).st_mtime
+        except OSError:
+            self._drop(relativeDirectory)
+            return
+        if current != entry[0]:
+            self._scan(relativeDirectory, current)
+
+    def contains(self, relativePath):
+        return str(relativePath) in self.files
+
+    def add(self, relativePath):
+        """Adds a file which was written by this process, avoiding a rescan of its directory.
+
+        :param relativePath: The file path relative to the root.
+        :type relativePath: str
+        """
+        relativePath = str(relativePath)
+        if relativePath in self.files:
+            return
+        self.files.add(relativePath)
+        relativeDirectory, name = relativePath.rpartition("/")[::2]
+        entry = self.directories.get(relativeDirectory)
+        if entry is not None:
+            entry[1].add(name)
+
+    def discard(self, relativePath):
+        """Removes the file from the index, called when an indexed file no longer exists on disk.
+        """
+        self.files.discard(str(relativePath))
+
+    def _fullPath(self, relativeDirectory):
+        if not relativeDirectory:
+            return self.rootPath
+        return os.path.join(self.rootPath, *relativeDirectory.split("/"))
+
+    def _scan(self, relativeDirectory, mtime):
+        fileNames = set()
+        directoryNames = {}
+        try:
+            for entry in filesystem.scanDir(self._fullPath(relativeDirectory)):
+                if entry.is_dir():
+                    directoryNames[entry.name] = entry.stat().st_mtime
+                else:
+                    fileNames.add(entry.name)
+        except OSError:
+            self._drop(relativeDirectory)
+            return
+        prefix = relativeDirectory + "/" if relativeDirectory else ""
+        previous = self.directories.get(relativeDirectory)
+        if previous is not None:
+            self.files.difference_update(prefix + name for name in previous[1])
+            for removed in previous[2].difference(directoryNames):
+                self._drop(prefix + removed)
+        self.files.update(prefix + name for name in fileNames)
+        self.directories[relativeDirectory] = (mtime, fileNames, set(directoryNames))
+        for name, childMtime in directoryNames.items():
+            child = self.directories.get(prefix + name)
+            if child is None or child[0] != childMtime:
+                self._scan(prefix + name, childMtime)
+
+    def _drop(self, relativeDirectory):
+        entry = self.directories.pop(relativeDirectory, None)
+        if entry is None:
+            return
+        prefix = relativeDirectory + "/" if relativeDirectory else ""
+        self.files.difference_update(prefix + name for name in entry[1])
+        for name in entry[2]:
+            self._drop(prefix + name)
+
+
 class ToolSet(object):
     """
     .. code-block:: python
@@ -59,6 +212,15 @@ class ToolSet(object):
     def __init__(self):
         self.roots = OrderedDict()
         self.extension = ".json"
+        # {(rootPath, relativePath): (mtime, size, jsonData, contentHash)}
+        self._settingsCache = {}
+        # {rootName: RootIndex}, built on first lookup
+        self._rootIndexes = {}
+        # the minimum seconds between full incremental index refreshes used by listSettings(), 0 refreshes on every
+        # call, findSetting() only checks the folder of the file it's looking for
+        self.indexRefreshInterval = 5.0
+        # guards the cache and the root indexes which background saves update, see settingswriter
+        self._lock = threading.RLock()
 
     def rootNameForPath(self, path):
         for name, root in self.roots.items():
@@ -81,6 +243,12 @@ class ToolSet(object):
         The first path to exist will be the one to be resolved. If a root is specified
         and the root+relativePath exists then that will be returned instead
 
+        The file content is cached per root and relative path until the file's mtime or size changes on disk, see
+        invalidate() and refresh(). Every call returns a new SettingObject holding a copy of the cached data so unsaved
+        changes made by one caller are never seen by another. When searching all roots each root's
+        :class:`RootIndex` is used to skip roots which don't contain the file, the mtime of the folder containing the
+        file is checked in each root on every lookup so files created by other processes are found straight away.
+
         :param relativePath:
         :type relativePath: str
         :param root: The Root name to search if root is None then all roots in reverse order will be search until a \
@@ -96,20 +264,181 @@ class ToolSet(object):
         if root is not None:
             rootPath = self.roots.get(root)
             if rootPath is not None:
-                fullpath = rootPath / relativePath
-                if not fullpath.exists():
-                    return SettingObject(rootPath, relativePath)
-                return self.open(rootPath, relativePath)
+                setting = self._cachedSetting(rootPath, relativePath)
+                if setting is None:
+                    setting = SettingObject(rootPath, relativePath)
+                    setting._bindToolSet(self)
+                return setting
         else:
             for name, p in reversed(self.roots.items()):
-                # we're working with an ordered dict
-                fullpath = p / relativePath
-                if not fullpath.exists():
+                # we're working with an ordered dict, a single folder stat keeps the index current for this file so
+                # files written by other processes are found straight away
+                index = self.rootIndex(name)
+                with self._lock:
+                    index.refreshFolder(relativePath)
+                    found = index.contains(relativePath)
+                if not found:
                     continue
-                return self.open(p, relativePath)
+                setting = self._cachedSetting(p, relativePath)
+                if setting is not None:
+                    return setting
+                with self._lock:
+                    index.discard(relativePath)
 
         return SettingObject("", relativePath)
 
+    def _cachedSetting(self, rootPath, relativePath):
+        """Returns a new setting from the cached data if the file hasn't changed since it was loaded, otherwise
+        the file is loaded and cached.
+
+        :return: The setting or None if the file doesn't exist within the root.
+        :rtype: :class:`SettingObject` or None
+        """
+        key = (str(rootPath), str(relativePath))
+        try:
+            st = os.stat(rootPath / relativePath)
+        except OSError:
+            with self._lock:
+                self._settingsCache.pop(key, None)
+            return
+        with self._lock:
+            cached = self._settingsCache.get(key)
+        if cached is not None and cached[0] == st.st_mtime and cached[1] == st.st_size:
+            return self._settingFromCache(rootPath, relativePath, cached)
+        return self.open(rootPath, relativePath)
+
+    def _settingFromCache(self, root, relativePath, cached):
+        mtime, size, data, contentHash = cached
+        setting = SettingObject(root, relativePath, **_copyJsonData(data))
+        # matches the file on disk so an unchanged save(skipUnchanged=True) is skipped, see SettingObject._write()
+        setting._setLastSave(contentHash, mtime, size)
+        setting._bindToolSet(self)
+        return setting
+
+    def _updateCache(self, root, relativePath, data, contentHash):
+        """Stores the setting's decoded json data in the cache using the current file mtime and size, called after
+        the setting has been loaded or saved. The data is never handed out, settings are built from copies of it.
+
+        :param root: The root path of the setting.
+        :type root: :class:`path.Path`
+        :param relativePath: The relative path of the setting file.
+        :type relativePath: :class:`path.Path`
+        :param data: The decoded json content of the file, without the reserved keys.
+        :type data: dict
+        :param contentHash: The md5 hex digest of the file content.
+        :type contentHash: str
+        :return: The cache entry or None if the file no longer exists.
+        :rtype: tuple or None
+        """
+        key = (str(root), str(relativePath))
+        try:
+            st = os.stat(root / relativePath)
+        except OSError:
+            st = None
+        with self._lock:
+            if st is None:
+                self._settingsCache.pop(key, None)
+                return
+            cached = (st.st_mtime, st.st_size, data, contentHash)
+            self._settingsCache[key] = cached
+            for index in self._rootIndexes.values():
+                if index.rootPath == key[0]:
+                    index.add(key[1])
+        return cached
+
+    def invalidate(self, relativePath=None, root=None, extension=None):
+        """Removes cached settings so the next findSetting() reads the file from disk.
+
+        :param relativePath: The relative setting path to remove, if None then every setting is removed, when \
+        both relativePath and root are None the root indexes are also rebuilt on the next lookup.
+        :type relativePath: str or None
+        :param root: The root name to remove the setting from, if None then the setting is removed for all roots.
+        :type root: str or None
+        """
+        if relativePath is None and root is None:
+            with self._lock:
+                self._settingsCache.clear()
+                self._rootIndexes.clear()
+            return
+        rootPath = str(self.root(root)) if root is not None else None
+        if relativePath is not None:
+            relativePath = path.Path(relativePath)
+            if not relativePath.getExtension(True):
+                relativePath = relativePath.setExtension(extension or self.extension)
+            relativePath = str(relativePath)
+        with self._lock:
+            for key in list(self._settingsCache.keys()):
+                if (rootPath is None or key[0] == rootPath) and (relativePath is None or key[1] == relativePath):
+                    del self._settingsCache[key]
+
+    def rootIndex(self, name):
+        """Returns the file index for the root, the index is built on first access and refreshed incrementally once
+        indexRefreshInterval has elapsed.
+
+        :param name: The root name.
+        :type name: str
+        :rtype: :class:`RootIndex`
+        """
+        with self._lock:
+            index = self._rootIndexes.get(name)
+            if index is None:
+                index = RootIndex(self.root(name))
+                index.build()
+                self._rootIndexes[name] = index
+            elif time.time() - index.lastRefresh >= self.indexRefreshInterval:
+                index.refresh()
+            return index
+
+    def refreshIndex(self, root=None):
+        """Incrementally refreshes the file index of the root or all roots which have been indexed.
+
+        :param root: The root name, if None all roots are refreshed.
+        :type root: str or None
+        """
+        with self._lock:
+            names = [root] if root is not None else list(self._rootIndexes.keys())
+            for name in names:
+                index = self._rootIndexes.get(name)
+                if index is None:
+                    self.rootIndex(name)
+                else:
+                    index.refresh()
+
+    def listSettings(self, prefix="", extension=None):
+        """Returns every setting under the prefix across all roots, each relative path is resolved to the highest
+        priority root which contains it, matching findSetting().
+
+        .. code-block:: python
+
+            for relativePath, rootName in tset.listSettings("prefs/hotkeys"):
+                print relativePath, rootName
+
+        :param prefix: The relative folder or path prefix eg. "tools/shaderEditor".
+        :type prefix: str
+        :param extension: The setting file extension, defaults to the toolset extension.
+        :type extension: str
+        :return: A sorted list of (relativePath, rootName).
+        :rtype: list(tuple(str, str))
+        """
+        prefix = str(path.Path(prefix)) if prefix else ""
+        extension = extension or self.extension
+        resolved = {}
+        with self._lock:
+            for name in self.roots.keys():
+                # later roots take priority so they overwrite earlier matches
+                for relativePath in self.rootIndex(name).files:
+                    if relativePath.startswith(prefix) and relativePath.endswith(extension):
+                        resolved[relativePath] = name
+        return sorted(resolved.items())
+
+    def refresh(self, relativePath, root=None, extension=None):
+        """Reloads the setting from disk, bypassing the cache, see findSetting().
+
+        :rtype: :class:`SettingObject`
+        """
+        self.invalidate(relativePath, root=root, extension=extension)
+        return self.findSetting(relativePath, root=root, extension=extension)
+
     def settingFromRootPath(self, relativePath, rootPath):
         fullpath = rootPath / relativePath
         if not fullpath.exists():
@@ -128,13 +457,22 @@ class ToolSet(object):
         fullPath = root / relativePath
         if not os.path.exists(fullPath):
             raise InvalidSettingsPath(fullPath)
-        data = filesystem.loadJson(fullPath)
-        return SettingObject(root, relativePath, **data)
+        with filesystem.loadFile(fullPath) as f:
+            content = f.read()
+        data = filesystem.decodeJson(content)
+        cached = self._updateCache(root, relativePath, data, hashlib.md5(content).hexdigest())
+        if cached is None:
+            setting = SettingObject(root, relativePath, **data)
+            setting._bindToolSet(self)
+            return setting
+        return self._settingFromCache(root, relativePath, cached)
 
 
 class SettingObject(dict):
     """Settings class to encapsulate the json data for a given setting
     """
+    # keys which describe where the setting lives and are never saved
+    reservedKeys = ("root", "relativePath")
 
     def __init__(self, root, relativePath=None, **kwargs):
 
@@ -145,6 +483,13 @@ class SettingObject(dict):
         kwargs["root"] = root
         super(SettingObject, self).__init__(**kwargs)
 
+    def _bindToolSet(self, toolSet):
+        # stored on the instance rather than the dict so it's never saved
+        super(SettingObject, self).__setattr__("_toolSet", toolSet)
+
+    def _setLastSave(self, contentHash, mtime, size):
+        super(SettingObject, self).__setattr__("_lastSave", (contentHash, mtime, size))
+
     def rootPath(self):
         if self.root:
             return self.root
@@ -175,11 +520,20 @@ class SettingObject(dict):
     def __setattr__(self, key, value):
         self[key] = value
 
-    def save(self, indent=False):
-        """Saves file to disk as json
+    def save(self, indent=False, skipUnchanged=False):
+        """Saves file to disk as json, the file is written to a temporary file and renamed so readers never see a
+        partially written setting.
+
+        If background saves are enabled, see :mod:`zoo.libs.tooldata.settingswriter`, the save is queued and this
+        returns immediately.
+
+        The root and relativePath keys are skipped while serializing so the setting data is never copied.
 
         :param indent: If True format the json nicely (indent=2)
         :type indent: bool
+        :param skipUnchanged: If True the write is skipped when the serialized content matches the last save or \
+        load of this instance and the file hasn't changed on disk since, useful for autosaving.
+        :type skipUnchanged: bool
         :return fullPath: The full path to the saved .json file
         :rtype fullPath: str
         """
@@ -187,17 +541,37 @@ class SettingObject(dict):
 
         if not root:
             return path.Path()
-        fullPath = root / self.relativePath
-        filesystem.ensureFolderExists(os.path.dirname(str(fullPath)))
-        output = copy.deepcopy(self)
-        del output["root"]
-        del output["relativePath"]
+        writer = settingswriter.activeWriter()
+        if writer is not None:
+            writer.schedule(self, indent=indent, skipUnchanged=skipUnchanged)
+            return self.path()
+        return self._write(indent, skipUnchanged)
+
+    def _write(self, indent=False, skipUnchanged=False):
+        fullPath = self.root / self.relativePath
         exts = fullPath.getExtension(True)
         if not exts:
             fullPath = fullPath.setExtension("json", True)
-        if not indent:
-            filesystem.saveJson(output, str(fullPath))
-        else:
-            filesystem.saveJson(output, str(fullPath), indent=2)
+        # a shallow dict only holds references to the values, it's the reserved keys we need to drop
+        output = dict(item for item in self.iteritems() if item[0] not in SettingObject.reservedKeys)
+        content = filesystem.encodeJson(output, indent=2 if indent else None)
+        contentHash = hashlib.md5(content).hexdigest()
+        lastSave = self.__dict__.get("_lastSave")
+        if skipUnchanged and lastSave is not None and lastSave[0] == contentHash:
+            try:
+                st = os.stat(fullPath)
+            except OSError:
+                st = None
+            if st is not None and (st.st_mtime, st.st_size) == lastSave[1:]:
+                return self.path()
 
+        filesystem.ensureFolderExists(os.path.dirname(str(fullPath)))
+        with filesystem.atomicFile(fullPath) as f:
+            f.write(content)
+        st = os.stat(fullPath)
+        self._setLastSave(contentHash, st.st_mtime, st.st_size)
+        toolSet = self.__dict__.get("_toolSet")
+        if toolSet is not None:
+            # decoded from what was written rather than copied from output, which the caller may still be changing
+            toolSet._updateCache(self.root, self.relativePath, filesystem.decodeJson(content), contentHash)
         return self.path()
@@ -0,0 +1,297 @@
+"""Parallel file copying with progress, retries, verification and resumable batches.
+
+Each file is copied to a temporary file next to the destination and renamed once complete so a destination is
+never left partially written. Completed files can be recorded in a journal, if a batch is interrupted running the
+same batch again with the same journal skips the files which were already copied.
+
+.. code-block:: python
+
+    def onProgress(copiedBytes, totalBytes):
+        print "{:.1f}%".format(100.0 * copiedBytes / max(totalBytes, 1))
+
+    engine = CopyEngine(workers=8, verify=True, totalProgress=onProgress,
+                        journalPath="/publish/textures/.copyjournal")
+    result = engine.copy([("/work/tex/diffuse.tx", "/publish/textures/diffuse.tx")])
+    for source, destination, error in result.failed:
+        print source, error
+
+"""
+import errno
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import deque
+
+from zoo.libs.utils import filesystem
+from zoo.libs.utils import zlogging
+
+logger = zlogging.getLogger(__name__)
+
+# errors worth another attempt, eg. a busy file or a dropped network share, ESTALE and ETIMEDOUT don't exist on
+# every platform
+TRANSIENT_ERRNOS = frozenset(getattr(errno, name) for name in ("EAGAIN", "EBUSY", "EINTR", "EIO", "ESTALE",
+                                                                "ETIMEDOUT", "ECONNRESET", "ECONNABORTED",
+                                                                "EHOSTDOWN", "ENETDOWN", "ENETRESET")
+                             if hasattr(errno, name))
+
+
+class ChecksumError(IOError):
+    """Raised when the copied file doesn't match the source checksum.
+    """
+
+
+class CopyCancelled(Exception):
+    pass
+
+
+class CopyResult(object):
+    """The outcome of :meth:`CopyEngine.copy`.
+    """
+
+    def __init__(self):
+        # (source, destination) pairs
+        self.copied = []
+        # (source, destination) pairs which the journal marked as already copied
+        self.skipped = []
+        # (source, destination, error message)
+        self.failed = []
+        self.bytesCopied = 0
+        self.totalBytes = 0
+        self.cancelled = False
+
+    def __repr__(self):
+        return "<{}> copied: {}, skipped: {}, failed: {}".format(self.__class__.__name__, len(self.copied),
+                                                                 len(self.skipped), len(self.failed))
+
+
+class CopyEngine(object):
+    """Copies batches of files on a bounded pool of worker threads.
+
+    Callbacks are called from the worker threads, one at a time.
+
+    :param workers: The number of files copied at the same time.
+    :type workers: int
+    :param retries: The number of extra attempts for a file after a transient IOError or OSError, see \
+    TRANSIENT_ERRNOS, any other error fails the file straight away.
+    :type retries: int
+    :param retryDelay: The seconds to wait before the first retry, doubled for each following retry.
+    :type retryDelay: float
+    :param verify: If True the destination is read back and compared against the source checksum.
+    :type verify: bool
+    :param hashAlgorithm: The :mod:`hashlib` algorithm used for verification and the journal.
+    :type hashAlgorithm: str
+    :param journalPath: Optional json-lines file recording every completed file, the journal is removed once a \
+    batch completes without failures.
+    :type journalPath: str or None
+    :param permissions: The permissions used for created destination folders.
+    :type permissions: int
+    :param chunkSize: The number of bytes read and written at a time.
+    :type chunkSize: int
+    :param fileProgress: Called as fileProgress(source, destination, copiedBytes, fileBytes).
+    :type fileProgress: callable or None
+    :param totalProgress: Called as totalProgress(copiedBytes, totalBytes) for the entire batch.
+    :type totalProgress: callable or None
+    :param preserveTimes: If True the access and modification times are copied along with the permissions.
+    :type preserveTimes: bool
+    """
+
+    def __init__(self, workers=4, retries=3, retryDelay=0.5, verify=False, hashAlgorithm="md5", journalPath=None,
+                 permissions=0775, chunkSize=1 << 20, fileProgress=None, totalProgress=None,
+                 preserveTimes=False):
+        self.workers = workers
+        self.retries = retries
+        self.retryDelay = retryDelay
+        self.verify = verify
+        self.hashAlgorithm = hashAlgorithm
+        self.journalPath = journalPath
+        self.permissions = permissions
+        self.chunkSize = chunkSize
+        self.fileProgress = fileProgress
+        self.totalProgress = totalProgress
+        self.preserveTimes = preserveTimes
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._result = None
+
+    def cancel(self):
+        """Stops the running batch, files being copied are abandoned and their temporary files removed.
+        """
+        self._cancelled.set()
+
+    def copy(self, paths):
+        """Copies every (source, destination) pair, blocking until the batch completes.
+
+        :param paths: The files to copy.
+        :type paths: iterable(tuple(str, str))
+        :rtype: :class:`CopyResult`
+        """
+        self._cancelled.clear()
+        result = CopyResult()
+        self._result = result
+        journal = self._loadJournal()
+        jobs = deque()
+        for source, destination in paths:
+            try:
+                st = os.stat(source)
+            except OSError as er:
+                result.failed.append((source, destination, str(er)))
+                continue
+            entry = journal.get((source, destination))
+            if entry is not None and self._journalEntryValid(entry, st, destination):
+                result.skipped.append((source, destination))
+                continue
+            jobs.append((source, destination, st))
+            result.totalBytes += st.st_size
+
+        journalFile = None
+        if self.journalPath and jobs:
+            filesystem.ensureFolderExists(os.path.dirname(self.journalPath))
+            journalFile = open(self.journalPath, "a")
+        try:
+            workerCount = min(self.workers, len(jobs))
+            if workerCount < 2:
+                self._worker(jobs, journalFile)
+            else:
+                threads = [threading.Thread(target=self._worker, args=(jobs, journalFile), name="zooCopy")
+                           for _ in xrange(workerCount)]
+                for thread in threads:
+                    thread.daemon = True
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+        finally:
+            if journalFile is not None:
+                journalFile.close()
+        result.cancelled = self._cancelled.is_set()
+        if self.journalPath and not result.failed and not result.cancelled and os.path.exists(self.journalPath):
+            os.remove(self.journalPath)
+        return result
+
+    def _worker(self, jobs, journalFile):
+        while not self._cancelled.is_set():
+            with self._lock:
+                if not jobs:
+                    return
+                source, destination, st = jobs.popleft()
+            self._copyWithRetries(source, destination, st, journalFile)
+
+    def _copyWithRetries(self, source, destination, st, journalFile):
+        result = self._result
+        attempt = 0
+        while True:
+            copiedBytes = [0]
+            try:
+                checksum = self._copyFile(source, destination, st.st_size, copiedBytes)
+            except CopyCancelled:
+                self._progress(source, destination, -copiedBytes[0], st.st_size)
+                return
+            except EnvironmentError as er:
+                # undo the progress of the failed attempt so the totals stay accurate
+                self._progress(source, destination, -copiedBytes[0], st.st_size)
+                transient = er.errno in TRANSIENT_ERRNOS
+                if attempt >= self.retries or not transient or self._cancelled.is_set():
+                    logger.error("Failed to copy {} -> {}: {}".format(source, destination, er))
+                    with self._lock:
+                        result.failed.append((source, destination, str(er)))
+                    return
+                delay = self.retryDelay * (2 ** attempt)
+                attempt += 1
+                logger.warning("Retrying copy {} -> {} in {}s: {}".format(source, destination, delay, er))
+                time.sleep(delay)
+                continue
+            with self._lock:
+                result.copied.append((source, destination))
+                if journalFile is not None:
+                    journalFile.write(json.dumps({"source": source,
+                                                  "destination": destination,
+                                                  "mtime": st.st_mtime,
+                                                  "size": st.st_size,
+                                                  "checksum": checksum}) + "\n")
+                    journalFile.flush()
+            return
+
+    def _copyFile(self, source, destination, size, copiedBytes):
+        """Copies a single file through a temporary file, returns the source checksum or None if verify is off.
+        """
+        directory = os.path.dirname(destination)
+        if directory and not os.path.isdir(directory):
+            filesystem.ensureFolderExists(directory, self.permissions)
+        tempPath = "{}.{}.{}.part".format(destination, os.getpid(), threading.current_thread().ident)
+        try:
+            checksum = self._copyData(source, tempPath, size, copiedBytes, destination)
+            if self.preserveTimes:
+                shutil.copystat(source, tempPath)
+            else:
+                shutil.copymode(source, tempPath)
+            if checksum is not None and self._fileChecksum(tempPath) != checksum:
+                raise ChecksumError(errno.EIO, "Checksum mismatch", destination)
+            filesystem.replaceFile(tempPath, destination)
+        except BaseException:
+            if os.path.exists(tempPath):
+                os.remove(tempPath)
+            raise
+        return checksum
+
+    def _copyData(self, source, tempPath, size, copiedBytes, destination):
+        if not self.verify:
+            # no checksum to compute so the data can be copied within the kernel
+            def onChunk(count):
+                copiedBytes[0] += count
+                self._progress(source, destination, count, size, copiedBytes[0])
+                if self._cancelled.is_set():
+                    raise CopyCancelled()
+
+            if self._cancelled.is_set():
+                raise CopyCancelled()
+            filesystem.copyFileData(source, tempPath, chunkSize=self.chunkSize, progress=onChunk)
+            return None
+        hasher = hashlib.new(self.hashAlgorithm)
+        with open(source, "rb") as src, open(tempPath, "wb") as dst:
+            while True:
+                if self._cancelled.is_set():
+                    raise CopyCancelled()
+                chunk = src.read(self.chunkSize)
+                if not chunk:
+                    break
+                dst.write(chunk)
+                hasher.update(chunk)
+                copiedBytes[0] += len(chunk)
+                self._progress(source, destination, len(chunk), size, copiedBytes[0])
+        return hasher.hexdigest()
+
+    def _fileChecksum(self, filePath):
+        return filesystem.fileChecksum(filePath, self.hashAlgorithm, self.chunkSize)
+
+    def _progress(self, source, destination, delta, fileBytes, fileCopied=None):
+        with self._lock:
+            self._result.bytesCopied += delta
+            total = self._result.bytesCopied
+            if fileCopied is not None and self.fileProgress is not None:
+                self.fileProgress(source, destination, fileCopied, fileBytes)
+            if self.totalProgress is not None:
+                self.totalProgress(total, self._result.totalBytes)
+
+    def _loadJournal(self):
+        journal = {}
+        if not self.journalPath or not os.path.exists(self.journalPath):
+            return journal
+        with open(self.journalPath) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # the last line may be incomplete if the process was killed while writing it
+                    continue
+                journal[(entry["source"], entry["destination"])] = entry
+        return journal
+
+    def _journalEntryValid(self, entry, st, destination):
+        if entry["size"] != st.st_size or entry["mtime"] != st.st_mtime:
+            return False
+        try:
+            return os.path.getsize(destination) == st.st_size
+        except OSError:
+            return False
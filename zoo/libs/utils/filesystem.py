@@ -1,5 +1,6 @@
 import contextlib
 import json
+import mmap
 import os
 import subprocess
 import shutil
@@ -8,14 +9,33 @@ import zipfile
 import cStringIO
 import re
 import functools
+import hashlib
+import stat as statModule
 import sys
+import tempfile
+import threading
 
 from zoo.libs.utils import zlogging, commandline
 
+try:
+    from os import scandir as _scandir
+except ImportError:
+    # python 2, use the scandir backport if it's installed
+    try:
+        from scandir import scandir as _scandir
+    except ImportError:
+        _scandir = None
+
 logger = zlogging.getLogger(zlogging.CENTRAL_LOGGER_NAME)
 
 FILENAMEEXP = re.compile(u'[^\w\.-1]', re.UNICODE)
 
+# optional json decoders which can be selected with ZOO_JSON_BACKEND, see setJsonBackend()
+JSON_BACKENDS = ("orjson", "ujson", "rapidjson", "simplejson")
+_jsonBackends = {"json": json.loads}
+# (name, loads), resolved on first use
+_activeJsonBackend = None
+
 
 def clearUnMasked(func):
     """Decorator which clears the umask for a method.
@@ -141,41 +161,206 @@ def copyFile(src, dst, permissions=0666):
         old_umask = os.umask(0)
         os.makedirs(dirname, permissions)
         os.umask(old_umask)
-    shutil.copy(src, dst)
+    # matches shutil.copy
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+    copyFileData(src, dst)
+    shutil.copymode(src, dst)
     # os.chmod(dst, permissions)
 
 
-def batchCopyFiles(paths, permissions=0777):
-    """ Expects the parent folder to have been already created.
+def _libc():
+    global _libcHandle
+    if _libcHandle is None:
+        _libcHandle = False
+        if sys.platform.startswith("linux"):
+            try:
+                import ctypes
+                libc = ctypes.CDLL(None, use_errno=True)
+                if hasattr(libc, "copy_file_range"):
+                    libc.copy_file_range.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int, ctypes.c_void_p,
+                                                     ctypes.c_size_t, ctypes.c_uint]
+                    libc.copy_file_range.restype = ctypes.c_ssize_t
+                if hasattr(libc, "sendfile"):
+                    libc.sendfile.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p, ctypes.c_size_t]
+                    libc.sendfile.restype = ctypes.c_ssize_t
+                _libcHandle = libc
+            except (ImportError, OSError):
+                logger.debug("Failed to load libc, zero copy file copies are disabled", exc_info=True)
+    return _libcHandle
+
+
+def _reflink(srcFile, dstFile, size, chunkSize, progress):
+    import fcntl
+    fcntl.ioctl(dstFile.fileno(), _FICLONE, srcFile.fileno())
+    if progress is not None:
+        progress(size)
+    return size
+
+
+def _kernelCopyLoop(copyChunk, size, chunkSize, progress):
+    copied = 0
+    while copied < size:
+        count = copyChunk(min(chunkSize, size - copied))
+        if count == 0:
+            if copied == 0:
+                # some filesystems eg. overlay, fuse and procfs report success without copying anything
+                raise OSError(errno.ENOSYS, "Kernel copy returned no data")
+            break
+        copied += count
+        if progress is not None:
+            progress(count)
+    if copied < size:
+        raise IOError(errno.EIO, "Copied {} of {} bytes, the source may have been truncated".format(copied, size))
+    return copied
+
+
+def _systemCall(function, *args):
+    import ctypes
+    result = function(*args)
+    if result < 0:
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error))
+    return result
+
+
+def _copyFileRange(srcFile, dstFile, size, chunkSize, progress):
+    srcFd, dstFd = srcFile.fileno(), dstFile.fileno()
+    if hasattr(os, "copy_file_range"):
+        def copyChunk(count):
+            return os.copy_file_range(srcFd, dstFd, count)
+    else:
+        libc = _libc()
+        if not libc or not hasattr(libc, "copy_file_range"):
+            raise OSError(errno.ENOSYS, "copy_file_range isn't available")
+
+        def copyChunk(count):
+            return _systemCall(libc.copy_file_range, srcFd, None, dstFd, None, count, 0)
+    return _kernelCopyLoop(copyChunk, size, chunkSize, progress)
+
+
+def _sendfile(srcFile, dstFile, size, chunkSize, progress):
+    srcFd, dstFd = srcFile.fileno(), dstFile.fileno()
+    if hasattr(os, "sendfile") and sys.platform.startswith("linux"):
+        offset = [0]
+
+        def copyChunk(count):
+            sent = os.sendfile(dstFd, srcFd, offset[0], count)
+            offset[0] += sent
+            return sent
+    else:
+        libc = _libc()
+        if not libc or not hasattr(libc, "sendfile"):
+            raise OSError(errno.ENOSYS, "sendfile isn't available")
+
+        def copyChunk(count):
+            return _systemCall(libc.sendfile, dstFd, srcFd, None, count)
+    return _kernelCopyLoop(copyChunk, size, chunkSize, progress)
+
+
+def _pythonCopy(srcFile, dstFile, size, chunkSize, progress):
+    copied = 0
+    while True:
+        chunk = srcFile.read(chunkSize)
+        if not chunk:
+            return copied
+        dstFile.write(chunk)
+        copied += len(chunk)
+        if progress is not None:
+            progress(len(chunk))
+
+
+# the copy methods tried by copyFileData() in order, the first which succeeds is used
+COPY_METHODS = ("reflink", "copy_file_range", "sendfile", "python")
+_copyMethods = {"reflink": _reflink,
+                "copy_file_range": _copyFileRange,
+                "sendfile": _sendfile,
+                "python": _pythonCopy}
+# errnos raised when a method isn't supported by the platform or filesystems, the next method is tried instead
+_UNSUPPORTED_ERRNOS = set(getattr(errno, name) for name in ("ENOSYS", "EXDEV", "EINVAL", "EOPNOTSUPP", "ENOTSUP",
+                                                           "ENOTTY", "EBADF", "EPERM")
+                          if hasattr(errno, name))
+# linux ioctl request for sharing the source extents with the destination eg. btrfs, xfs, zfs
+_FICLONE = 0x40049409
+_libcHandle = None
+
+
+def copyFileData(src, dst, methods=None, chunkSize=64 << 20, progress=None):
+    """Copies the contents of src to dst, without the permissions, using the fastest method available.
+
+    On linux the file is reflinked when the filesystem supports sharing extents, otherwise copy_file_range or
+    sendfile copy the data within the kernel so it never passes through python. Any other platform, or when the
+    kernel methods aren't supported for the two files, falls back to a python read/write loop.
+
+    :param src: The source file path.
+    :type src: str
+    :param dst: The destination file path, replaced if it exists.
+    :type dst: str
+    :param methods: The methods to try in order, defaults to COPY_METHODS.
+    :type methods: iterable(str) or None
+    :param chunkSize: The number of bytes copied per call, progress is reported after each chunk.
+    :type chunkSize: int
+    :param progress: Called with the number of bytes copied by each chunk.
+    :type progress: callable or None
+    :return: The name of the method which copied the file.
+    :rtype: str
+    :raise: :class:`shutil.Error` when src and dst are the same file.
+    """
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        # opening dst would truncate the source
+        raise shutil.Error("{} and {} are the same file".format(src, dst))
+    methods = methods or COPY_METHODS
+    if not sys.platform.startswith("linux"):
+        methods = [m for m in methods if m == "python"] or ["python"]
+    size = os.path.getsize(src)
+    with open(src, "rb") as srcFile, open(dst, "wb") as dstFile:
+        for method in methods:
+            try:
+                _copyMethods[method](srcFile, dstFile, size, chunkSize, progress)
+                return method
+            except (IOError, OSError) as er:
+                # only fall back if nothing has been written yet
+                if er.errno not in _UNSUPPORTED_ERRNOS or os.lseek(dstFile.fileno(), 0, os.SEEK_CUR):
+                    raise
+                logger.debug("Copy method {} not supported for {}: {}".format(method, src, er))
+        raise OSError(errno.ENOSYS, "No copy method succeeded for: {}".format(src))
+
+
+def batchCopyFiles(paths, permissions=0777, **kwargs):
+    """Copies the files in parallel, see :class:`zoo.libs.utils.copyengine.CopyEngine` for the keyword arguments
+    which control the number of workers, retries, verification, progress callbacks and the resume journal.
 
     :param paths: source path, destination path
     :type paths: tuple(tuple(str, str))
-    :param permissions: OS permissions
+    :param permissions: OS permissions used for created destination folders
     :type permissions: int
     :return: a list of tuples containing source,destination fails
     :rtype: list(tuple(str, str)
     """
-    failed = []
-    for source, destination in paths:
-        try:
-            logger.info("Copying %s --> %s..." % (source, destination))
-            copy_file(source, destination, permissions=permissions)
-        except OSError:
-            raise
-            failed.append((source, destination))
-            continue
-    return failed
+    # imported here as the copy engine depends on this module
+    from zoo.libs.utils import copyengine
+    result = copyengine.CopyEngine(permissions=permissions, **kwargs).copy(paths)
+    return [(source, destination) for source, destination, _ in result.failed]
 
 
-def copyDirectoy(src, dst, ignorePattern=None):
+def copyDirectoy(src, dst, ignorePattern=None, sync=False, **kwargs):
     """Copies the directory tree using shutil.copytree
 
     :param src: the Source directory to copy.
     :type src: str
     :param dst: the destination directory.
     :type dst: str
+    :param ignorePattern: glob style file and folder names to ignore eg. ["*.pyc", ".git"]
+    :type ignorePattern: list(str) or None
+    :param sync: If True dst may already exist and only the files which differ are copied, see syncDirectory() \
+    for the keyword arguments.
+    :type sync: bool
+    :return: The SyncResult if sync is True, otherwise None.
+    :rtype: :class:`SyncResult` or None
     :raise: OSError
     """
+    if sync:
+        return syncDirectory(src, dst, ignorePattern=ignorePattern, **kwargs)
     try:
         if ignorePattern:
             shutil.copytree(src, dst, ignore=shutil.ignore_patterns(*ignorePattern))
@@ -190,6 +375,255 @@ def copyDirectoy(src, dst, ignorePattern=None):
             raise
 
 
+def fileChecksum(filePath, algorithm="md5", chunkSize=1 << 20):
+    """Returns the hex digest of the file contents.
+
+    :param filePath: The file path to hash.
+    :type filePath: str
+    :param algorithm: The :mod:`hashlib` algorithm name.
+    :type algorithm: str
+    :param chunkSize: The number of bytes read at a time.
+    :type chunkSize: int
+    :rtype: str
+    """
+    hasher = hashlib.new(algorithm)
+    with open(filePath, "rb") as f:
+        for chunk in iter(lambda: f.read(chunkSize), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+# the folder syncDirectory() keeps its content hash caches in, one file per destination, see syncCachePath()
+SYNC_CACHE_FOLDER = os.path.join(tempfile.gettempdir(), "zoosync")
+
+
+class SyncResult(object):
+    """The outcome of :func:`syncDirectory`, file paths are relative to the synced folders and use forward slashes.
+    """
+
+    def __init__(self):
+        self.copied = []
+        self.skipped = []
+        self.deleted = []
+        # (relativePath, error message)
+        self.failed = []
+
+    def __repr__(self):
+        return "<{}> copied: {}, skipped: {}, deleted: {}, failed: {}".format(self.__class__.__name__,
+                                                                              len(self.copied), len(self.skipped),
+                                                                              len(self.deleted), len(self.failed))
+
+
+def syncDirectory(src, dst, hashCheck=False, delete=False, ignorePattern=None, hashAlgorithm="md5",
+                  mtimeTolerance=0.01, workers=4, cachePath=None, **kwargs):
+    """Makes dst a copy of src copying only the files which differ, useful when republishing packages where most
+    files haven't changed.
+
+    A file is copied when it's missing from dst or its size differs. Otherwise when hashCheck is False the
+    modification times are compared, when hashCheck is True the content hashes are compared instead. Hashes are
+    kept in a sidecar json file keyed by each file's size and mtime so a file is only hashed again once it changes,
+    which makes repeated syncs close to free. Copied files keep the source modification time.
+
+    The hash cache is stored outside of dst by default, see syncCachePath(), so it's never published. A cachePath
+    within dst is excluded from the sync and is never copied or deleted.
+
+    The ignorePattern applies to both folders, ignored files in dst are left untouched even when delete is True.
+    Files which fail to copy or delete are logged and added to the result's failed list, the rest of the sync
+    continues.
+
+    :param src: The source folder.
+    :type src: str
+    :param dst: The destination folder, created if it doesn't exist.
+    :type dst: str
+    :param hashCheck: If True files with the same size are compared by content instead of modification time.
+    :type hashCheck: bool
+    :param delete: If True files and folders in dst which aren't in src are deleted.
+    :type delete: bool
+    :param ignorePattern: glob style file and folder names to ignore eg. ["*.pyc", ".git"]
+    :type ignorePattern: list(str) or None
+    :param hashAlgorithm: The :mod:`hashlib` algorithm used for the content hashes.
+    :type hashAlgorithm: str
+    :param mtimeTolerance: The seconds two modification times can differ by and still match, network shares \
+    and FAT drives may need 2 seconds.
+    :type mtimeTolerance: float
+    :param workers: The number of files hashed and copied at the same time.
+    :type workers: int
+    :param cachePath: The hash cache file path, defaults to syncCachePath(dst).
+    :type cachePath: str or None
+    :param kwargs: Extra :class:`zoo.libs.utils.copyengine.CopyEngine` arguments eg. retries or totalProgress.
+    :type kwargs: dict
+    :rtype: :class:`SyncResult`
+    """
+    from zoo.libs.utils import copyengine
+    cachePath = cachePath or syncCachePath(dst)
+    ignore = shutil.ignore_patterns(*ignorePattern) if ignorePattern else None
+    sourceFiles, sourceFolders = _syncTree(src, ignore)
+    destinationFiles, destinationFolders = _syncTree(dst, ignore) if os.path.isdir(dst) else ({}, set())
+    cacheRelative = os.path.relpath(cachePath, dst).replace(os.sep, "/")
+    destinationFiles.pop(cacheRelative, None)
+    sourceFiles.pop(cacheRelative, None)
+    cache = _loadSyncCache(cachePath, src, hashAlgorithm)
+    result = SyncResult()
+
+    toCopy = []
+    toHash = []
+    for relativePath in sorted(sourceFiles):
+        size, mtime = sourceFiles[relativePath]
+        existing = destinationFiles.get(relativePath)
+        if existing is None or existing[0] != size:
+            toCopy.append(relativePath)
+        elif hashCheck:
+            toHash.append(relativePath)
+        elif abs(existing[1] - mtime) <= mtimeTolerance:
+            result.skipped.append(relativePath)
+        else:
+            toCopy.append(relativePath)
+
+    sourceHashes = {}
+    if hashCheck:
+        # hash the files being copied as well so the next sync doesn't need to hash either side
+        sourceHashes = _cachedHashes(src, toHash + toCopy, sourceFiles, cache["source"], hashAlgorithm, workers)
+    if toHash:
+        destinationHashes = _cachedHashes(dst, toHash, destinationFiles, cache["destination"], hashAlgorithm,
+                                          workers)
+        for relativePath in toHash:
+            if sourceHashes[relativePath] != destinationHashes[relativePath]:
+                toCopy.append(relativePath)
+                continue
+            result.skipped.append(relativePath)
+            if abs(sourceFiles[relativePath][1] - destinationFiles[relativePath][1]) > mtimeTolerance:
+                # same content, match the times so the next sync without hashCheck skips the file as well
+                destinationPath = os.path.join(dst, *relativePath.split("/"))
+                shutil.copystat(os.path.join(src, *relativePath.split("/")), destinationPath)
+                st = os.stat(destinationPath)
+                cache["destination"][relativePath] = [st.st_size, st.st_mtime, sourceHashes[relativePath]]
+        toCopy.sort()
+
+    for relativePath in sourceFolders - destinationFolders:
+        ensureFolderExists(os.path.join(dst, *relativePath.split("/")))
+    if toCopy:
+        engine = copyengine.CopyEngine(workers=workers, preserveTimes=True, **kwargs)
+        copyResult = engine.copy([(os.path.join(src, *relativePath.split("/")),
+                                   os.path.join(dst, *relativePath.split("/"))) for relativePath in toCopy])
+        failures = dict((destination, error) for _, destination, error in copyResult.failed)
+        for relativePath in toCopy:
+            error = failures.get(os.path.join(dst, *relativePath.split("/")))
+            if error is not None:
+                result.failed.append((relativePath, error))
+                continue
+            result.copied.append(relativePath)
+            if relativePath in sourceHashes:
+                # the destination now has the source content
+                st = os.stat(os.path.join(dst, *relativePath.split("/")))
+                cache["destination"][relativePath] = [st.st_size, st.st_mtime, sourceHashes[relativePath]]
+            else:
+                cache["destination"].pop(relativePath, None)
+
+    if delete:
+        for relativePath in sorted(set(destinationFiles) - set(sourceFiles)):
+            try:
+                os.remove(os.path.join(dst, *relativePath.split("/")))
+            except OSError as er:
+                logger.warning("Failed to delete: {}, {}".format(os.path.join(dst, relativePath), er))
+                result.failed.append((relativePath, str(er)))
+                continue
+            result.deleted.append(relativePath)
+        # deepest folders first so parents are empty by the time they're removed
+        for relativePath in sorted(destinationFolders - sourceFolders, reverse=True):
+            folderPath = os.path.join(dst, *relativePath.split("/"))
+            try:
+                if not os.listdir(folderPath):
+                    os.rmdir(folderPath)
+            except OSError as er:
+                logger.warning("Failed to delete folder: {}, {}".format(folderPath, er))
+                result.failed.append((relativePath, str(er)))
+
+    # drop the entries of files which no longer exist
+    remaining = set(sourceFiles) if delete else set(sourceFiles) | set(destinationFiles)
+    cache["source"] = dict((relativePath, entry) for relativePath, entry in cache["source"].items()
+                           if relativePath in sourceFiles)
+    cache["destination"] = dict((relativePath, entry) for relativePath, entry in cache["destination"].items()
+                                if relativePath in remaining)
+    if hashCheck or os.path.exists(cachePath):
+        ensureFolderExists(os.path.dirname(cachePath))
+        with atomicFile(cachePath) as f:
+            f.write(encodeJson(cache))
+    return result
+
+
+def syncCachePath(dst):
+    """Returns the default hash cache file syncDirectory() uses for the destination folder, the cache is kept in
+    SYNC_CACHE_FOLDER rather than the destination so it's never published.
+
+    :param dst: The sync destination folder.
+    :type dst: str
+    :rtype: str
+    """
+    folder = os.path.normcase(os.path.abspath(dst))
+    if not isinstance(folder, bytes):
+        folder = folder.encode("utf-8")
+    return os.path.join(SYNC_CACHE_FOLDER, hashlib.md5(folder).hexdigest() + ".json")
+
+
+def _syncTree(root, ignore):
+    """Returns {relativePath: (size, mtime)} for every file and the set of relative folder paths below root.
+    """
+    files = {}
+    folders = set()
+    stack = [("", root)]
+    while stack:
+        relativeFolder, folderPath = stack.pop()
+        entries = list(scanDir(folderPath))
+        ignored = ignore(folderPath, [entry.name for entry in entries]) if ignore is not None else ()
+        for entry in entries:
+            if entry.name in ignored:
+                continue
+            relativePath = relativeFolder + entry.name
+            if entry.is_dir():
+                folders.add(relativePath)
+                stack.append((relativePath + "/", entry.path))
+            else:
+                st = entry.stat()
+                files[relativePath] = (st.st_size, st.st_mtime)
+    return files, folders
+
+
+def _loadSyncCache(cachePath, src, hashAlgorithm):
+    cache = None
+    if os.path.exists(cachePath):
+        try:
+            cache = loadJson(cachePath)
+        except ValueError:
+            logger.warning("Ignoring corrupt sync cache: {}".format(cachePath))
+    if not cache or cache.get("algorithm") != hashAlgorithm:
+        cache = {"algorithm": hashAlgorithm, "destination": {}}
+    if cache.get("sourceRoot") != os.path.normpath(src):
+        # the source hashes are only valid for the folder they were computed for
+        cache["sourceRoot"] = os.path.normpath(src)
+        cache["source"] = {}
+    return cache
+
+
+def _cachedHashes(root, relativePaths, files, cacheEntries, hashAlgorithm, workers):
+    """Returns {relativePath: hash}, only hashing files which changed since their cache entry was recorded.
+    """
+    hashes = {}
+    missing = []
+    for relativePath in relativePaths:
+        entry = cacheEntries.get(relativePath)
+        if entry is not None and entry[0] == files[relativePath][0] and entry[1] == files[relativePath][1]:
+            hashes[relativePath] = entry[2]
+        else:
+            missing.append(relativePath)
+    digests = _threadedMap(lambda relativePath: fileChecksum(os.path.join(root, *relativePath.split("/")),
+                                                             hashAlgorithm), missing, workers)
+    for relativePath, digest in zip(missing, digests):
+        size, mtime = files[relativePath]
+        cacheEntries[relativePath] = [size, mtime, digest]
+        hashes[relativePath] = digest
+    return hashes
+
+
 class MoveFileContext(object):
     """With context utility to ensures that files that were moved within the scope are moved to their
     original location if an exception was raised during that scope.
@@ -232,22 +666,152 @@ class MoveFileContext(object):
                 shutil.move(destination, source)
 
 
-def folderSize(path):
+class _DirEntry(object):
+    """Minimal :class:`os.DirEntry` replacement used by scanDir() when scandir isn't available, the stat result is
+    cached like os.DirEntry so is_dir() followed by stat() only stats the entry once.
+    """
+    __slots__ = ("name", "path", "_stat")
+
+    def __init__(self, directory, name):
+        self.name = name
+        self.path = os.path.join(directory, name)
+        self._stat = None
+
+    def stat(self):
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+    def is_dir(self):
+        try:
+            return statModule.S_ISDIR(self.stat().st_mode)
+        except OSError:
+            # broken symlink
+            return False
+
+    def is_file(self):
+        try:
+            return statModule.S_ISREG(self.stat().st_mode)
+        except OSError:
+            return False
+
+    def is_symlink(self):
+        return os.path.islink(self.path)
+
+
+def scanDir(directory):
+    """Returns an iterator of the entries within the directory using os.scandir, or the scandir package on python 2,
+    falling back to os.listdir when neither is available.
+
+    Scandir gets the file type from the directory listing so checking is_dir() doesn't require an extra stat per
+    entry on most platforms.
+
+    :param directory: The directory to list.
+    :type directory: str
+    :rtype: iterable(:class:`os.DirEntry`)
+    :raise: OSError if the directory doesn't exist.
+    """
+    if _scandir is not None:
+        return _scandir(directory)
+    return (_DirEntry(directory, name) for name in os.listdir(directory))
+
+
+def folderSize(path, threads=1, useCache=False):
     """Retrieves the total folder size in bytes
 
+    Symlinked files count the size of their target, symlinked folders aren't followed.
+
     :param path: Returns the total folder size by walking the directory adding together all child files sizes.
     :type path: str
+    :param threads: The number of threads walking separate subtrees, helps on network storage where most of the \
+    time is spent waiting on the file server.
+    :type threads: int
+    :param useCache: If True the file sizes of each folder are cached against the folder mtime so only folders \
+    which changed are listed again. Files rewritten in place don't change their folder mtime, only files which \
+    were added, removed or renamed into place are picked up, use clearFolderSizeCache() when that isn't enough.
+    :type useCache: bool
     :return: size in bytes
     :rtype: int
     """
+    cache = _folderSizeCache if useCache else None
+    if threads < 2:
+        return _subtreeSize(path, cache)
     totalSize = 0
-    for root, dirs, files in os.walk(path):
-        for f in files:
-            fp = os.path.join(root, f)
-            totalSize += os.path.getsize(fp)
+    # split the tree until there are enough subtrees to keep every thread busy
+    subtrees = [path]
+    while subtrees and len(subtrees) < threads * 4:
+        children = []
+        for directory in subtrees:
+            fileSize, directories = _scanFolderSizes(directory, cache)
+            totalSize += fileSize
+            children.extend(directories)
+        subtrees = children
+    return totalSize + sum(_threadedMap(lambda directory: _subtreeSize(directory, cache), subtrees, threads))
+
+
+def clearFolderSizeCache(path=None):
+    """Clears the folder sizes cached by folderSize(useCache=True).
+
+    :param path: Only clear this folder and its descendants, None clears everything.
+    :type path: str or None
+    """
+    if path is None:
+        _folderSizeCache.clear()
+        return
+    path = os.path.normpath(path)
+    prefix = os.path.join(path, "")
+    for directory in list(_folderSizeCache):
+        if directory == path or directory.startswith(prefix):
+            _folderSizeCache.pop(directory, None)
+
+
+# {normalizedFolderPath: (folderMtime, bytesOfDirectFiles, childFolderPaths)}
+_folderSizeCache = {}
+
+
+def _subtreeSize(path, cache):
+    totalSize = 0
+    stack = [path]
+    while stack:
+        fileSize, directories = _scanFolderSizes(stack.pop(), cache)
+        totalSize += fileSize
+        stack.extend(directories)
     return totalSize
 
 
+def _scanFolderSizes(directory, cache):
+    """Returns the total size of the files directly within the directory and the child folders to descend into.
+    """
+    mtime = None
+    if cache is not None:
+        directory = os.path.normpath(directory)
+        try:
+            mtime = os.stat(directory).st_mtime
+        except OSError:
+            return 0, ()
+        cached = cache.get(directory)
+        if cached is not None and cached[0] == mtime:
+            return cached[1], cached[2]
+    fileSize = 0
+    directories = []
+    try:
+        entries = scanDir(directory)
+    except OSError:
+        # matches os.walk which skips folders it can't list
+        return 0, ()
+    for entry in entries:
+        if entry.is_dir():
+            if not entry.is_symlink():
+                directories.append(entry.path)
+            continue
+        # scandir caches the stat on windows so this is free, elsewhere it replaces os.path.getsize
+        fileSize += entry.stat().st_size
+    directories = tuple(directories)
+    if cache is not None:
+        cache[directory] = (mtime, fileSize, directories)
+    return fileSize, directories
+
+
 def ensureFolderExists(path, permissions=0775, placeHolder=False):
     """if the folder doesnt exist then one will be created.
     Function built due to version control mishaps with uncommited empty folders, this folder can generate
@@ -299,7 +863,7 @@ def createValidfilename(name):
         return FILENAMEEXP.sub("_", value.decode("utf-8")).encode("utf-8")
 
 
-def zipwalk(zfilename):
+def zipwalk(zfilename, stream=False):
     """Zip file tree generator.
 
     For each file entry in a zip archive, this yields
@@ -317,48 +881,67 @@ def zipwalk(zfilename):
     the contents of the zip file and walks them.
 
     Inspired by os.walk .
-    """
-
-    tempdir = os.environ.get('TEMP', os.environ.get('TMP', os.environ.get('TMPDIR', '/tmp')))
 
+    :param stream: If True filedata is a read only stream of the member which is decompressed as it's read so \
+    large members are never held in memory, the stream can't seek and is only valid while the walk is running.
+    :type stream: bool
+    """
+    z = zipfile.ZipFile(zfilename, "r")
     try:
-        z = zipfile.ZipFile(zfilename, "r")
         for info in z.infolist():
             fname = info.filename
-            data = z.read(fname)
-
             if fname.endswith(".zip"):
-                tmpfpath = os.path.join(tempdir, os.path.basename(fname))
+                handle, tmpfpath = tempfile.mkstemp(suffix=".zip")
                 try:
-                    open(tmpfpath, 'w+b').write(data)
+                    with os.fdopen(handle, "wb") as f, z.open(info) as member:
+                        shutil.copyfileobj(member, f, 1 << 20)
                 except (IOError, OSError):
                     logger.error("Failed to write file, {}".format(tmpfpath), exc_info=True)
 
-                if zipfile.is_zipfile(tmpfpath):
-                    try:
-                        for x in zipwalk(tmpfpath):
-                            yield x
-                    except Exception:
-                        logger.error("Failed", exc_info=True)
-                        raise
                 try:
-                    os.remove(tmpfpath)
-                except:
-                    pass
+                    if zipfile.is_zipfile(tmpfpath):
+                        for x in zipwalk(tmpfpath, stream):
+                            yield x
+                finally:
+                    try:
+                        os.remove(tmpfpath)
+                    except OSError:
+                        pass
             else:
-                yield (info, cStringIO.StringIO(data))
-    except (RuntimeError, zipfile.error):
-        raise
+                yield (info, z.open(info) if stream else cStringIO.StringIO(z.read(info)))
+    finally:
+        z.close()
+
 
+def directoryTreeToDict(path, threads=1):
+    """Returns the folder hierarchy as nested dictionaries, each with the name, path and type keys, folders also
+    have a children list.
 
-def directoryTreeToDict(path):
-    d = {'name': os.path.basename(path),
-         "path": path}
-    if os.path.isdir(path):
-        d['type'] = "directory"
-        d['children'] = [directoryTreeToDict(os.path.join(path, x)) for x in os.listdir(path)]
+    :param path: The root folder or file path.
+    :type path: str
+    :param threads: The number of threads building the top level subtrees.
+    :type threads: int
+    :rtype: dict
+    """
+    if not os.path.isdir(path):
+        return {"name": os.path.basename(path), "path": path, "type": "file"}
+    entries = list(scanDir(path))
+    if threads < 2:
+        children = [_entryTreeToDict(entry) for entry in entries]
     else:
-        d['type'] = "file"
+        children = _threadedMap(_entryTreeToDict, entries, threads)
+    return {"name": os.path.basename(path), "path": path, "type": "directory", "children": children}
+
+
+def _entryTreeToDict(entry):
+    # the DirEntry type comes from the directory listing so files don't need a stat
+    d = {"name": entry.name,
+         "path": entry.path}
+    if entry.is_dir():
+        d["type"] = "directory"
+        d["children"] = [_entryTreeToDict(child) for child in scanDir(entry.path)]
+    else:
+        d["type"] = "file"
     return d
 
 
@@ -388,6 +971,92 @@ if os.name == "nt" and sys.version_info[0] < 3:
     os.symlink = symlink_ms
 
 
+def registerJsonBackend(name, loads):
+    """Registers a json decoder which can be selected with setJsonBackend().
+
+    :param name: The backend name eg. "ujson".
+    :type name: str
+    :param loads: The function which decodes a json string, must match :func:`json.loads` for valid documents.
+    :type loads: callable
+    """
+    _jsonBackends[name] = loads
+
+
+def setJsonBackend(name=None):
+    """Sets the json decoder used by loadJson(), decodeJson() and loadJsonMany().
+
+    The stdlib json module is the default, fast backends are opt-in as they don't always decode to the same values,
+    eg. str rather than unicode or rounded floats. Fast backends are only used for decoding, encoding always uses the
+    stdlib json module so the bytes written by saveJson() are identical whichever backend is active.
+
+    :param name: The backend name, one of "json", "orjson", "ujson", "rapidjson", "simplejson" or a registered \
+    backend. If None then the ZOO_JSON_BACKEND environment variable is used, falling back to "json" if it isn't set \
+    or the backend isn't installed.
+    :type name: str or None
+    :return: The name of the backend which is now active.
+    :rtype: str
+    :raise: ValueError if the requested backend isn't installed.
+    """
+    global _activeJsonBackend
+    if name is None:
+        name = os.environ.get("ZOO_JSON_BACKEND") or "json"
+        loads = _importJsonBackend(name)
+        if loads is None:
+            logger.warning("ZOO_JSON_BACKEND: {} isn't available, using json".format(name))
+            name, loads = "json", json.loads
+        _activeJsonBackend = (name, loads)
+        return name
+    loads = _importJsonBackend(name)
+    if loads is None:
+        raise ValueError("Json backend isn't available: {}".format(name))
+    _activeJsonBackend = (name, loads)
+    return name
+
+
+def jsonBackend():
+    """Returns the name of the active json decoder, see setJsonBackend().
+
+    :rtype: str
+    """
+    if _activeJsonBackend is None:
+        setJsonBackend()
+    return _activeJsonBackend[0]
+
+
+def _importJsonBackend(name):
+    loads = _jsonBackends.get(name)
+    if loads is None and name in JSON_BACKENDS:
+        try:
+            loads = __import__(name).loads
+        except ImportError:
+            return
+        _jsonBackends[name] = loads
+    return loads
+
+
+def decodeJson(text):
+    """Decodes the json string with the active backend.
+
+    :param text: The json document.
+    :type text: str
+    """
+    if _activeJsonBackend is None:
+        setJsonBackend()
+    return _activeJsonBackend[1](text)
+
+
+def encodeJson(data, **kws):
+    """Encodes the data to a json string, this is the serializer used by saveJson().
+
+    :func:`json.dumps` is used rather than :func:`json.dump` as python 2 only uses the C encoder for single shot
+    encoding, the output is identical.
+
+    :param kws: Json Dumps arguments , see standard python docs
+    :rtype: str
+    """
+    return json.dumps(data, **kws)
+
+
 def loadJson(filePath):
     """
     This procedure loads and returns the data of a json file
@@ -397,7 +1066,7 @@ def loadJson(filePath):
     # load our file
     try:
         with loadFile(filePath) as f:
-            data = json.load(f)
+            data = decodeJson(f.read())
     except Exception as er:
         logger.debug("file (%s) not loaded" % filePath)
         raise er
@@ -405,6 +1074,58 @@ def loadJson(filePath):
     return data
 
 
+def loadJsonMany(filePaths, threads=4):
+    """Loads multiple json files concurrently, useful on network drives where the time is spent waiting on reads.
+
+    Decoding still holds the GIL so for local files the gain comes from overlapping the reads.
+
+    :param filePaths: The json file paths to load.
+    :type filePaths: list(str)
+    :param threads: The maximum number of reader threads, 1 loads the files serially.
+    :type threads: int
+    :return: The data of each file in the same order as filePaths.
+    :rtype: list
+    :raise: The first error in filePaths order once every file has been attempted.
+    """
+    return _threadedMap(loadJson, filePaths, threads)
+
+
+def _threadedMap(func, items, threads):
+    """Calls func for each item on up to `threads` daemon threads, returns the results in the order of items and
+    raises the first error in items order once every item has been attempted.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    failures = {}
+    indices = iter(xrange(len(items)))
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                index = next(indices, None)
+            if index is None:
+                return
+            try:
+                results[index] = func(items[index])
+            except Exception as er:
+                failures[index] = er
+
+    workerCount = min(threads, len(items))
+    if workerCount < 2:
+        worker()
+    else:
+        workers = [threading.Thread(target=worker) for _ in xrange(workerCount)]
+        for thread in workers:
+            thread.daemon = True
+            thread.start()
+        for thread in workers:
+            thread.join()
+    if failures:
+        raise failures[min(failures)]
+    return results
+
+
 def saveJson(data, filepath, **kws):
     """
     This procedure saves given data to a json file
@@ -413,8 +1134,9 @@ def saveJson(data, filepath, **kws):
     """
 
     try:
+        content = encodeJson(data, **kws)
         with open(filepath, 'w') as f:
-            json.dump(data, f, **kws)
+            f.write(content)
     except IOError:
         logger.error("Data not saved to file {}".format(filepath))
         return False
@@ -424,6 +1146,249 @@ def saveJson(data, filepath, **kws):
     return True
 
 
+_JSON_WHITESPACE = re.compile(b"[ \t\n\r]*")
+
+
+class _JsonReader(object):
+    """Decodes json values from a buffer through a sliding window so only the window is copied out of the buffer,
+    values are decoded with the stdlib C scanner which supports decoding from an offset.
+
+    :param buffer: The memory mapped file.
+    :type buffer: :class:`mmap.mmap`
+    :param windowSize: The minimum window size in bytes, the window grows to fit values larger than this.
+    :type windowSize: int
+    """
+
+    def __init__(self, buffer, windowSize=1 << 20):
+        self.buffer = buffer
+        self.windowSize = windowSize
+        self.start = 0
+        self.window = b""
+        self.decoder = json.JSONDecoder()
+        # the position after the last container exhausted by items()
+        self.end = 0
+
+    def _slide(self, pos, grow=False):
+        size = max(self.windowSize, len(self.window) * 2) if grow else self.windowSize
+        self.start = pos
+        self.window = self.buffer[pos:pos + size]
+
+    def _atEnd(self):
+        return self.start + len(self.window) >= len(self.buffer)
+
+    def char(self, pos):
+        if not self.start <= pos < self.start + len(self.window):
+            self._slide(pos)
+        offset = pos - self.start
+        return self.window[offset:offset + 1]
+
+    def skipWhitespace(self, pos):
+        while True:
+            if not self.start <= pos < self.start + len(self.window):
+                self._slide(pos)
+            end = _JSON_WHITESPACE.match(self.window, pos - self.start).end()
+            if end < len(self.window) or self._atEnd():
+                return self.start + end
+            pos = self.start + end
+
+    def decode(self, pos):
+        """Returns the value starting at pos and the position after it.
+
+        :rtype: tuple(object, int)
+        """
+        if not self.start <= pos < self.start + len(self.window):
+            self._slide(pos)
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.window, pos - self.start)
+                # a number ending at the window end may continue past it
+                if end < len(self.window) or self._atEnd():
+                    return value, self.start + end
+            except ValueError:
+                if self._atEnd():
+                    raise
+            self._slide(pos, grow=True)
+
+    def skip(self, pos):
+        """Returns the position after the value at pos, arrays and objects are skipped an entry at a time so
+        skipping a large container never decodes it as a whole.
+        """
+        if self.char(pos) not in (b"[", b"{"):
+            return self.decode(pos)[1]
+        for _ in self.items(pos):
+            pass
+        return self.end
+
+    def items(self, pos, decodeValues=False):
+        """Yields (key, value) for each entry of the array or object at pos, keys are the element index for arrays.
+
+        If decodeValues is False the value start position is yielded instead of the value and the value is skipped
+        once the next entry is requested. Once exhausted the position after the container is stored on self.end.
+        """
+        opening = self.char(pos)
+        if opening not in (b"[", b"{"):
+            raise ValueError("Json value at: {} isn't an array or object".format(pos))
+        closing = b"]" if opening == b"[" else b"}"
+        pos = self.skipWhitespace(pos + 1)
+        index = 0
+        if self.char(pos) != closing:
+            while True:
+                if opening == b"{":
+                    key, pos = self.decode(pos)
+                    pos = self.skipWhitespace(pos)
+                    if self.char(pos) != b":":
+                        raise ValueError("Expected ':' at: {}".format(pos))
+                    pos = self.skipWhitespace(pos + 1)
+                else:
+                    key = index
+                if decodeValues:
+                    value, pos = self.decode(pos)
+                    yield key, value
+                else:
+                    yield key, pos
+                    # arrays are usually many small records which are quickest to decode whole, objects are usually
+                    # a few large sections eg. {"meta": {}, "items": []} which are skipped an entry at a time
+                    pos = self.decode(pos)[1] if opening == b"[" else self.skip(pos)
+                pos = self.skipWhitespace(pos)
+                char = self.char(pos)
+                if char == closing:
+                    break
+                if char != b",":
+                    raise ValueError("Expected ',' at: {}".format(pos))
+                pos = self.skipWhitespace(pos + 1)
+                index += 1
+        self.end = pos + 1
+
+    def resolve(self, pointer):
+        """Returns the start position of the value at the json pointer(RFC 6901) eg. "/items/0/name".
+
+        :raise: KeyError if the pointer doesn't exist.
+        """
+        pos = self.skipWhitespace(0)
+        if not pointer:
+            return pos
+        for token in pointer.split("/")[1:]:
+            token = token.replace("~1", "/").replace("~0", "~")
+            char = self.char(pos)
+            if char not in (b"[", b"{"):
+                raise KeyError(pointer)
+            isArray = char == b"["
+            for key, start in self.items(pos):
+                if (isArray and str(key) == token) or (not isArray and key == token):
+                    pos = start
+                    break
+            else:
+                raise KeyError(pointer)
+        return pos
+
+
+@contextlib.contextmanager
+def _mappedFile(filePath):
+    with open(filePath, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError("Json file is empty: {}".format(filePath))
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield buffer
+        finally:
+            buffer.close()
+
+
+def iterJson(filePath, pointer=""):
+    """Memory maps the json file and yields the entries of the array or object one at a time, only the yielded
+    entries are decoded so very large files can be processed without loading them. Entries are decoded with the
+    stdlib json scanner regardless of the json backend.
+
+    .. code-block:: python
+
+        for item in iterJson("/library/manifest.json", pointer="/items"):
+            print item["name"]
+        for key, value in iterJson("/library/thumbnails.json"):
+            print key, value
+
+    :param filePath: The json file path, zip files aren't supported.
+    :type filePath: str
+    :param pointer: A json pointer(RFC 6901) to the array or object to iterate, "" is the root value.
+    :type pointer: str
+    :return: Each element for arrays or (key, value) for objects.
+    :rtype: generator
+    :raise: KeyError if the pointer doesn't exist, ValueError if the value isn't an array or object.
+    """
+    with _mappedFile(filePath) as buffer:
+        reader = _JsonReader(buffer)
+        pos = reader.resolve(pointer)
+        if reader.char(pos) not in (b"[", b"{"):
+            raise ValueError("Json value at: {} isn't an array or object".format(pointer or "/"))
+        isArray = reader.char(pos) == b"["
+        for key, value in reader.items(pos, decodeValues=True):
+            yield value if isArray else (key, value)
+
+
+def loadJsonPointer(filePath, pointer):
+    """Memory maps the json file and returns only the value at the json pointer, values before it are skipped one
+    entry at a time so memory use is bounded by the largest entry rather than the file.
+
+    .. code-block:: python
+
+        settings = loadJsonPointer("/library/manifest.json", "/meta/settings")
+
+    :param filePath: The json file path, zip files aren't supported.
+    :type filePath: str
+    :param pointer: A json pointer(RFC 6901) eg. "/items/10/name", "" is the root value.
+    :type pointer: str
+    :raise: KeyError if the pointer doesn't exist.
+    """
+    with _mappedFile(filePath) as buffer:
+        reader = _JsonReader(buffer)
+        return reader.decode(reader.resolve(pointer))[0]
+
+
+@contextlib.contextmanager
+def atomicFile(filePath, mode="w"):
+    """Context manager which writes to a temporary file next to filePath and renames it over filePath once the
+    block exits without an error, readers never see a partially written file. If filePath already exists its
+    permission bits are copied to the new file.
+
+    .. code-block:: python
+
+        with atomicFile("/prefs/tools/shaderEditor.json") as f:
+            f.write(content)
+
+    :param filePath: The destination file path.
+    :type filePath: str
+    :param mode: The file mode for the temporary file, "w" or "wb".
+    :type mode: str
+    """
+    filePath = str(filePath)
+    tempPath = "{}.{}.{}.tmp".format(filePath, os.getpid(), threading.current_thread().ident)
+    try:
+        with open(tempPath, mode) as f:
+            yield f
+        if os.path.exists(filePath):
+            shutil.copymode(filePath, tempPath)
+        replaceFile(tempPath, filePath)
+    except Exception:
+        if os.path.exists(tempPath):
+            os.remove(tempPath)
+        raise
+
+
+def replaceFile(source, destination):
+    """Renames source to destination replacing the destination if it exists.
+
+    Python 2 has no os.replace and os.rename doesn't overwrite on windows, so on windows the destination is
+    removed first which isn't atomic.
+
+    :param source: The file to rename.
+    :type source: str
+    :param destination: The final file path.
+    :type destination: str
+    """
+    if os.name == "nt" and os.path.exists(destination):
+        os.remove(destination)
+    os.rename(source, destination)
+
+
 @contextlib.contextmanager
 def loadFile(filepath):
     if filepath.endswith(".zip"):
@@ -474,40 +1439,43 @@ def saveFileTxt(formattedText, newfile):
         fileInstance.write(formattedText)
 
 
-def createZipWithProgress(zippath, files):
+def createZipWithProgress(zippath, files, workers=4):
     """Same as function createZip() but has a stdout progress bar which is useful for commandline work
+
     :param zippath: the file path for the zip file
     :type zippath: str
-    :param files: A Sequence of file paths that will be archived.
-    :type files: seq(str)
-    """
-    dir = os.path.dirname(zippath)
-    if not os.path.exists(os.path.join(dir, os.path.dirname(zippath))):
-        os.makedirs(os.path.join(dir, os.path.dirname(zippath)))
-    logger.debug("writing file: {}".format(zippath))
-    length = len(files)
-    progressBar = commandline.CommandProgressBar(length, prefix='Progress:', suffix='Complete', barLength=50)
+    :param files: A Sequence of (filePath, archiveName) pairs that will be archived.
+    :type files: seq(tuple(str, str))
+    :param workers: The number of files compressed at the same time.
+    :type workers: int
+    """
+    totalBytes = sum(os.path.getsize(p[0]) for p in files if not os.path.isdir(p[0]))
+    progressBar = commandline.CommandProgressBar(max(totalBytes, 1), prefix='Progress:', suffix='Complete',
+                                                 barLength=50)
     progressBar.start()
-    with zipfile.ZipFile(zippath, "w", zipfile.ZIP_DEFLATED) as archive:
-        for p in iter(files):
-            logger.debug("Archiving file: {} ----> :{}\n".format(p[0], p[1]))
-            archive.write(p[0], p[1])
-            progressBar.increment(1)
-    logger.debug("finished writing zip file to : {}".format(zippath))
+
+    def onProgress(processedBytes, total):
+        progressBar.increment(processedBytes - progressBar.progress)
+
+    createZip(zippath, files, workers=workers, progress=onProgress)
+    if not totalBytes:
+        progressBar.increment(1)
 
 
-def createZip(zippath, files):
+def createZip(zippath, files, workers=4, progress=None):
     """Creates a zip file for the files, each path will be stored relative to the zippath which avoids abspath
+
+    The files are compressed on worker threads and written to the archive in order, see
+    :func:`zoo.libs.utils.ziparchive.writeZip`.
+
     :param zippath: the file path for the zip file
     :type zippath: str
-    :param files: A Sequence of file paths that will be archived.
-    :type files: seq(str)
-    """
-    dir = os.path.dirname(zippath)
-    if not os.path.exists(os.path.join(dir, os.path.dirname(zippath))):
-        os.makedirs(os.path.join(dir, os.path.dirname(zippath)))
-    logger.debug("writing file: {}".format(zippath))
-    with zipfile.ZipFile(zippath, "w", zipfile.ZIP_DEFLATED) as archive:
-        for p in iter(files):
-            archive.write(p[0], p[1])
-    logger.debug("finished writing zip file to : {}".format(zippath))
+    :param files: A Sequence of (filePath, archiveName) pairs that will be archived.
+    :type files: seq(tuple(str, str))
+    :param workers: The number of files compressed at the same time.
+    :type workers: int
+    :param progress: Called as progress(processedBytes, totalBytes) as the files are written.
+    :type progress: callable or None
+    """
+    from zoo.libs.utils import ziparchive
+    ziparchive.writeZip(zippath, files, workers=workers, progress=progress)
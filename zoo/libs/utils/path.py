@@ -14,10 +14,31 @@ PATCH_PATTERN = "\d{4,}"
 VERSION_REGEX = re.compile("(.*)([._-])v(\d+)\.?([^.]+)?$", re.IGNORECASE)
 FRAME_REGEX = re.compile("(.*)([._-])(\d+)\.([^.]+)$", re.IGNORECASE)
 
+
+class _Unresolved(object):
+    # non data descriptor so _ExtendedPath and Path subclasses with a __dict__ can store the passed string
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        return str(instance)
+
+
 class Path(str):
     """Wrapper class around file and folder paths providing compability with unc
+
+    Paths don't have a __dict__, the UNC and trailing separator flags are read from the string and the path tokens
+    are tuples shared between every path with the same resolved string, see pathTokens(). Only paths created from a
+    string other than their resolved path, eg. with environment variables or backslashes, or which override
+    caseMatters store their extra state, in the _ExtendedPath subclass.
+
+    This is a trade-off of speed for memory: indexing, slicing and split() on a path which has been evicted from the
+    token cache split the string again on every call, several times slower than the legacy path which stored its
+    tokens, and __hash__ and __len__ are computed from the string rather than stored. Code which indexes the same
+    path repeatedly should call split() once and reuse the list, see bench_path.py for the measured costs.
     """
+    __slots__ = ()
     caseMatters = os.name != 'nt'
+    _passed = _Unresolved()
 
     @classmethod
     def Join(cls, *toks, **kw):
@@ -29,26 +50,43 @@ class Path(str):
         to False will do things like caseless equality testing, caseless hash generation
         """
 
+        # paths derived from an _ExtendedPath only need the extra state if they depend on the environment as well
+        if cls is _ExtendedPath:
+            cls = Path
         # early out if we've been given a Path instance - paths are immutable so there
         # is no reason not to just return what was passed in
-        if type(path) is cls:
+        pathType = type(path)
+        if pathType is cls or (pathType is _ExtendedPath and cls is Path):
             return path
 
         # set to an empty string if we've been init'd with None
         path = "" if path is None else path
 
-        resolvedPath, pathTokens, isUnc = resolveAndSplit(path, envDict)
-        new = str.__new__(cls, resolvedPath)
-        new.isUNC = isUnc
-        new.hasTrailing = resolvedPath.endswith('/')
-        new._splits = tuple(pathTokens)
-        new._passed = path
+        resolvedPath = parsePath(path, envDict, caseMatters)[0]
+        return _newPath(cls, resolvedPath, path, caseMatters)
+
+    @property
+    def isUNC(self):
+        return str.startswith(self, '//')
+
+    @property
+    def hasTrailing(self):
+        return str.endswith(self, '/')
 
-        # case sensitivity, if not specified, defaults to system behaviour
-        if caseMatters:
-            new.caseMatters = caseMatters
+    @property
+    def _splits(self):
+        # a str subclass can't have slots in python 2, so the tokens are shared from the token cache while the path
+        # is in it, otherwise they're split again rather than evicting other paths from the cache
+        resolvedPath = str(self)
+        tokens = _tokenCache.get(resolvedPath)
+        if tokens is None:
+            tokens = tuple(_splitResolved(resolvedPath))
+        return tokens
 
-        return new
+    def __reduce__(self):
+        # rebuilt from the resolved string so copies and pickles keep the original string and case sensitivity
+        return _newPath, (Path if type(self) is _ExtendedPath else type(self), str(self), self._passed,
+                          self.caseMatters)
 
     def __nonzero__(self):
         """
@@ -78,8 +116,13 @@ class Path(str):
     def __len__(self):
         if not self:
             return 0
-
-        return len(self._splits)
+        # the number of tokens, counted from the separators so the tokens aren't needed
+        count = str.count(self, "/") + 1
+        if str.endswith(self, "/"):
+            count -= 1
+        if str.startswith(self, "//"):
+            count -= 2
+        return count
 
     def __contains__(self, item):
         if not self.caseMatters:
@@ -89,13 +132,16 @@ class Path(str):
 
     def __hash__(self):
         """
-        the hash for two paths that are identical should match - the most reliable way to do this
-        is to use a tuple from self.split to generate the hash from
+        the hash for two paths that are identical should match - the hash is generated from the same string
+        isEqual() compares, the resolved path without its trailing separator
         """
+        resolvedPath = str(self)
+        if str.endswith(self, "/"):
+            resolvedPath = resolvedPath[:-1]
         if not self.caseMatters:
-            return hash(tuple([s.lower() for s in self._splits]))
+            return hash(resolvedPath.lower())
 
-        return hash(tuple(self._splits))
+        return hash(resolvedPath)
 
     def __getslice__(self, a, b):
         isUNC = self.isUNC
@@ -755,6 +801,26 @@ class Path(str):
         return str(self).replace("\\", "//")
 
 
+class _ExtendedPath(Path):
+    """Path which stores the string it was created with and its case sensitivity, used for paths created from a
+    string other than their resolved path so unresolved() and resolve() still have it.
+    """
+
+
+def _newPath(cls, resolvedPath, passed, caseMatters):
+    keepPassed = isinstance(passed, basestring) and passed != resolvedPath
+    # case sensitivity, if not specified, defaults to system behaviour
+    keepCase = bool(caseMatters) and caseMatters != cls.caseMatters
+    if cls is Path and (keepPassed or keepCase):
+        cls = _ExtendedPath
+    new = str.__new__(cls, resolvedPath)
+    if keepPassed:
+        new._passed = passed
+    if keepCase:
+        new.caseMatters = caseMatters
+    return new
+
+
 def findFirstInPaths(filename, paths):
     """
     given a filename or path fragment, this will return the first occurance of a file with that name
@@ -838,9 +904,186 @@ def pathToUnc(path):
     return remoteName.value
 
 
+class _GenerationCache(object):
+    """Bounded cache which evicts the least recently used entries first.
+
+    Entries are looked up in the current generation first then the previous one, hits in the previous generation are
+    promoted. Once the current generation holds half of maxSize entries it becomes the previous generation and the
+    old previous generation is dropped, so lookups stay plain dict lookups.
+    """
+    __slots__ = ("maxSize", "current", "previous")
+
+    def __init__(self, maxSize):
+        self.maxSize = maxSize
+        self.current = {}
+        self.previous = {}
+
+    def get(self, key):
+        value = self.current.get(key)
+        if value is None:
+            value = self.previous.get(key)
+            if value is not None:
+                self.set(key, value)
+        return value
+
+    def set(self, key, value):
+        if len(self.current) >= self.maxSize // 2:
+            self.previous = self.current
+            self.current = {}
+        self.current[key] = value
+
+    def clear(self):
+        self.current = {}
+        self.previous = {}
+
+
+# the maximum number of parsed paths kept by parsePath()
+PARSE_CACHE_SIZE = 8192
+# the maximum number of token tuples shared between Path instances
+TOKEN_CACHE_SIZE = 65536
+# {(path, caseMatters, envFingerprint): (resolvedPath, tokens, isUNC)}
+_parseCache = _GenerationCache(PARSE_CACHE_SIZE)
+# {resolvedPath: tokens}
+_tokenCache = _GenerationCache(TOKEN_CACHE_SIZE)
+# {path: (variableName,)} the environment variables each path containing % read the last time it was resolved
+_pathVariables = {}
+
+
+def parsePath(path, envDict=None, caseMatters=None):
+    """Cached version of resolveAndSplit() used by :class:`Path`, returns the same result except the tokens are a tuple
+    of interned strings which is shared between every path with the same resolved string.
+
+    Entries are keyed on the path, caseMatters and the values of the environment variables the path references so
+    changing a referenced variable resolves the path again. Paths starting with ~ aren't cached since they depend on
+    the user's home folder.
+
+    :param path: The path to resolve.
+    :type path: str
+    :param envDict: The environment variables, defaults to os.environ.
+    :type envDict: dict or None
+    :param caseMatters: The case sensitivity of the Path being constructed.
+    :type caseMatters: bool or None
+    :return: The resolved path, the path tokens and whether it's a UNC path.
+    :rtype: tuple(str, tuple(str), bool)
+    """
+    if type(path) is not str:
+        path = str(path)
+    if envDict is None:
+        envDict = os.environ
+    if path[:1] == "~":
+        resolvedPath, _, isUnc = resolveAndSplit(path, envDict)
+        return resolvedPath, pathTokens(resolvedPath), isUnc
+    if "%" in path:
+        variables = _pathVariables.get(path)
+        fingerprint = None if variables is None else tuple(envDict.get(name) for name in variables)
+    else:
+        variables = fingerprint = ()
+    if fingerprint is not None:
+        result = _parseCache.get((path, caseMatters, fingerprint))
+        if result is not None:
+            return result
+
+    used = [] if variables != () else None
+    resolvedPath, _, isUnc = _resolveAndSplit(path, envDict, False, used)
+    result = (resolvedPath, pathTokens(resolvedPath), isUnc)
+    if used is not None:
+        variables = tuple(sorted(set(used)))
+        if len(_pathVariables) >= PARSE_CACHE_SIZE:
+            _pathVariables.clear()
+        _pathVariables[path] = variables
+        fingerprint = tuple(envDict.get(name) for name in variables)
+    _parseCache.set((path, caseMatters, fingerprint), result)
+    return result
+
+
+def pathTokens(resolvedPath):
+    """Returns the tokens of a path resolved by resolveAndSplit() as a shared tuple of interned strings, so paths
+    within the same folders share their token strings.
+
+    :param resolvedPath: The resolved path.
+    :type resolvedPath: str
+    :rtype: tuple(str)
+    """
+    tokens = _tokenCache.get(resolvedPath)
+    if tokens is None:
+        tokens = _splitResolved(resolvedPath)
+        # intern() only accepts byte strings, unicode environment variables make a unicode path
+        tokens = tuple(intern(token) for token in tokens) if type(resolvedPath) is str else tuple(tokens)
+        _tokenCache.set(resolvedPath, tokens)
+    return tokens
+
+
+def _splitResolved(resolvedPath):
+    # the resolved path is the tokens joined by / with the UNC prefix and any trailing / added back
+    tokens = (resolvedPath[2:] if resolvedPath.startswith("//") else resolvedPath).split("/")
+    if not tokens[-1]:
+        tokens.pop()
+    return tokens
+
+
+def clearParseCache():
+    """Removes every path cached by parsePath() and every shared token tuple.
+    """
+    _parseCache.clear()
+    _tokenCache.clear()
+    _pathVariables.clear()
+
+
 def resolveAndSplit(path, envDict=None, raiseOnMissing=False):
     """recursively expands all environment variables and '..' tokens in a pathname
     """
+    return _resolveAndSplit(path, envDict, raiseOnMissing)
+
+
+def resolveMany(paths, envDict=None):
+    """Resolves and splits many paths at once, returning the same results as calling resolveAndSplit() on each.
+
+    The environment is read once up front, and the folder of each path is only resolved once for all the paths
+    within it, the file names are appended to the resolved folder. Paths whose folder is already resolved reuse the
+    passed string and paths within the same folder share the folder tokens, which are interned.
+
+    :param paths: The paths to resolve.
+    :type paths: iterable(str)
+    :param envDict: The environment variables, defaults to a snapshot of os.environ.
+    :type envDict: dict or None
+    :return: (resolvedPath, tokens, isUNC) for each path in the same order.
+    :rtype: list(tuple(str, tuple(str), bool))
+    """
+    if envDict is None:
+        envDict = dict(os.environ)
+    # {folder: (resolvedFolder ending in /, folderTokens, isUNC, folderIsResolved)}
+    folders = {}
+    results = []
+    append = results.append
+    for path in paths:
+        if "\\" in path:
+            path = path.replace("\\", "/")
+        folder, separator, name = path.rpartition("/")
+        if not separator or name == ".." or "%" in name:
+            # the name needs resolving as well
+            resolvedPath, tokens, isUnc = _resolveAndSplit(path, envDict)
+            append((resolvedPath, tuple(tokens), isUnc))
+            continue
+        folderData = folders.get(folder)
+        if folderData is None:
+            # resolve the folder with a placeholder name so the separator handling matches the full path
+            resolvedPath, tokens, isUnc = _resolveAndSplit(folder + "/_", envDict)
+            resolvedFolder = resolvedPath[:-1]
+            tokens.pop()
+            if type(resolvedFolder) is str:
+                tokens = [intern(token) for token in tokens]
+            folderData = (resolvedFolder, tuple(tokens), isUnc, resolvedFolder == folder + "/")
+            folders[folder] = folderData
+        resolvedFolder, tokens, isUnc, folderIsResolved = folderData
+        if name:
+            append((path if folderIsResolved else resolvedFolder + name, tokens + (name,), isUnc))
+        else:
+            append((resolvedFolder, tokens, isUnc))
+    return results
+
+
+def _resolveAndSplit(path, envDict=None, raiseOnMissing=False, usedVariables=None):
+    # usedVariables is a list which every environment variable name that was looked up is appended to
     if envDict is None:
         envDict = os.environ
 
@@ -855,6 +1098,8 @@ def resolveAndSplit(path, envDict=None, raiseOnMissing=False):
         missingVars = set()
         while matches:
             for match in matches:
+                if usedVariables is not None:
+                    usedVariables.append(match[1:-1])
                 try:
                     path = path.replace(match, envDict[match[1:-1]])
                 except KeyError:
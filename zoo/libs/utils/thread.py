@@ -1,6 +1,6 @@
 import threading
 
-import shutil
+from zoo.libs.utils import copyengine
 
 
 class Threaded(object):
@@ -43,13 +43,17 @@ class Threaded(object):
         return wrapper
 
 
-def threadedCopy(filepaths):
+def threadedCopy(filepaths, **kwargs):
     """Copies a set of files in a separate thread.
 
     Uses the :class:`CopyThread` class.
 
     :param filepaths: is a list of (from_path, to_path) pairs.
     :type filepaths: list(str)
+    :param kwargs: :class:`zoo.libs.utils.copyengine.CopyEngine` keyword arguments eg. workers, totalProgress.
+    :return: The started thread, its result attribute holds the :class:`zoo.libs.utils.copyengine.CopyResult` \
+    once finished.
+    :rtype: :class:`CopyThread`
 
     .. code-block:: python
 
@@ -60,15 +64,17 @@ def threadedCopy(filepaths):
 
 
     """
-    CopyThread(filepaths).start()
+    thread = CopyThread(filepaths, **kwargs)
+    thread.start()
+    return thread
 
 
 class CopyThread(threading.Thread):
-    def __init__(self, filepaths):
+    def __init__(self, filepaths, **kwargs):
         super(CopyThread, self).__init__()
         self.filepaths = filepaths
+        self.engine = copyengine.CopyEngine(**kwargs)
+        self.result = None
 
     def run(self):
-        for paths in self.filepaths:
-            src, dst = paths
-            shutil.copyfile(src, dst)
+        self.result = self.engine.copy(self.filepaths)
@@ -0,0 +1,450 @@
+"""Streaming zip archives with parallel compression and extraction.
+
+:func:`writeZip` compresses members on a pool of worker threads, zlib releases the GIL while compressing so the
+workers run in parallel, and writes them to the archive in the order they were given. Each member is raw deflated
+into a spooled temporary file so large files are never held in memory, and workers only compress a few members
+ahead of the writer which keeps the number of spooled members bounded. The CRC and sizes are known before a member
+is written so :class:`_ZipWriter` writes each local header once, with :meth:`zipfile.ZipInfo.FileHeader`, and never
+seeks back, ZipFile itself has no public api to add data which is already compressed.
+
+:func:`extractZip` extracts members in parallel, each worker reading through its own handle to the archive.
+
+Both report progress in uncompressed bytes as the data is written.
+
+.. code-block:: python
+
+    def onProgress(processedBytes, totalBytes):
+        print "{:.1f}%".format(100.0 * processedBytes / max(totalBytes, 1))
+
+    writeZip("/dist/toolPackage.zip", [("/work/tools/rig.py", "tools/rig.py")], workers=8, progress=onProgress)
+    extractZip("/dist/toolPackage.zip", "/deploy/toolPackage", progress=onProgress)
+
+"""
+import os
+import struct
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+
+from zoo.libs.utils import filesystem
+from zoo.libs.utils import zlogging
+
+logger = zlogging.getLogger(__name__)
+
+
+class _Member(object):
+    # a compressed member waiting to be written, data is None for folders and stored members
+    __slots__ = ("source", "info", "data")
+
+    def __init__(self, source, info, data=None):
+        self.source = source
+        self.info = info
+        self.data = data
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+
+
+class _ZipWriter(object):
+    """Writes members whose CRC and sizes are set before they're written, followed by the central directory.
+
+    Only the public :class:`zipfile.ZipInfo` api and the record layouts from the zipfile module are used, zip64
+    records are written for members and archives past the zip limits the same way ZipFile does.
+
+    :param fileObj: The archive file opened for binary writing.
+    :type fileObj: file
+    """
+
+    def __init__(self, fileObj):
+        self.fp = fileObj
+        self.infos = []
+
+    def writeHeader(self, info):
+        """Writes the local header of the member, the member data is written with write() straight after.
+
+        :type info: :class:`zipfile.ZipInfo`
+        """
+        # the sizes are in the header so there's no data descriptor
+        info.flag_bits &= ~0x08
+        info.header_offset = self.fp.tell()
+        self.fp.write(info.FileHeader())
+        self.infos.append(info)
+
+    def write(self, data):
+        self.fp.write(data)
+
+    def close(self):
+        """Writes the central directory and the end of archive records.
+        """
+        start = self.fp.tell()
+        for info in self.infos:
+            self.fp.write(_centralDirectoryRecord(info))
+        end = self.fp.tell()
+        count = len(self.infos)
+        size = end - start
+        if count >= zipfile.ZIP_FILECOUNT_LIMIT or start > zipfile.ZIP64_LIMIT or size > zipfile.ZIP64_LIMIT:
+            self.fp.write(struct.pack(zipfile.structEndArchive64, zipfile.stringEndArchive64,
+                                      44, 45, 45, 0, 0, count, count, size, start))
+            self.fp.write(struct.pack(zipfile.structEndArchive64Locator, zipfile.stringEndArchive64Locator,
+                                      0, end, 1))
+            count = min(count, 0xFFFF)
+            size = min(size, 0xFFFFFFFF)
+            start = min(start, 0xFFFFFFFF)
+        self.fp.write(struct.pack(zipfile.structEndArchive, zipfile.stringEndArchive,
+                                  0, 0, count, count, size, start, 0))
+
+
+def _encodedName(info):
+    # matches ZipInfo.FileHeader() so the local and central names are identical
+    name = info.filename
+    if isinstance(name, bytes):
+        return name, info.flag_bits
+    try:
+        return name.encode("ascii"), info.flag_bits
+    except UnicodeEncodeError:
+        return name.encode("utf-8"), info.flag_bits | 0x800
+
+
+def _centralDirectoryRecord(info):
+    dt = info.date_time
+    dosdate = (dt[0] - 1980) << 9 | dt[1] << 5 | dt[2]
+    dostime = dt[3] << 11 | dt[4] << 5 | (dt[5] // 2)
+    zip64 = []
+    fileSize = info.file_size
+    compressSize = info.compress_size
+    headerOffset = info.header_offset
+    if fileSize > zipfile.ZIP64_LIMIT or compressSize > zipfile.ZIP64_LIMIT:
+        zip64.extend((fileSize, compressSize))
+        fileSize = compressSize = 0xFFFFFFFF
+    if headerOffset > zipfile.ZIP64_LIMIT:
+        zip64.append(headerOffset)
+        headerOffset = 0xFFFFFFFF
+    # members are written by this module so the only extra field is the zip64 one
+    extra = b""
+    createVersion = info.create_version
+    extractVersion = info.extract_version
+    if zip64:
+        extra = struct.pack("<HH" + "Q" * len(zip64), 1, 8 * len(zip64), *zip64)
+        createVersion = max(45, createVersion)
+        extractVersion = max(45, extractVersion)
+    name, flagBits = _encodedName(info)
+    record = struct.pack(zipfile.structCentralDir, zipfile.stringCentralDir, createVersion, info.create_system,
+                         extractVersion, info.reserved, flagBits, info.compress_type, dostime, dosdate, info.CRC,
+                         compressSize, fileSize, len(name), len(extra), 0, 0, info.internal_attr,
+                         info.external_attr, headerOffset)
+    return record + name + extra
+
+
+def writeZip(zipPath, files, workers=4, compression=zipfile.ZIP_DEFLATED, level=zlib.Z_DEFAULT_COMPRESSION,
+             chunkSize=1 << 20, spoolSize=16 << 20, progress=None):
+    """Writes the files to a new zip archive, compressing them in parallel.
+
+    :param zipPath: The zip file path, an existing file is replaced.
+    :type zipPath: str
+    :param files: (sourcePath, archiveName) pairs, folders are added as folder entries.
+    :type files: iterable(tuple(str, str))
+    :param workers: The number of members compressed at the same time.
+    :type workers: int
+    :param compression: zipfile.ZIP_DEFLATED or zipfile.ZIP_STORED.
+    :type compression: int
+    :param level: The zlib compression level between 0 and 9.
+    :type level: int
+    :param chunkSize: The number of bytes read at a time.
+    :type chunkSize: int
+    :param spoolSize: Compressed members larger than this are spooled to a temporary file instead of memory.
+    :type spoolSize: int
+    :param progress: Called as progress(processedBytes, totalBytes) as each chunk is written to the archive.
+    :type progress: callable or None
+    :return: The ZipInfo of each written member.
+    :rtype: list(:class:`zipfile.ZipInfo`)
+    """
+    jobs = []
+    totalBytes = 0
+    for source, arcname in files:
+        st = os.stat(source)
+        jobs.append((source, arcname, st))
+        if not os.path.isdir(source):
+            totalBytes += st.st_size
+
+    results = {}
+    state = {"written": 0, "cancelled": False}
+    condition = threading.Condition()
+    jobIndices = iter(xrange(len(jobs)))
+    # how far the workers may compress ahead of the writer
+    window = max(workers, 1) * 2
+
+    def worker():
+        while True:
+            with condition:
+                index = next(jobIndices, None)
+                while index is not None and not state["cancelled"] and index >= state["written"] + window:
+                    condition.wait()
+                if index is None or state["cancelled"]:
+                    return
+            try:
+                member = _compressMember(jobs[index], compression, level, chunkSize, spoolSize)
+            except Exception as er:
+                member = er
+            with condition:
+                results[index] = member
+                condition.notify_all()
+
+    threads = []
+    if workers > 1 and len(jobs) > 1:
+        threads = [threading.Thread(target=worker, name="zooZip") for _ in xrange(min(workers, len(jobs)))]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+    processed = [0]
+
+    def onProgress(count):
+        processed[0] += count
+        if progress is not None:
+            progress(processed[0], totalBytes)
+
+    directory = os.path.dirname(zipPath)
+    if directory:
+        filesystem.ensureFolderExists(directory)
+    logger.debug("writing file: {}".format(zipPath))
+    succeeded = False
+    try:
+        with open(zipPath, "wb") as f:
+            writer = _ZipWriter(f)
+            for index in xrange(len(jobs)):
+                if threads:
+                    with condition:
+                        while index not in results:
+                            condition.wait()
+                        member = results.pop(index)
+                else:
+                    try:
+                        member = _compressMember(jobs[index], compression, level, chunkSize, spoolSize)
+                    except Exception as er:
+                        member = er
+                if isinstance(member, Exception):
+                    raise member
+                try:
+                    _writeMember(writer, member, chunkSize, onProgress)
+                finally:
+                    member.close()
+                with condition:
+                    state["written"] = index + 1
+                    condition.notify_all()
+            writer.close()
+        succeeded = True
+    finally:
+        with condition:
+            state["cancelled"] = True
+            condition.notify_all()
+        for thread in threads:
+            thread.join()
+        for member in results.values():
+            if isinstance(member, _Member):
+                member.close()
+        if not succeeded and os.path.exists(zipPath):
+            os.remove(zipPath)
+    logger.debug("finished writing zip file to : {}".format(zipPath))
+    return writer.infos
+
+
+def _zipInfo(source, arcname, st):
+    # matches ZipFile.write()
+    arcname = os.path.normpath(os.path.splitdrive(arcname)[1])
+    while arcname[0] in (os.sep, os.altsep):
+        arcname = arcname[1:]
+    isDirectory = os.path.isdir(source)
+    if isDirectory:
+        arcname += "/"
+    info = zipfile.ZipInfo(arcname, time.localtime(st.st_mtime)[0:6])
+    info.external_attr = (st.st_mode & 0xFFFF) << 16
+    info.file_size = 0
+    info.compress_size = 0
+    info.CRC = 0
+    info.compress_type = zipfile.ZIP_STORED
+    if isDirectory:
+        # MS-DOS directory flag
+        info.external_attr |= 0x10
+    return info, isDirectory
+
+
+def _compressMember(job, compression, level, chunkSize, spoolSize):
+    """Reads the source once computing the CRC and, when deflating, compressing it into a spooled temporary file.
+    """
+    source, arcname, st = job
+    info, isDirectory = _zipInfo(source, arcname, st)
+    if isDirectory:
+        return _Member(source, info)
+    info.compress_type = compression
+    compressor = None
+    data = None
+    if compression == zipfile.ZIP_DEFLATED:
+        # raw deflate stream without the zlib header, as stored in zip archives
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        data = tempfile.SpooledTemporaryFile(max_size=spoolSize)
+    crc = 0
+    fileSize = 0
+    try:
+        with open(source, "rb") as f:
+            while True:
+                chunk = f.read(chunkSize)
+                if not chunk:
+                    break
+                fileSize += len(chunk)
+                crc = zlib.crc32(chunk, crc) & 0xffffffff
+                if compressor is not None:
+                    data.write(compressor.compress(chunk))
+        if compressor is not None:
+            data.write(compressor.flush())
+            info.compress_size = data.tell()
+            data.seek(0)
+        else:
+            info.compress_size = fileSize
+    except BaseException:
+        if data is not None:
+            data.close()
+        raise
+    info.file_size = fileSize
+    info.CRC = crc
+    return _Member(source, info, data)
+
+
+def _writeMember(writer, member, chunkSize, progress):
+    """Writes the local header, which already has the final CRC and sizes, followed by the member data.
+    """
+    info = member.info
+    writer.writeHeader(info)
+    if member.data is not None:
+        # report the uncompressed bytes in proportion to the compressed bytes written
+        written = 0
+        reported = 0
+        while True:
+            chunk = member.data.read(chunkSize)
+            if not chunk:
+                break
+            writer.write(chunk)
+            written += len(chunk)
+            processed = info.file_size * written // max(info.compress_size, 1)
+            progress(processed - reported)
+            reported = processed
+        if reported != info.file_size:
+            progress(info.file_size - reported)
+    elif not info.filename.endswith("/"):
+        # stored members are copied straight from the source, the CRC catches files which changed since reading
+        crc = 0
+        size = 0
+        with open(member.source, "rb") as f:
+            while True:
+                chunk = f.read(chunkSize)
+                if not chunk:
+                    break
+                crc = zlib.crc32(chunk, crc) & 0xffffffff
+                size += len(chunk)
+                writer.write(chunk)
+                progress(len(chunk))
+        if crc != info.CRC or size != info.file_size:
+            raise IOError("File changed while it was being archived: {}".format(member.source))
+
+
+def extractZip(zipPath, destination, members=None, workers=4, chunkSize=1 << 20, progress=None):
+    """Extracts the archive members in parallel, member paths are sanitized like ZipFile.extract() so they can't
+    be written outside of the destination.
+
+    :param zipPath: The zip file path.
+    :type zipPath: str
+    :param destination: The folder to extract to.
+    :type destination: str
+    :param members: The member names to extract, None extracts everything.
+    :type members: iterable(str) or None
+    :param workers: The number of members extracted at the same time.
+    :type workers: int
+    :param chunkSize: The number of bytes decompressed at a time.
+    :type chunkSize: int
+    :param progress: Called as progress(extractedBytes, totalBytes) from the worker threads, one at a time.
+    :type progress: callable or None
+    :return: The extracted file and folder paths in archive order.
+    :rtype: list(str)
+    """
+    with zipfile.ZipFile(zipPath, "r") as archive:
+        infos = archive.infolist()
+    if members is not None:
+        members = set(members)
+        infos = [info for info in infos if info.filename in members]
+    totalBytes = sum(info.file_size for info in infos)
+    paths = [_memberPath(destination, info.filename) for info in infos]
+    failures = {}
+    processed = [0]
+    lock = threading.Lock()
+    indices = iter(xrange(len(infos)))
+
+    def onProgress(count):
+        with lock:
+            processed[0] += count
+            if progress is not None:
+                progress(processed[0], totalBytes)
+
+    def worker():
+        # ZipFile isn't thread safe so each worker reads through its own handle
+        with zipfile.ZipFile(zipPath, "r") as archive:
+            while True:
+                with lock:
+                    index = next(indices, None)
+                if index is None:
+                    return
+                try:
+                    _extractMember(archive, infos[index], paths[index], chunkSize, onProgress)
+                except Exception as er:
+                    failures[index] = er
+
+    workerCount = min(workers, len(infos))
+    if workerCount < 2:
+        worker()
+    else:
+        threads = [threading.Thread(target=worker, name="zooUnzip") for _ in xrange(workerCount)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+    if failures:
+        raise failures[min(failures)]
+    return paths
+
+
+def _memberPath(destination, name):
+    # matches ZipFile._extract_member(), drops drive letters, absolute roots and parent folders
+    arcname = name.replace("/", os.path.sep)
+    if os.path.altsep:
+        arcname = arcname.replace(os.path.altsep, os.path.sep)
+    arcname = os.path.splitdrive(arcname)[1]
+    arcname = os.path.sep.join(x for x in arcname.split(os.path.sep) if x not in ("", os.path.curdir, os.path.pardir))
+    return os.path.normpath(os.path.join(destination, arcname))
+
+
+def _extractMember(archive, info, targetPath, chunkSize, progress):
+    if info.filename.endswith("/"):
+        filesystem.ensureFolderExists(targetPath)
+        return
+    directory = os.path.dirname(targetPath)
+    if directory and not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            # another worker created it
+            if not os.path.isdir(directory):
+                raise
+    with archive.open(info) as source, open(targetPath, "wb") as target:
+        while True:
+            chunk = source.read(chunkSize)
+            if not chunk:
+                break
+            target.write(chunk)
+            progress(len(chunk))
+    permissions = (info.external_attr >> 16) & 0777
+    if permissions and os.name == "posix":
+        os.chmod(targetPath, permissions)
+